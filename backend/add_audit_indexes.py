@@ -0,0 +1,31 @@
+"""
+Add the audit_logs query indexes to an existing database.
+
+    cd backend
+    python add_audit_indexes.py
+
+create_db.py (create_all) only creates missing tables, so databases created
+before these indexes existed need this once. Indexes that already exist are
+skipped. On MySQL/InnoDB the CREATE INDEX runs online (no table copy), but on
+a very large table it can still take a while.
+"""
+
+from sqlalchemy import inspect
+
+from app.db.session import engine
+from app.db.models.audit_log import AuditLog
+
+
+def main():
+    existing = {ix["name"] for ix in inspect(engine).get_indexes(AuditLog.__tablename__)}
+    for index in AuditLog.__table__.indexes:
+        if index.name in existing:
+            print(f"  {index.name}: already present")
+            continue
+        print(f"  {index.name}: creating...")
+        index.create(bind=engine)
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
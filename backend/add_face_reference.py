@@ -0,0 +1,35 @@
+"""
+Add the users.face_reference column to an existing database.
+
+    cd backend
+    python add_face_reference.py
+
+create_db.py (create_all) only creates missing tables, so databases created
+before server-side face references existed need this once; it is skipped if
+the column is already there. Existing users have no reference until they
+enroll again: their next password (SRP) login finds no face on face_verify
+and sends them to face_register with that login's MFA session, since
+enrollment requires one. A face enrolled by the wrong person can be cleared
+by an admin with POST /admin/users/{id}/face/reset.
+"""
+
+from sqlalchemy import inspect, text
+
+from app.db.session import engine
+from app.db.models.user import User
+
+
+def main():
+    columns = {c["name"] for c in inspect(engine).get_columns(User.__tablename__)}
+    if "face_reference" in columns:
+        print("  users.face_reference: already present")
+    else:
+        column_type = User.__table__.c.face_reference.type.compile(dialect=engine.dialect)
+        print(f"  users.face_reference: adding ({column_type})...")
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE users ADD COLUMN face_reference {column_type} NULL"))
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Add the vault_items keyset index to an existing database.
+
+    cd backend
+    python add_vault_indexes.py
+
+create_db.py (create_all) only creates missing tables, so databases created
+before ix_vault_items_user_id_id existed need this once. It creates the
+(user_id, id) index, then drops the old single-column ix_vault_items_user_id,
+which the new index makes redundant (on MySQL it also satisfies the user_id
+foreign key, so the drop is allowed only after the create). Steps already
+done are skipped. On MySQL/InnoDB both run online (no table copy), but on a
+very large table they can still take a while.
+"""
+
+from sqlalchemy import Index, inspect
+
+from app.db.session import engine
+from app.db.models.vault_item import VaultItem
+
+OLD_INDEX = "ix_vault_items_user_id"
+
+
+def main():
+    table = VaultItem.__table__
+    existing = {ix["name"] for ix in inspect(engine).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name in existing:
+            print(f"  {index.name}: already present")
+            continue
+        print(f"  {index.name}: creating...")
+        index.create(bind=engine)
+
+    if OLD_INDEX in existing:
+        print(f"  {OLD_INDEX}: dropping...")
+        Index(OLD_INDEX, table.c.user_id).drop(bind=engine)
+    else:
+        print(f"  {OLD_INDEX}: already gone")
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+import os
+from datetime import datetime
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from app.db.session import get_db
+from app.db.session import SessionLocal, admit, db_pool_stats, get_db
 from app.db.models.user import User
 from app.db.models.role import Role
-from app.db.models.audit_log import AuditLog
+from app.core.audit import add_audit, write_audit
+from app.core.audit_query import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    AuditFilter,
+    InvalidCursorError,
+    audit_page_query,
+    audit_row,
+    next_cursor,
+)
+from app.core import user_search
+from app.core.admin_stats import (
+    activity_query,
+    activity_snapshot,
+    build_activity,
+    build_stats,
+    stats_query,
+    stats_snapshot,
+)
+from app.core.config import settings
+from app.core import provisioning
+from app.core.profiler import ProfilerBusyError, SamplingProfiler, end_profile, try_begin_profile
+from app.core.security import Principal, resolve_principal, principal_cache
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -13,15 +41,10 @@ router = APIRouter(prefix="/admin", tags=["Admin"])
 # RBAC Helper
 # =====================================================
 
-def require_admin(username: str, db: Session) -> User:
-    user = (
-        db.query(User)
-        .join(Role)
-        .filter(User.username == username)
-        .first()
-    )
+def require_admin(username: str, db: Session) -> Principal:
+    user = resolve_principal(db, username)
 
-    if not user or user.role.name != "admin":
+    if not user or user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
 
     return user
@@ -33,17 +56,12 @@ def require_admin(username: str, db: Session) -> User:
 
 @router.get("/me")
 def admin_me(username: str, db: Session = Depends(get_db)):
-    user = (
-        db.query(User)
-        .join(Role)
-        .filter(User.username == username)
-        .first()
-    )
+    user = resolve_principal(db, username)
 
     if not user:
         raise HTTPException(status_code=401, detail="Invalid user")
 
-    return {"is_admin": user.role.name == "admin"}
+    return {"is_admin": user.role == "admin"}
 
 
 # =====================================================
@@ -51,22 +69,111 @@ def admin_me(username: str, db: Session = Depends(get_db)):
 # =====================================================
 
 @router.get("/users")
-def list_users(username: str, db: Session = Depends(get_db)):
+def list_users(
+    username: str,
+    response: Response,
+    q: Optional[str] = Query(None, max_length=200, description="prefix of `by`"),
+    by: str = Query("username", pattern="^(username|email)$"),
+    role: Optional[str] = None,
+    locked: Optional[bool] = None,
+    active: Optional[bool] = None,
+    limit: Optional[int] = Query(None, ge=1, le=user_search.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    db: Session = Depends(get_db),
+):
+    """
+    Ordered by `by`. Without `limit` every matching user is returned (old
+    behaviour); with it, pages are keyset-paginated: the next cursor is sent in
+    X-Next-Cursor and the total in X-Total-Count (X-Total-Count-Estimated: 1
+    when it comes from table statistics or exceeds the count cap).
+    """
+    require_admin(username, db)
+
+    filters = user_search.UserFilter(q=q, by=by, role=role, locked=locked, active=active)
+    rows = db.execute(user_search.users_page_query(filters, cursor, limit)).all()
+
+    if limit is not None:
+        stmt, estimated = user_search.count_statement(filters, db.get_bind().dialect.name)
+        count = db.execute(stmt).scalar()
+        response.headers.update(user_search.total_headers(count, estimated))
+
+    cursor_out = user_search.next_cursor(rows, limit, by)
+    if cursor_out:
+        response.headers["X-Next-Cursor"] = cursor_out
+
+    return [user_search.user_row(u) for u in rows]
+
+
+# =====================================================
+# Bulk Provisioning
+# =====================================================
+
+def _log_provisioning(job: provisioning.ProvisioningJob):
+    stats_snapshot.invalidate()
+    report = job.report
+    # runs in the job's thread, after the users are committed
+    write_audit(
+        action="BULK_PROVISION",
+        admin_username=job.admin_username,
+        target_username="*",
+        details=(
+            f"{job.status}: created={report.created} skipped={report.skipped} "
+            f"failed={report.failed}"
+        ),
+    )
+
+
+@router.post("/users/bulk", status_code=202)
+async def bulk_provision_users(
+    username: str,
+    request: Request,
+    upload_format: Optional[str] = Query(None, alias="format"),
+    db: Session = Depends(get_db),
+):
+    """
+    Create users from a CSV (username,email,password[,role]) or NDJSON body;
+    `role` must be one of PROVISION_ALLOWED_ROLES (default: user only).
+    Runs in the background; poll GET /admin/users/bulk/{job_id} for progress.
+    """
+    admin = await run_in_threadpool(require_admin, username, db)
+
+    fmt = upload_format
+    if fmt is None:
+        content_type = request.headers.get("content-type", "")
+        fmt = "csv" if "csv" in content_type else "ndjson"
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+
+    max_bytes = settings.PROVISION_MAX_UPLOAD_MB * 1024 * 1024
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise HTTPException(status_code=413, detail="Upload too large")
+
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be UTF-8")
+
+    job = await run_in_threadpool(
+        provisioning.start_job, db, text, fmt, admin.username, on_done=_log_provisioning
+    )
+    if job is None:
+        raise HTTPException(status_code=409, detail="A provisioning job is already running")
+
+    return job.to_dict()
+
+
+@router.get("/users/bulk/{job_id}")
+def bulk_provision_status(job_id: str, username: str, db: Session = Depends(get_db)):
     require_admin(username, db)
 
-    users = db.query(User).join(Role).all()
+    job = provisioning.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
 
-    return [
-        {
-            "id": u.id,
-            "username": u.username,
-            "email": u.email,
-            "is_active": u.is_active,
-            "is_locked": u.is_locked,
-            "role": u.role.name,
-        }
-        for u in users
-    ]
+    return job
 
 
 @router.post("/users/{user_id}/lock")
@@ -84,18 +191,18 @@ def lock_user(
         raise HTTPException(status_code=404, detail="User not found")
 
     user.is_locked = payload["locked"]
-
-    db.add(
-        AuditLog(
-            action="LOCK" if payload["locked"] else "UNLOCK",
-            admin_username=admin.username,
-            target_username=user.username,
-            details="Account locked" if payload["locked"] else "Account unlocked",
-            ip_address=request.client.host if request.client else None,
-        )
+    add_audit(
+        db,
+        action="LOCK" if payload["locked"] else "UNLOCK",
+        admin_username=admin.username,
+        target_username=user.username,
+        details="Account locked" if payload["locked"] else "Account unlocked",
+        ip=request.client.host if request.client else None,
     )
 
     db.commit()
+    principal_cache.invalidate(user.username)
+    stats_snapshot.invalidate()
 
     return {"message": "User updated"}
 
@@ -118,22 +225,56 @@ def change_role(
     old_role = user.role.name
 
     user.role_id = role.id
-
-    db.add(
-        AuditLog(
-            action="CHANGE_ROLE",
-            admin_username=admin.username,
-            target_username=user.username,
-            details=f"{old_role} → {payload['role']}",
-            ip_address=request.client.host if request.client else None,
-        )
+    add_audit(
+        db,
+        action="CHANGE_ROLE",
+        admin_username=admin.username,
+        target_username=user.username,
+        details=f"{old_role} → {payload['role']}",
+        ip=request.client.host if request.client else None,
     )
 
     db.commit()
+    principal_cache.invalidate(user.username)
+    stats_snapshot.invalidate()
 
     return {"message": "Role updated"}
 
 
+@router.post("/users/{user_id}/face/reset")
+def reset_face(
+    user_id: int,
+    username: str,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    """
+    Clear a user's enrolled face (server reference and encrypted template),
+    e.g. after someone else enrolled first. The user enrolls again after the
+    next password login.
+    """
+    admin = require_admin(username, db)
+
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user.face_reference = None
+    user.face_template = None
+    add_audit(
+        db,
+        action="FACE_RESET",
+        admin_username=admin.username,
+        target_username=user.username,
+        details="Face enrollment cleared",
+        ip=request.client.host if request.client else None,
+    )
+
+    db.commit()
+
+    return {"message": "Face enrollment cleared"}
+
+
 # =====================================================
 # System Stats
 # =====================================================
@@ -142,36 +283,143 @@ def change_role(
 def system_stats(username: str, db: Session = Depends(get_db)):
     require_admin(username, db)
 
+    stats = stats_snapshot.get()
+    if stats is None:
+        generation = stats_snapshot.generation
+        stats = build_stats(db.execute(stats_query()).all())
+        stats_snapshot.put(stats, generation)
+
+    activity = activity_snapshot.get()
+    if activity is None:
+        generation = activity_snapshot.generation
+        activity = build_activity(db.execute(activity_query()).one())
+        activity_snapshot.put(activity, generation)
+
+    return {**stats, **activity}
+
+
+# =====================================================
+# DB Connection Pool
+# =====================================================
+
+@router.get("/db/pool")
+async def db_pool(username: str, db: Session = Depends(get_db)):
+    await run_in_threadpool(require_admin, username, db)
+
+    limiter = anyio.to_thread.current_default_thread_limiter()
     return {
-        "total_users": db.query(User).count(),
-        "active_users": db.query(User).filter(User.is_active == True).count(),
-        "locked_users": db.query(User).filter(User.is_locked == True).count(),
+        "pools": db_pool_stats(),
+        "threadpool": {
+            "size": limiter.total_tokens,
+            "busy": limiter.borrowed_tokens,
+        },
     }
 
 
+# =====================================================
+# Sampling Profiler
+# =====================================================
+
+def _require_admin_short(username: str) -> Principal:
+    # own short Session (admitted by the caller): a pooled connection must
+    # not be held for the whole profile
+    db = SessionLocal()
+    try:
+        return require_admin(username, db)
+    finally:
+        db.close()
+
+
+@router.post("/profile")
+async def profile_worker(
+    username: str,
+    request: Request,
+    seconds: float = Query(10, gt=0, le=settings.PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(10, ge=1, le=1000),
+    include_idle: bool = False,
+    output_format: str = Query("collapsed", alias="format", pattern="^(collapsed|json)$"),
+):
+    """
+    Samples every thread of the worker that serves this request for
+    `seconds` and returns collapsed stacks (flamegraph.pl / speedscope) or a
+    JSON top-N summary. Only this process is profiled: with several workers,
+    repeat against each; Argon2 runs in the KDF processes and is not seen.
+    One profile per worker at a time (409 otherwise).
+    """
+    async with admit():
+        admin = await run_in_threadpool(_require_admin_short, username)
+
+    try:
+        try_begin_profile()
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    try:
+        # committed before sampling starts
+        async with admit():
+            await run_in_threadpool(
+                write_audit,
+                action="PROFILE",
+                admin_username=admin.username,
+                target_username="*",
+                details=f"pid={os.getpid()} seconds={seconds} interval_ms={interval_ms}",
+                ip=request.client.host if request.client else None,
+            )
+        profiler = SamplingProfiler(interval_ms / 1000, include_idle=include_idle)
+        profiler.start()
+        try:
+            # the request waits on the event loop, not in a worker thread
+            await anyio.sleep(seconds)
+        finally:
+            profiler.stop()
+    finally:
+        end_profile()
+
+    if output_format == "json":
+        return profiler.summary()
+    return PlainTextResponse(
+        profiler.collapsed(),
+        headers={
+            "X-Profile-Pid": str(os.getpid()),
+            "X-Profile-Samples": str(profiler.samples),
+            "X-Profile-Duration": f"{profiler.duration_sec:.3f}",
+        },
+    )
+
+
 # =====================================================
 # Audit Log
 # =====================================================
 
 @router.get("/audit")
-def get_audit_log(username: str, db: Session = Depends(get_db)):
+def get_audit_log(
+    username: str,
+    response: Response,
+    action: Optional[str] = None,
+    admin: Optional[str] = None,
+    target: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    """
+    Newest first, filtered on the server. The body stays a plain list; when the
+    page is full the next page's cursor is sent in the X-Next-Cursor header.
+    """
     require_admin(username, db)
 
-    logs = (
-        db.query(AuditLog)
-        .order_by(AuditLog.created_at.desc())
-        .limit(100)
-        .all()
-    )
+    filters = AuditFilter(action=action, admin=admin, target=target, since=since, until=until)
+    try:
+        stmt = audit_page_query(filters, cursor, limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logs = db.execute(stmt).scalars().all()
+
+    cursor_out = next_cursor(logs, limit)
+    if cursor_out:
+        response.headers["X-Next-Cursor"] = cursor_out
 
-    return [
-        {
-            "time": log.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-            "action": log.action,
-            "admin": log.admin_username,
-            "target": log.target_username,
-            "details": log.details,
-            "ip": log.ip_address,
-        }
-        for log in logs
-    ]
+    return [audit_row(log) for log in logs]
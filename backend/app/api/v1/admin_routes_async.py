@@ -0,0 +1,226 @@
+# backend/app/api/v1/admin_routes_async.py
+#
+# نسخة async من admin_routes (DB_ASYNC=1).
+
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_async_db
+from app.db.models.user import User
+from app.db.models.role import Role
+from app.core.audit import add_audit
+from app.core.audit_query import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    AuditFilter,
+    InvalidCursorError,
+    audit_page_query,
+    audit_row,
+    next_cursor,
+)
+from app.core import user_search
+from app.core.admin_stats import (
+    activity_query,
+    activity_snapshot,
+    build_activity,
+    build_stats,
+    stats_query,
+    stats_snapshot,
+)
+from app.core.security import Principal, aresolve_principal, principal_cache
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+# =====================================================
+# RBAC Helper
+# =====================================================
+
+async def require_admin(username: str, db: AsyncSession) -> Principal:
+    user = await aresolve_principal(db, username)
+
+    if not user or user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return user
+
+
+# =====================================================
+# Admin Self Check
+# =====================================================
+
+@router.get("/me")
+async def admin_me(username: str, db: AsyncSession = Depends(get_async_db)):
+    user = await aresolve_principal(db, username)
+
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid user")
+
+    return {"is_admin": user.role == "admin"}
+
+
+# =====================================================
+# Users Management
+# =====================================================
+
+@router.get("/users")
+async def list_users(
+    username: str,
+    response: Response,
+    q: Optional[str] = Query(None, max_length=200),
+    by: str = Query("username", pattern="^(username|email)$"),
+    role: Optional[str] = None,
+    locked: Optional[bool] = None,
+    active: Optional[bool] = None,
+    limit: Optional[int] = Query(None, ge=1, le=user_search.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    await require_admin(username, db)
+
+    filters = user_search.UserFilter(q=q, by=by, role=role, locked=locked, active=active)
+    rows = (await db.execute(user_search.users_page_query(filters, cursor, limit))).all()
+
+    if limit is not None:
+        stmt, estimated = user_search.count_statement(filters, db.bind.dialect.name)
+        count = (await db.execute(stmt)).scalar()
+        response.headers.update(user_search.total_headers(count, estimated))
+
+    cursor_out = user_search.next_cursor(rows, limit, by)
+    if cursor_out:
+        response.headers["X-Next-Cursor"] = cursor_out
+
+    return [user_search.user_row(u) for u in rows]
+
+
+@router.post("/users/{user_id}/lock")
+async def lock_user(
+    user_id: int,
+    payload: dict,
+    username: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+):
+    admin = await require_admin(username, db)
+
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user.is_locked = payload["locked"]
+    add_audit(
+        db,
+        action="LOCK" if payload["locked"] else "UNLOCK",
+        admin_username=admin.username,
+        target_username=user.username,
+        details="Account locked" if payload["locked"] else "Account unlocked",
+        ip=request.client.host if request.client else None,
+    )
+
+    await db.commit()
+    principal_cache.invalidate(user.username)
+    stats_snapshot.invalidate()
+
+    return {"message": "User updated"}
+
+
+@router.post("/users/{user_id}/role")
+async def change_role(
+    user_id: int,
+    payload: dict,
+    username: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+):
+    admin = await require_admin(username, db)
+
+    role = (
+        await db.execute(select(Role).where(Role.name == payload["role"]))
+    ).scalars().first()
+    if not role:
+        raise HTTPException(status_code=400, detail="Invalid role")
+
+    row = (
+        await db.execute(
+            select(User, Role.name).join(Role).where(User.id == user_id)
+        )
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="User not found")
+    user, old_role = row
+
+    user.role_id = role.id
+    add_audit(
+        db,
+        action="CHANGE_ROLE",
+        admin_username=admin.username,
+        target_username=user.username,
+        details=f"{old_role} → {payload['role']}",
+        ip=request.client.host if request.client else None,
+    )
+
+    await db.commit()
+    principal_cache.invalidate(user.username)
+    stats_snapshot.invalidate()
+
+    return {"message": "Role updated"}
+
+
+# =====================================================
+# System Stats
+# =====================================================
+
+@router.get("/stats")
+async def system_stats(username: str, db: AsyncSession = Depends(get_async_db)):
+    await require_admin(username, db)
+
+    stats = stats_snapshot.get()
+    if stats is None:
+        generation = stats_snapshot.generation
+        stats = build_stats((await db.execute(stats_query())).all())
+        stats_snapshot.put(stats, generation)
+
+    activity = activity_snapshot.get()
+    if activity is None:
+        generation = activity_snapshot.generation
+        activity = build_activity((await db.execute(activity_query())).one())
+        activity_snapshot.put(activity, generation)
+
+    return {**stats, **activity}
+
+
+# =====================================================
+# Audit Log
+# =====================================================
+
+@router.get("/audit")
+async def get_audit_log(
+    username: str,
+    response: Response,
+    action: Optional[str] = None,
+    admin: Optional[str] = None,
+    target: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    await require_admin(username, db)
+
+    filters = AuditFilter(action=action, admin=admin, target=target, since=since, until=until)
+    try:
+        stmt = audit_page_query(filters, cursor, limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logs = (await db.execute(stmt)).scalars().all()
+
+    cursor_out = next_cursor(logs, limit)
+    if cursor_out:
+        response.headers["X-Next-Cursor"] = cursor_out
+
+    return [audit_row(log) for log in logs]
@@ -4,9 +4,10 @@ import base64
 import hashlib
 import hmac
 import secrets
+import struct
 import time
 from dataclasses import dataclass
-from typing import Dict
+from typing import Optional
 
 import srp
 from fastapi import APIRouter, Depends, HTTPException
@@ -17,8 +18,12 @@ from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from app.db.session import get_db
 from app.db.models.user import User
 from app.db.models.role import Role
-from app.core.srp_utils import create_srp_verifier
-from app.core.crypto_utils import generate_dek, derive_kek, wrap_dek
+from app.core.srp_utils import create_srp_verifier, get_srp_engine
+from app.core.crypto_utils import generate_dek, wrap_dek
+from app.core.kdf_executor import KdfSaturatedError, kdf_executor
+from app.core.security import resolve_principal, principal_cache
+from app.core.session_store import SessionBackend, build_session_store, get_session_db, pack_fields, unpack_fields
+from app.core.tracing import span
 
 router = APIRouter()
 
@@ -31,16 +36,23 @@ SRP_GROUP = srp.NG_2048
 SRP_SESSION_TTL_SEC = 300
 MFA_SESSION_TTL_SEC = 300
 MAX_SESSIONS = 5000
+# failed /mfa/face/verify attempts before the MFA session is dropped
+MAX_FACE_ATTEMPTS = 5
 
 
 # ======================================================
-# In-memory session stores
+# Session stores (backend selected by settings.SESSION_BACKEND)
 # ======================================================
 @dataclass
 class SrpSession:
-    verifier: srp.Verifier
     username: str
     created_at: float
+    salt: bytes
+    verifier_key: bytes
+    A: bytes
+    # server ephemeral secret / public value from SrpServerEngine.challenge()
+    b: bytes
+    B: bytes
 
 
 @dataclass
@@ -49,10 +61,54 @@ class MfaSession:
     K: bytes
     challenge: bytes
     created_at: float
+    # set by /mfa/face/verify; mfa_complete refuses the session until then
+    face_verified: bool = False
+    face_attempts: int = 0
+
+
+def _encode_srp_session(sess: SrpSession) -> bytes:
+    return pack_fields(
+        sess.username.encode("utf-8"),
+        sess.salt,
+        sess.verifier_key,
+        sess.A,
+        sess.b,
+        sess.B,
+        struct.pack("!d", sess.created_at),
+    )
+
+
+def _decode_srp_session(data: bytes) -> SrpSession:
+    # plain fields only: no modexp on the verifying worker
+    username_b, salt, verifier_key, A, b, B, created_at_b = unpack_fields(data)
+    (created_at,) = struct.unpack("!d", created_at_b)
+    return SrpSession(username_b.decode("utf-8"), created_at, salt, verifier_key, A, b, B)
+
+
+def _encode_mfa_session(sess: MfaSession) -> bytes:
+    return pack_fields(
+        sess.username.encode("utf-8"),
+        sess.K,
+        sess.challenge,
+        struct.pack("!d", sess.created_at),
+        struct.pack("!?B", sess.face_verified, min(sess.face_attempts, 255)),
+    )
+
+
+def _decode_mfa_session(data: bytes) -> MfaSession:
+    username_b, K, challenge, created_at_b, *face = unpack_fields(data)
+    (created_at,) = struct.unpack("!d", created_at_b)
+    # rows written before the face fields existed: not verified
+    face_verified, face_attempts = struct.unpack("!?B", face[0]) if face else (False, 0)
+    return MfaSession(username_b.decode("utf-8"), K, challenge, created_at, face_verified, face_attempts)
 
 
-_srpsessions: Dict[str, SrpSession] = {}
-_mfasessions: Dict[str, MfaSession] = {}
+_srpsessions: SessionBackend[SrpSession] = build_session_store(
+    "srp", SRP_SESSION_TTL_SEC, MAX_SESSIONS, _encode_srp_session, _decode_srp_session
+)
+_mfasessions: SessionBackend[MfaSession] = build_session_store(
+    "mfa", MFA_SESSION_TTL_SEC, MAX_SESSIONS, _encode_mfa_session, _decode_mfa_session
+)
 
 
 # ======================================================
@@ -71,26 +127,6 @@ def _b64encode(data: bytes) -> str:
     return base64.b64encode(data).decode("utf-8")
 
 
-def _cleanup_expired_sessions() -> None:
-    now = time.time()
-
-    for sid, sess in list(_srpsessions.items()):
-        if now - sess.created_at > SRP_SESSION_TTL_SEC:
-            _srpsessions.pop(sid, None)
-
-    for sid, sess in list(_mfasessions.items()):
-        if now - sess.created_at > MFA_SESSION_TTL_SEC:
-            _mfasessions.pop(sid, None)
-
-    if len(_srpsessions) > MAX_SESSIONS:
-        for sid, _ in sorted(_srpsessions.items(), key=lambda x: x[1].created_at)[: len(_srpsessions) - MAX_SESSIONS]:
-            _srpsessions.pop(sid, None)
-
-    if len(_mfasessions) > MAX_SESSIONS:
-        for sid, _ in sorted(_mfasessions.items(), key=lambda x: x[1].created_at)[: len(_mfasessions) - MAX_SESSIONS]:
-            _mfasessions.pop(sid, None)
-
-
 def _get_or_create_default_role(db: Session, name: str = "user") -> Role:
     role = db.query(Role).filter(Role.name == name).first()
     if role:
@@ -106,6 +142,24 @@ def _uniform_invalid_credentials() -> HTTPException:
     return HTTPException(status_code=400, detail="Invalid credentials")
 
 
+def live_mfa_session(sess: Optional[MfaSession], username: str) -> MfaSession:
+    # face verify re-puts the session (fresh store TTL), so the age is checked here
+    if not sess or sess.username != username or time.time() - sess.created_at > MFA_SESSION_TTL_SEC:
+        raise HTTPException(status_code=400, detail="Invalid MFA session")
+    return sess
+
+
+def _derive_kek(password: str, salt: bytes) -> bytes:
+    try:
+        return kdf_executor.derive_kek(password, salt)
+    except KdfSaturatedError:
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
 # ======================================================
 # Schemas
 # ======================================================
@@ -119,12 +173,10 @@ class ChangePasswordBody(BaseModel):
 # ======================================================
 @router.post("/register")
 def register_user(username: str, email: str, password: str, db: Session = Depends(get_db)):
-    _cleanup_expired_sessions()
-
     if not username or not email or not password:
         raise HTTPException(status_code=400, detail="Missing fields")
 
-    if db.query(User).filter(User.username == username).first():
+    if resolve_principal(db, username):
         raise HTTPException(status_code=400, detail="Username already exists")
 
     srp_data = create_srp_verifier(username, password)
@@ -135,7 +187,7 @@ def register_user(username: str, email: str, password: str, db: Session = Depend
     argon2_salt = hashlib.sha256(salt_bytes).digest()
 
     dek = generate_dek()
-    kek = derive_kek(password, argon2_salt)
+    kek = _derive_kek(password, argon2_salt)
     dek_wrapped = wrap_dek(kek, dek)
 
     role = _get_or_create_default_role(db, "user")
@@ -163,9 +215,8 @@ def register_user(username: str, email: str, password: str, db: Session = Depend
 # ======================================================
 @router.post("/login_start")
 def login_start(username: str, A_b64: str, db: Session = Depends(get_db)):
-    _cleanup_expired_sessions()
-
-    user = db.query(User).filter(User.username == username).first()
+    with span("user.lookup"):
+        user = db.query(User).filter(User.username == username).first()
     if not user or not user.is_active or user.is_locked:
         raise _uniform_invalid_credentials()
 
@@ -173,13 +224,14 @@ def login_start(username: str, A_b64: str, db: Session = Depends(get_db)):
     salt = _b64decode_strict(user.salt, "salt")
     verifier = _b64decode_strict(user.verifier, "verifier")
 
-    svr = srp.Verifier(username, salt, verifier, A, hash_alg=SRP_HASH, ng_type=SRP_GROUP)
-    _, B = svr.get_challenge()
-    if B is None:
+    srp_engine = get_srp_engine()
+    if not srp_engine.is_valid_A(A):
         raise _uniform_invalid_credentials()
+    b, B = srp_engine.challenge(verifier)
 
     session_id = secrets.token_urlsafe(32)
-    _srpsessions[session_id] = SrpSession(svr, username, time.time())
+    # نفس الـ Session (واتصالها) بدل اتصال ثانٍ من الـ pool
+    _srpsessions.put(session_id, SrpSession(username, time.time(), salt, verifier, A, b, B), db=db)
 
     return {"salt": user.salt, "B": _b64encode(B), "session_id": session_id}
 
@@ -188,24 +240,25 @@ def login_start(username: str, A_b64: str, db: Session = Depends(get_db)):
 # SRP Login Step 2 → MFA
 # ======================================================
 @router.post("/login_verify")
-def login_verify(username: str, session_id: str, M_b64: str):
-    _cleanup_expired_sessions()
-
-    sess = _srpsessions.get(session_id)
+def login_verify(username: str, session_id: str, M_b64: str, db: Optional[Session] = Depends(get_session_db)):
+    sess = _srpsessions.get(session_id, db=db)
     if not sess or sess.username != username:
         raise HTTPException(status_code=400, detail="Invalid SRP session")
 
     M = _b64decode_strict(M_b64, "M_b64")
-    HAMK = sess.verifier.verify_session(M)
-    if HAMK is None:
+    proof = get_srp_engine().verify(sess.username, sess.salt, sess.verifier_key, sess.A, sess.b, sess.B, M)
+    if proof is None:
         raise HTTPException(status_code=401, detail="SRP authentication failed")
 
-    K = sess.verifier.get_session_key()
+    HAMK, K = proof.H_AMK, proof.K
     challenge = secrets.token_bytes(32)
     mfa_session_id = secrets.token_urlsafe(32)
 
-    _mfasessions[mfa_session_id] = MfaSession(username, K, challenge, time.time())
-    _srpsessions.pop(session_id, None)
+    # claim the SRP session before issuing the MFA one: with a shared store
+    # another worker may have consumed it since get()
+    if not _srpsessions.discard(session_id, db=db):
+        raise HTTPException(status_code=400, detail="Invalid SRP session")
+    _mfasessions.put(mfa_session_id, MfaSession(username, K, challenge, time.time()), db=db)
 
     return {
         "mfa_required": True,
@@ -219,20 +272,19 @@ def login_verify(username: str, session_id: str, M_b64: str):
 # MFA Complete
 # ======================================================
 @router.post("/mfa_complete")
-def mfa_complete(username: str, mfa_session_id: str, proof_b64: str):
-    _cleanup_expired_sessions()
-
-    sess = _mfasessions.get(mfa_session_id)
-    if not sess or sess.username != username:
-        raise HTTPException(status_code=400, detail="Invalid MFA session")
+def mfa_complete(username: str, mfa_session_id: str, proof_b64: str, db: Optional[Session] = Depends(get_session_db)):
+    sess = live_mfa_session(_mfasessions.get(mfa_session_id, db=db), username)
 
     proof = _b64decode_strict(proof_b64, "proof_b64")
     expected = hmac.new(sess.K, sess.challenge, hashlib.sha1).digest()
 
     if not hmac.compare_digest(proof, expected):
         raise HTTPException(status_code=401, detail="Invalid MFA proof")
+    if not sess.face_verified:
+        raise HTTPException(status_code=403, detail="Face verification required")
 
-    _mfasessions.pop(mfa_session_id, None)
+    if not _mfasessions.discard(mfa_session_id, db=db):
+        raise HTTPException(status_code=400, detail="Invalid MFA session")
     return {"authenticated": True}
 
 
@@ -259,7 +311,7 @@ def change_password(username: str, body: ChangePasswordBody, db: Session = Depen
     # --- verify old password by decrypting DEK ---
     old_salt = base64.b64decode(user.salt)
     argon2_old = hashlib.sha256(old_salt).digest()
-    kek_old = derive_kek(body.old_password, argon2_old)
+    kek_old = _derive_kek(body.old_password, argon2_old)
 
     wrapped = base64.b64decode(user.dek_wrapped)
     nonce, ct = wrapped[:12], wrapped[12:]
@@ -279,12 +331,13 @@ def change_password(username: str, body: ChangePasswordBody, db: Session = Depen
 
     # --- rewrap SAME DEK ---
     argon2_new = hashlib.sha256(new_salt).digest()
-    kek_new = derive_kek(body.new_password, argon2_new)
+    kek_new = _derive_kek(body.new_password, argon2_new)
     user.dek_wrapped = wrap_dek(kek_new, dek)
 
     user.salt = _b64encode(new_salt)
     user.verifier = _b64encode(new_verifier)
 
     db.commit()
+    principal_cache.invalidate(user.username)
 
     return {"message": "Password changed successfully", "force_relogin": True}
@@ -0,0 +1,259 @@
+# backend/app/api/v1/auth_routes_async.py
+#
+# نسخة async من auth_routes (DB_ASYNC=1). المنطق والرسائل مطابقة للنسخة
+# المتزامنة؛ Argon2 يُنتظر عبر kdf_executor بدون حجز thread، وحسابات SRP
+# (modexp) تمرّ عبر الـ threadpool حتى لا تحجز الـ event loop.
+
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+
+import srp
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from app.db.session import admit, get_async_db
+from app.db.models.user import User
+from app.db.models.role import Role
+from app.core.srp_utils import create_srp_verifier, get_srp_engine
+from app.core.crypto_utils import generate_dek, wrap_dek
+from app.core.kdf_executor import KdfSaturatedError, kdf_executor
+from app.core.security import aresolve_principal, principal_cache
+from app.core.session_store import ExpiringSessionStore
+from app.core.tracing import span
+from app.api.v1.auth_routes import (
+    SRP_HASH,
+    SRP_GROUP,
+    SrpSession,
+    MfaSession,
+    ChangePasswordBody,
+    _srpsessions,
+    _mfasessions,
+    _b64decode_strict,
+    _b64encode,
+    _uniform_invalid_credentials,
+    live_mfa_session,
+)
+
+router = APIRouter()
+
+
+# ======================================================
+# Helpers
+# ======================================================
+async def _session_call(fn, *args):
+    # in-process store never blocks; the SQL store uses the sync pool from the
+    # threadpool, so it is admitted like any get_db request
+    if isinstance(fn.__self__, ExpiringSessionStore):
+        return fn(*args)
+    async with admit():
+        return await run_in_threadpool(fn, *args)
+
+
+async def _aderive_kek(password: str, salt: bytes) -> bytes:
+    try:
+        return await kdf_executor.aderive_kek(password, salt)
+    except KdfSaturatedError:
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def _get_user(db: AsyncSession, username: str) -> User | None:
+    with span("user.lookup"):
+        return (
+            await db.execute(select(User).where(User.username == username))
+        ).scalars().first()
+
+
+async def _get_or_create_default_role(db: AsyncSession, name: str = "user") -> Role:
+    role = (await db.execute(select(Role).where(Role.name == name))).scalars().first()
+    if role:
+        return role
+    role = Role(name=name)
+    db.add(role)
+    await db.commit()
+    return role
+
+
+# ======================================================
+# Register
+# ======================================================
+@router.post("/register")
+async def register_user(username: str, email: str, password: str, db: AsyncSession = Depends(get_async_db)):
+    if not username or not email or not password:
+        raise HTTPException(status_code=400, detail="Missing fields")
+
+    if await aresolve_principal(db, username):
+        raise HTTPException(status_code=400, detail="Username already exists")
+
+    # verifier = modexp: keep it off the event loop
+    srp_data = await run_in_threadpool(create_srp_verifier, username, password)
+    salt_b64 = srp_data["salt"]
+    verifier_b64 = srp_data["verifier"]
+
+    salt_bytes = _b64decode_strict(salt_b64, "salt")
+    argon2_salt = hashlib.sha256(salt_bytes).digest()
+
+    dek = generate_dek()
+    kek = await _aderive_kek(password, argon2_salt)
+    dek_wrapped = wrap_dek(kek, dek)
+
+    role = await _get_or_create_default_role(db, "user")
+
+    db.add(
+        User(
+            username=username,
+            email=email,
+            salt=salt_b64,
+            verifier=verifier_b64,
+            dek_wrapped=dek_wrapped,
+            is_active=True,
+            is_locked=False,
+            role_id=role.id,
+        )
+    )
+    await db.commit()
+
+    return {"message": "User registered successfully"}
+
+
+# ======================================================
+# SRP Login Step 1
+# ======================================================
+@router.post("/login_start")
+async def login_start(username: str, A_b64: str, db: AsyncSession = Depends(get_async_db)):
+    user = await _get_user(db, username)
+    if not user or not user.is_active or user.is_locked:
+        raise _uniform_invalid_credentials()
+
+    A = _b64decode_strict(A_b64, "A_b64")
+    salt = _b64decode_strict(user.salt, "salt")
+    verifier = _b64decode_strict(user.verifier, "verifier")
+
+    srp_engine = get_srp_engine()
+    if not srp_engine.is_valid_A(A):
+        raise _uniform_invalid_credentials()
+    b, B = await run_in_threadpool(srp_engine.challenge, verifier)
+
+    session_id = secrets.token_urlsafe(32)
+    await _session_call(
+        _srpsessions.put, session_id, SrpSession(username, time.time(), salt, verifier, A, b, B)
+    )
+
+    return {"salt": user.salt, "B": _b64encode(B), "session_id": session_id}
+
+
+# ======================================================
+# SRP Login Step 2 → MFA
+# ======================================================
+@router.post("/login_verify")
+async def login_verify(username: str, session_id: str, M_b64: str):
+    sess = await _session_call(_srpsessions.get, session_id)
+    if not sess or sess.username != username:
+        raise HTTPException(status_code=400, detail="Invalid SRP session")
+
+    M = _b64decode_strict(M_b64, "M_b64")
+    proof = await run_in_threadpool(
+        get_srp_engine().verify, sess.username, sess.salt, sess.verifier_key, sess.A, sess.b, sess.B, M
+    )
+    if proof is None:
+        raise HTTPException(status_code=401, detail="SRP authentication failed")
+
+    HAMK, K = proof.H_AMK, proof.K
+    challenge = secrets.token_bytes(32)
+    mfa_session_id = secrets.token_urlsafe(32)
+
+    if not await _session_call(_srpsessions.discard, session_id):
+        raise HTTPException(status_code=400, detail="Invalid SRP session")
+    await _session_call(_mfasessions.put, mfa_session_id, MfaSession(username, K, challenge, time.time()))
+
+    return {
+        "mfa_required": True,
+        "mfa_session_id": mfa_session_id,
+        "challenge_b64": _b64encode(challenge),
+        "server_proof_b64": _b64encode(HAMK),
+    }
+
+
+# ======================================================
+# MFA Complete
+# ======================================================
+@router.post("/mfa_complete")
+async def mfa_complete(username: str, mfa_session_id: str, proof_b64: str):
+    sess = live_mfa_session(await _session_call(_mfasessions.get, mfa_session_id), username)
+
+    proof = _b64decode_strict(proof_b64, "proof_b64")
+    expected = hmac.new(sess.K, sess.challenge, hashlib.sha1).digest()
+
+    if not hmac.compare_digest(proof, expected):
+        raise HTTPException(status_code=401, detail="Invalid MFA proof")
+    if not sess.face_verified:
+        raise HTTPException(status_code=403, detail="Face verification required")
+
+    if not await _session_call(_mfasessions.discard, mfa_session_id):
+        raise HTTPException(status_code=400, detail="Invalid MFA session")
+    return {"authenticated": True}
+
+
+# ======================================================
+# DEK Bundle
+# ======================================================
+@router.get("/dek_bundle")
+async def dek_bundle(username: str, db: AsyncSession = Depends(get_async_db)):
+    user = await _get_user(db, username)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"salt_b64": user.salt, "dek_wrapped_b64": user.dek_wrapped}
+
+
+# ======================================================
+# Change Password
+# ======================================================
+@router.post("/change-password")
+async def change_password(username: str, body: ChangePasswordBody, db: AsyncSession = Depends(get_async_db)):
+    user = await _get_user(db, username)
+    if not user or not user.is_active or user.is_locked:
+        raise HTTPException(status_code=400, detail="Invalid user")
+
+    # --- verify old password by decrypting DEK ---
+    old_salt = base64.b64decode(user.salt)
+    argon2_old = hashlib.sha256(old_salt).digest()
+    kek_old = await _aderive_kek(body.old_password, argon2_old)
+
+    wrapped = base64.b64decode(user.dek_wrapped)
+    nonce, ct = wrapped[:12], wrapped[12:]
+
+    try:
+        dek = AESGCM(kek_old).decrypt(nonce, ct, None)
+    except Exception:
+        raise HTTPException(status_code=401, detail="Current password is incorrect")
+
+    # --- generate NEW SRP salt + verifier ---
+    new_salt, new_verifier = await run_in_threadpool(
+        srp.create_salted_verification_key,
+        username=user.username,
+        password=body.new_password,
+        hash_alg=SRP_HASH,
+        ng_type=SRP_GROUP,
+    )
+
+    # --- rewrap SAME DEK ---
+    argon2_new = hashlib.sha256(new_salt).digest()
+    kek_new = await _aderive_kek(body.new_password, argon2_new)
+    user.dek_wrapped = wrap_dek(kek_new, dek)
+
+    user.salt = _b64encode(new_salt)
+    user.verifier = _b64encode(new_verifier)
+
+    await db.commit()
+    principal_cache.invalidate(user.username)
+
+    return {"message": "Password changed successfully", "force_relogin": True}
@@ -0,0 +1,124 @@
+import hmac
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+
+from app.api.v1.auth_routes import _mfasessions, _srpsessions
+from app.core.audit import audit_writer
+from app.core.config import settings
+from app.core.kdf_executor import kdf_executor
+from app.core.metrics import CONTENT_TYPE, REGISTRY, counter_family, gauge_family
+from app.core.security import principal_cache
+from app.db.session import db_pool_stats
+
+router = APIRouter(tags=["Metrics"])
+
+threadpool_size = REGISTRY.gauge("threadpool_size", "AnyIO worker threads for sync handlers")
+threadpool_busy = REGISTRY.gauge("threadpool_busy", "AnyIO worker threads in use")
+
+
+# =====================================================
+# Collectors (called on every scrape)
+# =====================================================
+
+def _session_families():
+    stores = (("srp", _srpsessions.stats()), ("mfa", _mfasessions.stats()))
+    yield gauge_family(
+        "auth_sessions_pending",
+        "SRP / MFA handshakes started and not yet completed or expired",
+        (({"kind": kind}, s["size"]) for kind, s in stores),
+    )
+    yield counter_family(
+        "auth_sessions_expired",
+        "Handshake sessions that expired unused",
+        (({"kind": kind}, s["expired"]) for kind, s in stores),
+    )
+    evicted = [({"kind": kind}, s["evicted"]) for kind, s in stores if "evicted" in s]
+    if evicted:
+        yield counter_family("auth_sessions_evicted", "Handshake sessions evicted at capacity", evicted)
+
+
+def _kdf_families():
+    s = kdf_executor.stats()
+    yield gauge_family("kdf_workers", "Argon2id worker processes", [({}, s["workers"])])
+    yield gauge_family("kdf_in_flight", "Argon2id hashes running", [({}, s["in_flight"])])
+    yield gauge_family("kdf_queue_depth", "Argon2id hashes waiting for a worker", [({}, s["queue_depth"])])
+    yield gauge_family("kdf_queue_limit", "Waiting hashes allowed before rejecting", [({}, s["queue_limit"])])
+    yield counter_family("kdf_rejected", "derive_kek calls rejected with 503 (pool saturated)", [({}, s["rejected"])])
+
+
+def _principal_cache_families():
+    s = principal_cache.stats()
+    yield gauge_family("principal_cache_size", "Cached principals", [({}, s["size"])])
+    yield counter_family("principal_cache_hits", "Principal cache hits", [({}, s["hits"])])
+    yield counter_family("principal_cache_misses", "Principal cache misses", [({}, s["misses"])])
+
+
+def _audit_families():
+    s = audit_writer.stats()
+    yield gauge_family("audit_queue_depth", "Audit events waiting to be written", [({}, s["queue_depth"])])
+    yield gauge_family("audit_queue_capacity", "Audit queue capacity", [({}, s["queue_capacity"])])
+    yield counter_family("audit_written", "Audit rows written", [({}, s["written"])])
+    yield counter_family("audit_dropped", "Audit events dropped on a full queue", [({}, s["dropped"])])
+    yield counter_family("audit_failed", "Audit events lost to failed batch inserts", [({}, s["failed"])])
+
+
+_POOL_GAUGES = (
+    ("size", "db_pool_size", "Pool size (persistent connections)"),
+    ("max_overflow", "db_pool_max_overflow", "Connections allowed above the pool size"),
+    ("checked_out", "db_pool_checked_out", "Connections in use"),
+    ("idle", "db_pool_idle", "Connections idle in the pool"),
+    ("overflow", "db_pool_overflow", "Overflow connections open"),
+)
+_POOL_COUNTERS = (
+    ("checkouts", "db_pool_checkouts", "Connection checkouts"),
+    ("waited", "db_pool_waited_checkouts", "Checkouts that waited for a free connection"),
+    ("timeouts", "db_pool_timeouts", "Checkouts that hit DB_POOL_TIMEOUT"),
+)
+
+
+def _pool_families():
+    # only metered pools (in-memory SQLite keeps its own)
+    pools = [(name, s) for name, s in db_pool_stats().items() if "checkouts" in s]
+    if not pools:
+        return
+    for key, name, help_text in _POOL_GAUGES:
+        yield gauge_family(name, help_text, (({"engine": e}, s[key]) for e, s in pools))
+    for key, name, help_text in _POOL_COUNTERS:
+        yield counter_family(name, help_text, (({"engine": e}, s[key]) for e, s in pools))
+    yield gauge_family(
+        "db_pool_wait_max_seconds",
+        "Longest checkout wait since start",
+        (({"engine": e}, s["wait_ms_max"] / 1000) for e, s in pools),
+    )
+
+
+for _collector in (_session_families, _kdf_families, _principal_cache_families, _audit_families, _pool_families):
+    REGISTRY.register_collector(_collector)
+
+
+# =====================================================
+# Endpoint
+# =====================================================
+
+def _check_token(request: Request) -> None:
+    # main.py refuses to start without a token; this only guards against an empty one
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if not hmac.compare_digest(request.headers.get("authorization", ""), expected):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    _check_token(request)
+
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    threadpool_size.set(limiter.total_tokens)
+    threadpool_busy.set(limiter.borrowed_tokens)
+
+    # SESSION_BACKEND=sql counts pending sessions with a query
+    body = await run_in_threadpool(REGISTRY.render)
+    return Response(content=body, media_type=CONTENT_TYPE)
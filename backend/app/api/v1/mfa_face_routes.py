@@ -1,56 +1,237 @@
-from fastapi import APIRouter, Depends, HTTPException
+from dataclasses import replace
+from typing import List, Optional
+
+import numpy as np
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 from app.db.session import get_db
 from app.db.models.user import User
+from app.core.security import resolve_principal
+from app.core.face_matcher import (
+    InvalidEmbeddingError,
+    decode_embedding_b64,
+    match,
+)
+from app.core.face_reference import (
+    InvalidFaceReferenceError,
+    find_enrolled_match,
+    open_reference,
+    seal_reference,
+)
+from app.api.v1.auth_routes import MAX_FACE_ATTEMPTS, MfaSession, _mfasessions, live_mfa_session
+from app.core.face_template import (
+    MAX_PAYLOAD_LEN,
+    OCTET_STREAM,
+    InvalidFaceTemplateError,
+    pack_template,
+    payload_from_b64,
+    payload_to_b64,
+    unpack_template,
+    validate_payload,
+)
 
 router = APIRouter(
     prefix="/mfa/face",
     tags=["MFA - Face"]
 )
 
+MAX_LIVE_SAMPLES = 10
+EMBEDDING_HEADER = "X-Face-Embedding"
+
 class FaceTemplateRegisterRequest(BaseModel):
     username: str = Field(..., min_length=1)
+    # جلسة MFA من /auth/login_verify: التسجيل يتطلب كلمة المرور (SRP) أولاً
+    mfa_session_id: str = Field(..., min_length=1)
     face_template_enc_b64: str = Field(..., min_length=20)
+    # الـ embedding نفسه: يصبح مرجع السيرفر (مشفّراً بمفتاح السيرفر) بعد فحص
+    # التكرار 1:N؛ بدونه لا يمكن اجتياز /mfa/face/verify
+    embedding_b64: Optional[str] = None
 
 class FaceTemplateVerifyRequest(BaseModel):
     username: str = Field(..., min_length=1)
-    similarity: float | None = None
+    # جلسة MFA من /auth/login_verify؛ نتيجة المطابقة تُسجَّل فيها
+    mfa_session_id: str = Field(..., min_length=1)
+    samples_b64: List[str] = Field(..., min_length=1, max_length=MAX_LIVE_SAMPLES)
+
+def _template_user(db: Session, username: str):
+    user = resolve_principal(db, username)
+    if not user or not user.can_login:
+        raise HTTPException(status_code=400, detail="Invalid user")
+    return user
+
+
+def _enrollment_user(db: Session, username: str, mfa_session_id: str):
+    # only someone who just proved the password over SRP may write the
+    # template or enroll a face; the session is not consumed
+    user = _template_user(db, username)
+    live_mfa_session(_mfasessions.get(mfa_session_id, db=db), username)
+    return user
+
+
+def _count_attempt(sess: MfaSession) -> MfaSession:
+    return replace(sess, face_attempts=sess.face_attempts + 1)
+
+
+def _mark_verified(sess: MfaSession) -> MfaSession:
+    return replace(sess, face_verified=True)
+
+
+def _load_reference(db: Session, user_id: int):
+    blob = db.query(User.face_reference).filter(User.id == user_id).scalar()
+    if blob is None:
+        return None
+    try:
+        return open_reference(user_id, blob)
+    except InvalidFaceReferenceError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _enrollment_reference(db: Session, user_id: int, embedding_b64: str) -> bytes:
+    """Checks a new enrollment and returns the sealed reference to store."""
+    try:
+        embedding = decode_embedding_b64(embedding_b64)
+    except InvalidEmbeddingError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid embedding: {e}")
+
+    # replacing a reference takes the same face: a password alone can't swap it
+    current = _load_reference(db, user_id)
+    if current is not None and not match(current, embedding).matched:
+        raise HTTPException(status_code=403, detail="Face does not match the enrolled face")
+
+    if find_enrolled_match(db, embedding, exclude_user_id=user_id) is not None:
+        raise HTTPException(status_code=409, detail="Face already enrolled for another account")
+    return seal_reference(user_id, embedding)
+
+
+def _store_template(db: Session, user_id: int, payload: bytes, reference: Optional[bytes] = None) -> None:
+    values = {User.face_template: pack_template(payload)}
+    if reference is not None:
+        values[User.face_reference] = reference
+    db.query(User).filter(User.id == user_id).update(values, synchronize_session=False)
+    db.commit()
+
 
 @router.get("/template")
-def get_face_template(username: str, db: Session = Depends(get_db)):
+def get_face_template(username: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Encrypted template (nonce + ciphertext). JSON/Base64 by default; raw bytes
+    with `Accept: application/octet-stream`.
+    """
     if not username:
         raise HTTPException(status_code=400, detail="Missing username")
 
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not user.is_active or user.is_locked:
-        raise HTTPException(status_code=400, detail="Invalid user")
+    user = _template_user(db, username)
 
-    if not user.face_template or len(user.face_template) < 20:
+    face_template = db.query(User.face_template).filter(User.id == user.id).scalar()
+    if not face_template:
         raise HTTPException(status_code=404, detail="Face template not registered")
 
-    return {
-        "username": user.username,
-        "face_template_enc_b64": user.face_template
-    }
+    try:
+        payload = unpack_template(face_template)
+    except InvalidFaceTemplateError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if OCTET_STREAM in request.headers.get("accept", ""):
+        return Response(content=payload, media_type=OCTET_STREAM, headers={"Vary": "Accept"})
+
+    # same URL, two representations: caches must key on Accept for both
+    return JSONResponse(
+        {
+            "username": user.username,
+            "face_template_enc_b64": payload_to_b64(payload)
+        },
+        headers={"Vary": "Accept"},
+    )
+
+@router.put("/template")
+async def put_face_template(
+    username: str,
+    mfa_session_id: str,
+    request: Request,
+    embedding_b64: Optional[str] = Header(None, alias=EMBEDDING_HEADER),
+    db: Session = Depends(get_db),
+):
+    """
+    Store the encrypted template from a raw application/octet-stream body.
+    The embedding (Base64 Float32) goes in the X-Face-Embedding header and
+    becomes the server reference, after the same checks as POST /register.
+    Requires a live MFA session (password verified) for `username`.
+    """
+    user = await run_in_threadpool(_enrollment_user, db, username, mfa_session_id)
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_PAYLOAD_LEN:
+            raise HTTPException(status_code=413, detail="Face template too large")
+
+    try:
+        payload = validate_payload(bytes(body))
+    except InvalidFaceTemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    reference = None
+    if embedding_b64 is not None:
+        reference = await run_in_threadpool(_enrollment_reference, db, user.id, embedding_b64)
+
+    await run_in_threadpool(_store_template, db, user.id, payload, reference)
+    return {"message": "Face template stored successfully"}
 
 @router.post("/register")
 def register_face(payload: FaceTemplateRegisterRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == payload.username).first()
-    if not user or not user.is_active or user.is_locked:
-        raise HTTPException(status_code=400, detail="Invalid user")
+    user = _enrollment_user(db, payload.username, payload.mfa_session_id)
 
-    if not payload.face_template_enc_b64 or len(payload.face_template_enc_b64) < 20:
-        raise HTTPException(status_code=400, detail="Invalid face template payload")
+    try:
+        template = payload_from_b64(payload.face_template_enc_b64)
+    except InvalidFaceTemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    user.face_template = payload.face_template_enc_b64
-    db.add(user)
-    db.commit()
+    reference = None
+    if payload.embedding_b64 is not None:
+        reference = _enrollment_reference(db, user.id, payload.embedding_b64)
+
+    _store_template(db, user.id, template, reference)
     return {"message": "Face template stored successfully"}
 
 @router.post("/verify")
 def verify_face(payload: FaceTemplateVerifyRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == payload.username).first()
-    if not user or not user.face_template:
+    """
+    Matches live samples against the server's reference for the user and
+    records a match on the MFA session; /auth/mfa_complete requires it.
+    Only the decision is returned: distances would let a client steer a
+    synthetic embedding towards the threshold.
+    """
+    sid = payload.mfa_session_id
+    live_mfa_session(_mfasessions.get(sid, db=db), payload.username)
+
+    user = resolve_principal(db, payload.username)
+    reference = _load_reference(db, user.id) if user else None
+    if reference is None:
         raise HTTPException(status_code=400, detail="Face not registered")
-    return {"message": "Face verify endpoint reachable"}
+
+    try:
+        samples = np.stack([decode_embedding_b64(s) for s in payload.samples_b64])
+    except InvalidEmbeddingError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid embedding: {e}")
+
+    # counted in the store before matching, so concurrent attempts on one
+    # session can't all read the same count
+    sess = _mfasessions.update(sid, _count_attempt, db=db)
+    if sess is None:
+        raise HTTPException(status_code=400, detail="Invalid MFA session")
+    if sess.face_attempts > MAX_FACE_ATTEMPTS:
+        _mfasessions.discard(sid, db=db)
+        raise HTTPException(status_code=401, detail="Too many face attempts, please login again")
+
+    matched = match(reference, samples).matched
+    if matched:
+        if _mfasessions.update(sid, _mark_verified, db=db) is None:
+            raise HTTPException(status_code=400, detail="Invalid MFA session")
+    elif sess.face_attempts >= MAX_FACE_ATTEMPTS:
+        _mfasessions.discard(sid, db=db)
+        raise HTTPException(status_code=401, detail="Too many face attempts, please login again")
+
+    return {"matched": matched}
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, insert, select, update
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, Field
-from typing import List
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from typing import List, Literal, Optional
 import base64
+import json
 
 from app.db.session import get_db
-from app.db.models.user import User
+from app.core.security import Principal, resolve_principal
 from app.db.models.vault_item import VaultItem
 
 router = APIRouter(prefix="/vault", tags=["Vault"])
@@ -24,6 +28,13 @@ def _looks_like_aesgcm_b64(s: str) -> bool:
         return False
 
 
+def _get_active_user(db: Session, username: str) -> Principal:
+    user = resolve_principal(db, username)
+    if not user or not user.can_login:
+        raise HTTPException(status_code=400, detail="Invalid user")
+    return user
+
+
 class VaultAddRequest(BaseModel):
     site: str = Field(..., min_length=1, max_length=255)
     site_username: str = Field(..., min_length=1, max_length=255)
@@ -40,42 +51,113 @@ class VaultPasswordUpdateRequest(BaseModel):
     secret_enc: str = Field(..., min_length=10)
 
 
+class VaultBatchOperation(BaseModel):
+    op: Literal["add", "update", "password", "delete"]
+    id: Optional[int] = None
+    site: Optional[str] = Field(None, min_length=1, max_length=255)
+    site_username: Optional[str] = Field(None, min_length=1, max_length=255)
+    secret_enc: Optional[str] = Field(None, min_length=10)
+
+    @model_validator(mode="after")
+    def _check_fields(self):
+        required = {
+            "add": ("site", "site_username", "secret_enc"),
+            "update": ("id", "site", "site_username"),
+            "password": ("id", "secret_enc"),
+            "delete": ("id",),
+        }[self.op]
+        missing = [f for f in required if getattr(self, f) is None]
+        if missing:
+            raise ValueError(f"{self.op} requires: {', '.join(missing)}")
+        return self
+
+
+class VaultBatchRequest(BaseModel):
+    operations: List[VaultBatchOperation] = Field(..., min_length=1, max_length=1000)
+
+
 class VaultItemResponse(BaseModel):
     id: int
     site: str
     site_username: str
+    # None عند include_secret=false (يُحذف من الاستجابة)
+    secret_enc: Optional[str] = None
+
+
+class VaultSecretResponse(BaseModel):
+    id: int
     secret_enc: str
 
 
-@router.get("/list", response_model=List[VaultItemResponse])
-def list_vault(username: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not user.is_active or user.is_locked:
-        raise HTTPException(status_code=400, detail="Invalid user")
+def _list_columns(include_secret: bool):
+    cols = [VaultItem.id, VaultItem.site, VaultItem.site_username]
+    if include_secret:
+        cols.append(VaultItem.secret_enc)
+    return cols
+
+
+@router.get(
+    "/list",
+    response_model=List[VaultItemResponse],
+    response_model_exclude_none=True,
+)
+def list_vault(
+    username: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[int] = Query(None, ge=1, description="X-Next-Cursor of the previous page"),
+    include_secret: bool = True,
+    db: Session = Depends(get_db),
+):
+    """
+    Newest first. Without `limit` the whole vault is returned (old behaviour);
+    with it, pages are keyset-paginated on id and the next page's cursor is
+    sent in the X-Next-Cursor header. include_secret=false omits secret_enc,
+    which can then be fetched per item from /vault/{item_id}/secret.
+    """
+    user = _get_active_user(db, username)
 
-    items = (
-        db.query(VaultItem)
-        .filter(VaultItem.user_id == user.id)
-        .order_by(VaultItem.id.desc())
-        .all()
-    )
+    q = db.query(*_list_columns(include_secret)).filter(VaultItem.user_id == user.id)
+    if cursor is not None:
+        q = q.filter(VaultItem.id < cursor)
+    q = q.order_by(VaultItem.id.desc())
+    if limit is not None:
+        q = q.limit(limit)
+
+    items = q.all()
+
+    if limit is not None and len(items) == limit:
+        response.headers["X-Next-Cursor"] = str(items[-1].id)
 
     return [
         VaultItemResponse(
             id=i.id,
             site=i.site,
             site_username=i.site_username,
-            secret_enc=i.secret_enc,
+            secret_enc=i.secret_enc if include_secret else None,
         )
         for i in items
     ]
 
 
+@router.get("/{item_id}/secret", response_model=VaultSecretResponse)
+def get_vault_secret(username: str, item_id: int, db: Session = Depends(get_db)):
+    user = _get_active_user(db, username)
+
+    row = (
+        db.query(VaultItem.id, VaultItem.secret_enc)
+        .filter(VaultItem.id == item_id, VaultItem.user_id == user.id)
+        .first()
+    )
+    if not row:
+        raise HTTPException(status_code=404, detail="Item not found")
+
+    return VaultSecretResponse(id=row.id, secret_enc=row.secret_enc)
+
+
 @router.post("/add")
 def add_vault_item(username: str, payload: VaultAddRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not user.is_active or user.is_locked:
-        raise HTTPException(status_code=400, detail="Invalid user")
+    user = _get_active_user(db, username)
 
     # ✅ منع نهائي للـ plaintext
     if not _looks_like_aesgcm_b64(payload.secret_enc):
@@ -99,9 +181,7 @@ def add_vault_item(username: str, payload: VaultAddRequest, db: Session = Depend
 
 @router.put("/{item_id}")
 def update_vault_item(username: str, item_id: int, payload: VaultUpdateRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not user.is_active or user.is_locked:
-        raise HTTPException(status_code=400, detail="Invalid user")
+    user = _get_active_user(db, username)
 
     item = (
         db.query(VaultItem)
@@ -122,9 +202,7 @@ def update_vault_item(username: str, item_id: int, payload: VaultUpdateRequest,
 # ✅ جديد: تحديث كلمة السر داخل البطاقة (مشفر بالـ DEK على الـ client)
 @router.put("/{item_id}/password")
 def update_vault_password(username: str, item_id: int, payload: VaultPasswordUpdateRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not user.is_active or user.is_locked:
-        raise HTTPException(status_code=400, detail="Invalid user")
+    user = _get_active_user(db, username)
 
     item = (
         db.query(VaultItem)
@@ -150,9 +228,7 @@ def update_vault_password(username: str, item_id: int, payload: VaultPasswordUpd
 
 @router.delete("/{item_id}")
 def delete_vault_item(username: str, item_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not user.is_active or user.is_locked:
-        raise HTTPException(status_code=400, detail="Invalid user")
+    user = _get_active_user(db, username)
 
     item = (
         db.query(VaultItem)
@@ -165,3 +241,217 @@ def delete_vault_item(username: str, item_id: int, db: Session = Depends(get_db)
     db.delete(item)
     db.commit()
     return {"message": "Vault item deleted"}
+
+
+# =====================================================
+# Batch mutations
+# =====================================================
+def _batch_errors(ops: List[VaultBatchOperation], owned_ids: set) -> List[Optional[str]]:
+    errors: List[Optional[str]] = []
+    seen = set()      # (op, id)
+    deleted = set()
+    touched = set()   # ids used by update/password
+
+    for op in ops:
+        err = None
+        if op.op in ("add", "password") and not _looks_like_aesgcm_b64(op.secret_enc):
+            err = "secret_enc must be AES-GCM base64 (iv+ciphertext)"
+        elif op.op != "add":
+            if op.id not in owned_ids:
+                err = "Item not found"
+            elif (op.op, op.id) in seen:
+                err = "Duplicate operation for this id"
+            elif op.id in deleted or (op.op == "delete" and op.id in touched):
+                err = "Cannot combine delete with other operations on the same id"
+            else:
+                seen.add((op.op, op.id))
+                (deleted if op.op == "delete" else touched).add(op.id)
+        errors.append(err)
+
+    return errors
+
+
+@router.post("/batch")
+def batch_vault(username: str, payload: VaultBatchRequest, db: Session = Depends(get_db)):
+    """
+    Apply add / update / password / delete operations in one transaction.
+    Everything is validated first; if any operation is invalid nothing is
+    applied and the per-operation results are returned with a 400.
+    """
+    user = _get_active_user(db, username)
+    ops = payload.operations
+
+    ref_ids = {op.id for op in ops if op.op != "add"}
+    owned_ids = set()
+    if ref_ids:
+        owned_ids = {
+            row.id
+            for row in db.query(VaultItem.id).filter(
+                VaultItem.user_id == user.id, VaultItem.id.in_(ref_ids)
+            )
+        }
+
+    errors = _batch_errors(ops, owned_ids)
+    if any(errors):
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": "Batch rejected, no operation was applied",
+                "results": [
+                    {"index": i, "op": op.op, "id": op.id, "status": "error" if err else "ok", "error": err}
+                    for i, (op, err) in enumerate(zip(ops, errors))
+                ],
+            },
+        )
+
+    new_items = [
+        VaultItem(
+            user_id=user.id,
+            site=op.site.strip(),
+            site_username=op.site_username.strip(),
+            secret_enc=op.secret_enc,
+        )
+        for op in ops if op.op == "add"
+    ]
+    updates = [
+        {"id": op.id, "site": op.site.strip(), "site_username": op.site_username.strip()}
+        for op in ops if op.op == "update"
+    ]
+    passwords = [{"id": op.id, "secret_enc": op.secret_enc} for op in ops if op.op == "password"]
+    delete_ids = [op.id for op in ops if op.op == "delete"]
+
+    if new_items:
+        db.add_all(new_items)
+        db.flush()  # batched INSERT, fills in the new ids
+    if updates:
+        db.execute(update(VaultItem), updates)  # bulk UPDATE by primary key
+    if passwords:
+        db.execute(update(VaultItem), passwords)
+    if delete_ids:
+        db.execute(
+            delete(VaultItem)
+            .where(VaultItem.user_id == user.id, VaultItem.id.in_(delete_ids))
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+
+    new_ids = iter(item.id for item in new_items)
+    return {
+        "results": [
+            {"index": i, "op": op.op, "id": next(new_ids) if op.op == "add" else op.id, "status": "ok"}
+            for i, op in enumerate(ops)
+        ]
+    }
+
+
+# =====================================================
+# NDJSON export / import
+# =====================================================
+EXPORT_FETCH_SIZE = 500
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_LINE_BYTES = 4 * 1024 * 1024
+IMPORT_MAX_REPORTED_ERRORS = 100
+
+
+def _export_lines(db: Session, user_id: int):
+    # Session الطلب نفسها: FastAPI يغلقها بعد إرسال آخر chunk، فالتصدير يبقى
+    # ضمن الـ slot الذي حجزه get_db بدل اتصال ثانٍ من الـ pool
+    result = db.execute(
+        select(VaultItem.id, VaultItem.site, VaultItem.site_username, VaultItem.secret_enc)
+        .where(VaultItem.user_id == user_id)
+        .order_by(VaultItem.id)
+        .execution_options(stream_results=True, yield_per=EXPORT_FETCH_SIZE)
+    )
+    # سطر JSON لكل عنصر، لكن chunk واحد لكل دفعة من الـ cursor
+    for rows in result.partitions():
+        yield "".join(
+            json.dumps(
+                {
+                    "id": row.id,
+                    "site": row.site,
+                    "site_username": row.site_username,
+                    "secret_enc": row.secret_enc,
+                },
+                separators=(",", ":"),
+            ) + "\n"
+            for row in rows
+        )
+
+
+@router.get("/export")
+def export_vault(username: str, db: Session = Depends(get_db)):
+    """Stream every item as NDJSON (one object per line) with a server-side cursor."""
+    user = _get_active_user(db, username)
+
+    return StreamingResponse(
+        _export_lines(db, user.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="vault.ndjson"'},
+    )
+
+
+def _parse_import_line(line: bytes, user_id: int) -> dict:
+    payload = VaultAddRequest.model_validate(json.loads(line))
+    if not _looks_like_aesgcm_b64(payload.secret_enc):
+        raise ValueError("secret_enc must be AES-GCM base64 (iv+ciphertext)")
+    return {
+        "user_id": user_id,
+        "site": payload.site.strip(),
+        "site_username": payload.site_username.strip(),
+        "secret_enc": payload.secret_enc,
+    }
+
+
+def _insert_batch(db: Session, rows: List[dict]) -> None:
+    db.execute(insert(VaultItem), rows)  # executemany
+    db.commit()
+
+
+@router.post("/import")
+async def import_vault(username: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Read an NDJSON body ({"site", "site_username", "secret_enc"} per line) as it
+    streams in and insert it in batches of IMPORT_BATCH_SIZE, one transaction
+    per batch. Invalid lines are skipped and reported; "id" is ignored.
+    """
+    user = await run_in_threadpool(_get_active_user, db, username)
+
+    imported = 0
+    errors = []
+    skipped = 0
+    batch: List[dict] = []
+    buf = b""
+    line_no = 0
+
+    async def handle(line: bytes):
+        nonlocal skipped
+        if not line.strip():
+            return
+        try:
+            batch.append(_parse_import_line(line, user.id))
+        except (ValueError, ValidationError) as e:
+            skipped += 1
+            if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+                errors.append({"line": line_no, "error": str(e).splitlines()[0]})
+
+    async for chunk in request.stream():
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        if len(buf) > IMPORT_MAX_LINE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Line {line_no + len(lines) + 1} too long")
+        for line in lines:
+            line_no += 1
+            await handle(line)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await run_in_threadpool(_insert_batch, db, batch)
+            imported += len(batch)
+            batch = []
+
+    if buf:
+        line_no += 1
+        await handle(buf)
+    if batch:
+        await run_in_threadpool(_insert_batch, db, batch)
+        imported += len(batch)
+
+    return {"imported": imported, "skipped": skipped, "errors": errors}
@@ -0,0 +1,157 @@
+# backend/app/api/v1/vault_routes_async.py
+#
+# نسخة async من vault_routes (DB_ASYNC=1): نفس المسارات ونفس الاستجابات،
+# لكن على AsyncSession بدل threadpool.
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app.db.session import get_async_db
+from app.core.security import Principal, aresolve_principal
+from app.db.models.vault_item import VaultItem
+from app.api.v1.vault_routes import (
+    _looks_like_aesgcm_b64,
+    VaultAddRequest,
+    VaultUpdateRequest,
+    VaultPasswordUpdateRequest,
+    VaultItemResponse,
+    VaultSecretResponse,
+    _list_columns,
+)
+
+router = APIRouter(prefix="/vault", tags=["Vault"])
+
+
+async def _active_user(db: AsyncSession, username: str) -> Principal:
+    user = await aresolve_principal(db, username)
+    if not user or not user.can_login:
+        raise HTTPException(status_code=400, detail="Invalid user")
+    return user
+
+
+async def _owned_item(db: AsyncSession, user: Principal, item_id: int) -> VaultItem:
+    item = (
+        await db.execute(
+            select(VaultItem).where(VaultItem.id == item_id, VaultItem.user_id == user.id)
+        )
+    ).scalars().first()
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return item
+
+
+@router.get(
+    "/list",
+    response_model=List[VaultItemResponse],
+    response_model_exclude_none=True,
+)
+async def list_vault(
+    username: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[int] = Query(None, ge=1),
+    include_secret: bool = True,
+    db: AsyncSession = Depends(get_async_db),
+):
+    user = await _active_user(db, username)
+
+    stmt = select(*_list_columns(include_secret)).where(VaultItem.user_id == user.id)
+    if cursor is not None:
+        stmt = stmt.where(VaultItem.id < cursor)
+    stmt = stmt.order_by(VaultItem.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+
+    items = (await db.execute(stmt)).all()
+
+    if limit is not None and len(items) == limit:
+        response.headers["X-Next-Cursor"] = str(items[-1].id)
+
+    return [
+        VaultItemResponse(
+            id=i.id,
+            site=i.site,
+            site_username=i.site_username,
+            secret_enc=i.secret_enc if include_secret else None,
+        )
+        for i in items
+    ]
+
+
+@router.get("/{item_id}/secret", response_model=VaultSecretResponse)
+async def get_vault_secret(username: str, item_id: int, db: AsyncSession = Depends(get_async_db)):
+    user = await _active_user(db, username)
+
+    row = (
+        await db.execute(
+            select(VaultItem.id, VaultItem.secret_enc)
+            .where(VaultItem.id == item_id, VaultItem.user_id == user.id)
+        )
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Item not found")
+
+    return VaultSecretResponse(id=row.id, secret_enc=row.secret_enc)
+
+
+@router.post("/add")
+async def add_vault_item(username: str, payload: VaultAddRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await _active_user(db, username)
+
+    if not _looks_like_aesgcm_b64(payload.secret_enc):
+        raise HTTPException(
+            status_code=400,
+            detail="secret_enc must be AES-GCM base64 (iv+ciphertext). Client-side encryption failed."
+        )
+
+    item = VaultItem(
+        user_id=user.id,
+        site=payload.site.strip(),
+        site_username=payload.site_username.strip(),
+        secret_enc=payload.secret_enc,
+    )
+    db.add(item)
+    await db.commit()
+
+    return {"message": "Vault item added", "id": item.id}
+
+
+@router.put("/{item_id}")
+async def update_vault_item(username: str, item_id: int, payload: VaultUpdateRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await _active_user(db, username)
+    item = await _owned_item(db, user, item_id)
+
+    item.site = payload.site.strip()
+    item.site_username = payload.site_username.strip()
+    await db.commit()
+
+    return {"message": "Vault item updated"}
+
+
+@router.put("/{item_id}/password")
+async def update_vault_password(username: str, item_id: int, payload: VaultPasswordUpdateRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await _active_user(db, username)
+    item = await _owned_item(db, user, item_id)
+
+    if not _looks_like_aesgcm_b64(payload.secret_enc):
+        raise HTTPException(
+            status_code=400,
+            detail="secret_enc must be AES-GCM base64 (iv+ciphertext). Client-side encryption failed."
+        )
+
+    item.secret_enc = payload.secret_enc
+    await db.commit()
+
+    return {"message": "Password updated"}
+
+
+@router.delete("/{item_id}")
+async def delete_vault_item(username: str, item_id: int, db: AsyncSession = Depends(get_async_db)):
+    user = await _active_user(db, username)
+    item = await _owned_item(db, user, item_id)
+
+    await db.delete(item)
+    await db.commit()
+    return {"message": "Vault item deleted"}
@@ -0,0 +1,113 @@
+# backend/app/core/admin_stats.py
+#
+# إحصائيات لوحة الإدارة على مستويين:
+#   - المستخدمون لكل role: استعلام واحد رخيص (users JOIN roles) مع snapshot
+#     قصير العمر يُلغى عند lock_user / change_role / bulk provisioning.
+#   - عدد الـ vault items والـ audit events: COUNT كامل للجدولين، لذلك في
+#     snapshot منفصل يتجدد ببطء (ADMIN_STATS_ACTIVITY_TTL_SEC) ولا تلغيه الكتابات.
+
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import case, func, select
+
+from app.core.config import settings
+from app.db.models.user import User
+from app.db.models.role import Role
+from app.db.models.vault_item import VaultItem
+from app.db.models.audit_log import AuditLog
+
+USER_KEYS = ("users", "active", "locked")
+
+
+def stats_query():
+    """One statement: per-role user / active / locked counts."""
+    return (
+        select(
+            Role.name.label("role"),
+            func.count(User.id).label("users"),
+            func.sum(case((User.is_active == True, 1), else_=0)).label("active"),
+            func.sum(case((User.is_locked == True, 1), else_=0)).label("locked"),
+        )
+        .select_from(User)
+        .outerjoin(Role, User.role_id == Role.id)
+        .group_by(Role.name)
+    )
+
+
+def activity_query():
+    """
+    Table-wide vault item / audit event counts. Plain COUNT(*) with no join
+    or GROUP BY, so the engine can count the narrowest secondary index
+    (ix_vault_items_user_id_id / ix_audit_logs_created_at) instead of rows.
+    """
+    return select(
+        select(func.count()).select_from(VaultItem).scalar_subquery().label("vault_items"),
+        select(func.count()).select_from(AuditLog).scalar_subquery().label("audit_events"),
+    )
+
+
+def build_stats(rows) -> dict:
+    by_role = {}
+    totals = dict.fromkeys(USER_KEYS, 0)
+    for r in rows:
+        entry = {key: int(getattr(r, key) or 0) for key in USER_KEYS}
+        by_role[r.role or "none"] = entry
+        for key, value in entry.items():
+            totals[key] += value
+
+    return {
+        "total_users": totals["users"],
+        "active_users": totals["active"],
+        "locked_users": totals["locked"],
+        "by_role": by_role,
+    }
+
+
+def build_activity(row) -> dict:
+    return {
+        "vault_items": int(row.vault_items or 0),
+        "audit_events": int(row.audit_events or 0),
+    }
+
+
+class StatsSnapshot:
+    """
+    Last computed stats, reused for ttl_sec; writers call invalidate().
+
+    put() takes the generation read before querying, so a query that raced
+    an invalidate() cannot re-cache pre-change numbers.
+    """
+
+    def __init__(self, ttl_sec: float):
+        self.ttl_sec = ttl_sec
+        self._value: Optional[dict] = None
+        self._expires_at = 0.0
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[dict]:
+        with self._lock:
+            if self._value is not None and time.monotonic() < self._expires_at:
+                return self._value
+            return None
+
+    def put(self, value: dict, generation: int) -> None:
+        if self.ttl_sec <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._value = value
+            self._expires_at = time.monotonic() + self.ttl_sec
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._value = None
+            self.generation += 1
+
+
+stats_snapshot = StatsSnapshot(ttl_sec=settings.ADMIN_STATS_TTL_SEC)
+# not invalidated: every vault write / audit event would otherwise discard it
+activity_snapshot = StatsSnapshot(ttl_sec=settings.ADMIN_STATS_ACTIVITY_TTL_SEC)
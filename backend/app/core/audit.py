@@ -1,25 +1,264 @@
-from sqlalchemy.orm import Session
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import anyio
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.db.session import SessionLocal
 from app.db.models.audit_log import AuditLog
-from app.db.models.user import User
 
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """
+    Batched, asynchronous audit log writer for high-volume events that may be
+    dropped under load; privileged admin actions use add_audit() instead.
+
+    Requests only enqueue a row (bounded queue); a background thread inserts
+    them with one executemany INSERT + COMMIT every `flush_interval_ms` or
+    every `batch_size` events, whichever comes first. When the queue is full
+    submit() waits up to `enqueue_timeout_ms` (backpressure) and then drops
+    the event and counts it. stop() drains the queue before returning; events
+    submitted after that are dropped until start() is called again.
+    """
+
+    def __init__(
+        self,
+        max_queue: int,
+        batch_size: int,
+        flush_interval_ms: int,
+        enqueue_timeout_ms: int,
+        session_factory=SessionLocal,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval_sec = flush_interval_ms / 1000
+        self.enqueue_timeout_sec = enqueue_timeout_ms / 1000
+        self._session_factory = session_factory
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.written_count = 0
+        self.dropped_count = 0
+        self.failed_count = 0
+        self.batches_count = 0
+
+    # ----------------------------------------------
+    # Producer side
+    # ----------------------------------------------
+    def start(self) -> None:
+        with self._lock:
+            self._closed = False
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def _drop(self, row: dict, reason: str) -> bool:
+        with self._lock:
+            self.dropped_count += 1
+        logger.warning("Audit %s, dropping %s event", reason, row.get("action"))
+        return False
+
+    def offer(self, row: dict) -> bool:
+        """Non-blocking enqueue; False when the queue is full (nothing counted)."""
+        if self._closed:
+            return self._drop(row, "writer stopped")
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            return False
+
+    def submit(self, row: dict) -> bool:
+        """Blocking enqueue (up to enqueue_timeout_ms); never call it on the event loop."""
+        if self._closed:
+            return self._drop(row, "writer stopped")
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put(row, timeout=self.enqueue_timeout_sec)
+            return True
+        except queue.Full:
+            return self._drop(row, "queue full")
+
+    # ----------------------------------------------
+    # Consumer side
+    # ----------------------------------------------
+    def _next_batch(self) -> List[dict]:
+        try:
+            first = self._queue.get(timeout=self.flush_interval_sec)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval_sec
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[dict]) -> None:
+        db = self._session_factory()
+        try:
+            db.execute(insert(AuditLog), batch)
+            db.commit()
+            with self._lock:
+                self.written_count += len(batch)
+                self.batches_count += 1
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self.failed_count += len(batch)
+            logger.exception("Failed to write %d audit events", len(batch))
+        finally:
+            db.close()
+
+    def _drain(self) -> None:
+        batch: List[dict] = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+        self._drain()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush everything still queued and stop the writer thread."""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "written": self.written_count,
+                "batches": self.batches_count,
+                "dropped": self.dropped_count,
+                "failed": self.failed_count,
+            }
+
+
+audit_writer = AuditWriter(
+    max_queue=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval_ms=settings.AUDIT_FLUSH_INTERVAL_MS,
+    enqueue_timeout_ms=settings.AUDIT_ENQUEUE_TIMEOUT_MS,
+)
 
+
+def _audit_row(action, admin_username, target_username, details, ip) -> dict:
+    return {
+        # event time, not flush time
+        "created_at": datetime.now(),
+        "action": action,
+        "admin_username": admin_username,
+        "target_username": target_username,
+        "details": details,
+        "ip_address": ip,
+    }
+
+
+# ======================================================
+# Privileged admin actions: written synchronously
+# ======================================================
+def add_audit(
+    db,
+    action: str,
+    admin_username: str,
+    target_username: str,
+    details: str | None = None,
+    ip: str | None = None,
+) -> AuditLog:
+    """
+    Add the audit row to the caller's Session (sync or async), so it commits
+    in the same transaction as the change it records: the change is never
+    committed without its row.
+    """
+    log = AuditLog(**_audit_row(action, admin_username, target_username, details, ip))
+    db.add(log)
+    return log
+
+
+def write_audit(
+    action: str,
+    admin_username: str,
+    target_username: str,
+    details: str | None = None,
+    ip: str | None = None,
+) -> None:
+    """add_audit() + commit on a Session of its own, for callers without one."""
+    db = SessionLocal()
+    try:
+        add_audit(db, action, admin_username, target_username, details, ip)
+        db.commit()
+    finally:
+        db.close()
+
+
+# ======================================================
+# High-volume, non-privileged events: batched writer
+# ======================================================
 def log_audit(
-    db: Session,
     action: str,
-    actor: User,
-    target: User | None = None,
+    admin_username: str,
+    target_username: str,
     details: str | None = None,
     ip: str | None = None,
-):
-    log = AuditLog(
-        action=action,
-        actor_user_id=actor.id,
-        actor_username=actor.username,
-        target_user_id=target.id if target else None,
-        target_username=target.username if target else None,
-        details=details,
-        ip_address=ip,
-    )
+) -> bool:
+    """
+    Queue an audit event; returns False if it had to be dropped. Only for
+    events that may be lost under load, never for admin actions (add_audit).
+    """
+    return audit_writer.submit(_audit_row(action, admin_username, target_username, details, ip))
 
-    db.add(log)
-    db.commit()
+
+async def alog_audit(
+    action: str,
+    admin_username: str,
+    target_username: str,
+    details: str | None = None,
+    ip: str | None = None,
+) -> bool:
+    """
+    log_audit() for async handlers: enqueues without blocking the event loop;
+    only a full queue waits (in a worker thread) for the backpressure timeout.
+    """
+    row = _audit_row(action, admin_username, target_username, details, ip)
+    if audit_writer.offer(row):
+        return True
+    return await anyio.to_thread.run_sync(audit_writer.submit, row)
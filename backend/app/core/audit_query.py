@@ -0,0 +1,95 @@
+# backend/app/core/audit_query.py
+#
+# استعلام سجل التدقيق مع فلاتر على السيرفر (action / admin / target / وقت)
+# وترقيم keyset على (created_at, id) بدل LIMIT 100 + فلترة في المتصفح.
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+
+from app.db.models.audit_log import AuditLog
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(log) -> str:
+    return f"{log.created_at.isoformat()},{log.id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, _, log_id = cursor.rpartition(",")
+        return datetime.fromisoformat(created_at), int(log_id)
+    except ValueError:
+        raise InvalidCursorError("Invalid cursor")
+
+
+def _local_naive(value: datetime) -> datetime:
+    # created_at is a naive local timestamp (DB now() / datetime.now())
+    if value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+@dataclass(frozen=True)
+class AuditFilter:
+    action: Optional[str] = None
+    admin: Optional[str] = None
+    target: Optional[str] = None
+    since: Optional[datetime] = None   # inclusive
+    until: Optional[datetime] = None   # exclusive
+
+
+def audit_page_query(filters: AuditFilter, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
+    """
+    Newest first. Equality on action/target (or admin) plus a created_at range
+    maps onto the (action|target_username, created_at) indexes; the cursor
+    condition is written as an OR so MySQL can still use it as a range.
+    """
+    stmt = select(AuditLog)
+
+    if filters.action:
+        stmt = stmt.where(AuditLog.action == filters.action)
+    if filters.admin:
+        stmt = stmt.where(AuditLog.admin_username == filters.admin)
+    if filters.target:
+        stmt = stmt.where(AuditLog.target_username == filters.target)
+    if filters.since is not None:
+        stmt = stmt.where(AuditLog.created_at >= _local_naive(filters.since))
+    if filters.until is not None:
+        stmt = stmt.where(AuditLog.created_at < _local_naive(filters.until))
+
+    if cursor:
+        created_at, log_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            or_(
+                AuditLog.created_at < created_at,
+                and_(AuditLog.created_at == created_at, AuditLog.id < log_id),
+            )
+        )
+
+    return stmt.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(limit)
+
+
+def next_cursor(logs, limit: int) -> Optional[str]:
+    if len(logs) == limit:
+        return encode_cursor(logs[-1])
+    return None
+
+
+def audit_row(log) -> dict:
+    return {
+        "time": log.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+        "action": log.action,
+        "admin": log.admin_username,
+        "target": log.target_username,
+        "details": log.details,
+        "ip": log.ip_address,
+    }
@@ -0,0 +1,397 @@
+# backend/app/core/audit_retention.py
+#
+# الاحتفاظ بسجل التدقيق (retention):
+# - MySQL: جدول audit_logs مقسّم شهرياً (RANGE على TO_DAYS(created_at))،
+#   الشهر المنتهي يُؤرشف ثم يُحذف بـ DROP PARTITION (عملية metadata، بدون
+#   أقفال على صفوف الجدول الحي)، ويُضاف مسبقاً partitions للأشهر القادمة.
+# - SQLite / جدول غير مقسّم: نفس الأرشفة ثم حذف على دفعات صغيرة (fallback).
+# الأرشيف: ملف NDJSON مضغوط (gzip أو zstd) لكل شهر.
+
+import contextlib
+import gzip
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, text
+
+from app.core.config import settings
+from app.db.session import engine as default_engine
+from app.db.models.audit_log import AuditLog
+
+try:
+    import zstandard
+except ImportError:  # optional: gzip only
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+TABLE = AuditLog.__tablename__
+MAX_PARTITION = "pmax"
+ARCHIVE_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+STREAM_BATCH_SIZE = 5000
+DELETE_BATCH_SIZE = 5000
+
+_PARTITION_NAME = re.compile(r"^p(\d{4})(\d{2})$")
+
+
+# =====================================================
+# Months
+# =====================================================
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, n: int) -> date:
+    years, index = divmod(month.month - 1 + n, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"p{month:%Y%m}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    m = _PARTITION_NAME.match(name or "")
+    return date(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+
+def month_bound(month: date) -> datetime:
+    return datetime.combine(month, time.min)
+
+
+def retention_cutoff(now: datetime, months: int) -> date:
+    """Rows created before this day are expired (whole months only)."""
+    return add_months(month_start(now), -months)
+
+
+# =====================================================
+# Archive files
+# =====================================================
+
+def check_compression(compression: str) -> None:
+    if compression not in ARCHIVE_EXTENSIONS:
+        raise ValueError(f"Unknown archive compression: {compression}")
+    if compression == "zstd" and zstandard is None:
+        raise RuntimeError("zstd archives need the 'zstandard' package")
+
+
+def _compressor(raw, compression: str):
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False)
+    return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0)
+
+
+def _archive_path(directory: str, month: date, compression: str) -> str:
+    base = os.path.join(directory, f"{TABLE}-{month:%Y-%m}")
+    ext = ".ndjson" + ARCHIVE_EXTENSIONS[compression]
+    path, n = base + ext, 1
+    # never overwrite: an earlier run may have archived (and deleted) part of this month
+    while os.path.exists(path):
+        path, n = f"{base}.{n}{ext}", n + 1
+    return path
+
+
+def archive_row(row) -> dict:
+    return {
+        "id": row["id"],
+        "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+        "action": row["action"],
+        "admin_username": row["admin_username"],
+        "target_username": row["target_username"],
+        "details": row["details"],
+        "ip_address": row["ip_address"],
+    }
+
+
+def write_archive(directory: str, month: date, rows: Iterable[dict], compression: str) -> Tuple[Optional[str], int]:
+    """Write rows as compressed NDJSON; the file is fsynced before this returns."""
+    os.makedirs(directory, exist_ok=True)
+    path = _archive_path(directory, month, compression)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    count = 0
+    try:
+        with open(tmp, "wb") as raw:
+            with _compressor(raw, compression) as out:
+                for row in rows:
+                    out.write(json.dumps(row, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n")
+                    count += 1
+            raw.flush()
+            os.fsync(raw.fileno())
+    except BaseException:
+        # open() itself may have failed: don't mask that error with this one
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+
+    if count == 0:
+        os.remove(tmp)
+        return None, 0
+    os.replace(tmp, path)
+    return path, count
+
+
+def _stream_rows(conn, stmt, params=None):
+    result = conn.execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE).execute(stmt, params or {})
+    for row in result.mappings():
+        yield archive_row(row)
+
+
+# =====================================================
+# Report
+# =====================================================
+
+@dataclass
+class RetentionReport:
+    mode: str                      # "partitions" | "batched-delete"
+    cutoff: date
+    dry_run: bool
+    created: List[str] = field(default_factory=list)    # new partitions
+    expired: List[dict] = field(default_factory=list)   # {"month", "rows", "file"}
+
+    def to_dict(self) -> dict:
+        return {
+            "mode": self.mode,
+            "cutoff": self.cutoff.isoformat(),
+            "dry_run": self.dry_run,
+            "created_partitions": self.created,
+            "expired": self.expired,
+            "rows": sum(e["rows"] for e in self.expired),
+        }
+
+
+# =====================================================
+# MySQL monthly partitions
+# =====================================================
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    month: Optional[date]          # None for pmax / unknown names
+    rows: int                      # InnoDB estimate
+
+
+class MySqlPartitions:
+    """
+    audit_logs partitioned by RANGE (TO_DAYS(created_at)), one partition per
+    month plus a MAXVALUE catch-all.
+
+    MySQL requires the partitioning column in every unique key, so
+    partition_table() changes the physical primary key to (id, created_at).
+    id stays unique (auto increment) and is still indexed on its own, so the
+    ORM mapping is unchanged.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def list(self) -> List[Partition]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT PARTITION_NAME, TABLE_ROWS FROM information_schema.PARTITIONS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+                    "AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION"
+                ),
+                {"table": TABLE},
+            ).all()
+        return [Partition(name, partition_month(name), int(n or 0)) for name, n in rows]
+
+    def is_partitioned(self) -> bool:
+        return bool(self.list())
+
+    @staticmethod
+    def _definition(month: date) -> str:
+        return f"PARTITION {partition_name(month)} VALUES LESS THAN (TO_DAYS('{add_months(month, 1).isoformat()}'))"
+
+    def partition_table(self, now: datetime, ahead: int) -> List[str]:
+        """
+        One-time conversion of an unpartitioned table. This rebuilds
+        audit_logs (a full copy), so run it in a maintenance window.
+        """
+        with self.engine.connect() as conn:
+            oldest = conn.execute(select(func.min(AuditLog.created_at))).scalar()
+
+        first = month_start(oldest or now)
+        last = add_months(month_start(now), ahead)
+        months = []
+        month = first
+        while month <= last:
+            months.append(month)
+            month = add_months(month, 1)
+
+        definitions = ", ".join(self._definition(m) for m in months)
+        with self.engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)"))
+            conn.execute(
+                text(
+                    f"ALTER TABLE {TABLE} PARTITION BY RANGE (TO_DAYS(created_at)) "
+                    f"({definitions}, PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE)"
+                )
+            )
+        return [partition_name(m) for m in months]
+
+    def ensure_future(self, now: datetime, ahead: int, dry_run: bool = False) -> List[str]:
+        """Split pmax so that the current month and `ahead` more have their own partition."""
+        partitions = self.list()
+        months = [p.month for p in partitions if p.month is not None]
+        if not months:
+            return []
+
+        wanted = []
+        month = add_months(max(months), 1)
+        last = add_months(month_start(now), ahead)
+        while month <= last:
+            wanted.append(month)
+            month = add_months(month, 1)
+
+        if wanted and not dry_run:
+            definitions = ", ".join(self._definition(m) for m in wanted)
+            with self.engine.begin() as conn:
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {TABLE} REORGANIZE PARTITION {MAX_PARTITION} INTO "
+                        f"({definitions}, PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE)"
+                    )
+                )
+        return [partition_name(m) for m in wanted]
+
+    def expire(self, cutoff: date, archive_dir: Optional[str], compression: str, dry_run: bool) -> List[dict]:
+        expired = []
+        for p in self.list():
+            if p.month is None or add_months(p.month, 1) > cutoff:
+                continue
+            entry = {"month": f"{p.month:%Y-%m}", "rows": p.rows, "file": None}
+            if not dry_run:
+                if archive_dir:
+                    with self.engine.connect() as conn:
+                        stmt = text(f"SELECT * FROM {TABLE} PARTITION ({p.name})")
+                        entry["file"], entry["rows"] = write_archive(
+                            archive_dir, p.month, _stream_rows(conn, stmt), compression
+                        )
+                with self.engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {TABLE} DROP PARTITION {p.name}"))
+                logger.info("Audit partition %s dropped (%s rows)", p.name, entry["rows"])
+            expired.append(entry)
+        return expired
+
+
+# =====================================================
+# Fallback: archive + batched DELETE (SQLite, unpartitioned tables)
+# =====================================================
+
+class BatchedDelete:
+    """
+    Month-by-month archive, then DELETE by primary key in small batches, each
+    in its own short transaction, so writers are never blocked for long.
+    """
+
+    def __init__(self, engine, batch_size: int = DELETE_BATCH_SIZE):
+        self.engine = engine
+        self.batch_size = batch_size
+
+    def _count(self, conn, lo: datetime, hi: datetime) -> int:
+        return conn.execute(
+            select(func.count()).select_from(AuditLog)
+            .where(AuditLog.created_at >= lo, AuditLog.created_at < hi)
+        ).scalar()
+
+    def _delete_month(self, lo: datetime, hi: datetime) -> None:
+        while True:
+            with self.engine.begin() as conn:
+                ids = conn.execute(
+                    select(AuditLog.id)
+                    .where(AuditLog.created_at >= lo, AuditLog.created_at < hi)
+                    .limit(self.batch_size)
+                ).scalars().all()
+                if not ids:
+                    return
+                conn.execute(delete(AuditLog).where(AuditLog.id.in_(ids)))
+
+    def expire(self, cutoff: date, archive_dir: Optional[str], compression: str, dry_run: bool) -> List[dict]:
+        with self.engine.connect() as conn:
+            oldest = conn.execute(
+                select(func.min(AuditLog.created_at)).where(AuditLog.created_at < month_bound(cutoff))
+            ).scalar()
+        if oldest is None:
+            return []
+
+        expired = []
+        month = month_start(oldest)
+        while month < cutoff:
+            lo, hi = month_bound(month), month_bound(add_months(month, 1))
+            with self.engine.connect() as conn:
+                rows = self._count(conn, lo, hi)
+            if rows:
+                entry = {"month": f"{month:%Y-%m}", "rows": rows, "file": None}
+                if not dry_run:
+                    if archive_dir:
+                        with self.engine.connect() as conn:
+                            stmt = (
+                                select(AuditLog.__table__)
+                                .where(AuditLog.created_at >= lo, AuditLog.created_at < hi)
+                                .order_by(AuditLog.created_at, AuditLog.id)
+                            )
+                            entry["file"], entry["rows"] = write_archive(
+                                archive_dir, month, _stream_rows(conn, stmt), compression
+                            )
+                    self._delete_month(lo, hi)
+                    logger.info("Audit month %s deleted (%s rows)", entry["month"], entry["rows"])
+                expired.append(entry)
+            month = add_months(month, 1)
+        return expired
+
+
+# =====================================================
+# Entry points
+# =====================================================
+
+def partition_audit_log(now: Optional[datetime] = None, ahead: Optional[int] = None, engine=default_engine) -> List[str]:
+    if engine.dialect.name != "mysql":
+        raise RuntimeError("Monthly partitions are only supported on MySQL")
+    partitions = MySqlPartitions(engine)
+    if partitions.is_partitioned():
+        return []
+    return partitions.partition_table(
+        now or datetime.now(),
+        settings.AUDIT_PARTITIONS_AHEAD if ahead is None else ahead,
+    )
+
+
+def run_retention(
+    now: Optional[datetime] = None,
+    months: Optional[int] = None,
+    archive: bool = True,
+    archive_dir: Optional[str] = None,
+    compression: Optional[str] = None,
+    dry_run: bool = False,
+    engine=default_engine,
+) -> RetentionReport:
+    """Archive and remove audit rows older than `months` whole months."""
+    now = now or datetime.now()
+    months = settings.AUDIT_RETENTION_MONTHS if months is None else months
+    if months < 1:
+        raise ValueError("Retention must keep at least one month")
+    compression = compression or settings.AUDIT_ARCHIVE_COMPRESSION
+    check_compression(compression)
+    archive_dir = (archive_dir or settings.AUDIT_ARCHIVE_DIR) if archive else None
+
+    cutoff = retention_cutoff(now, months)
+
+    partitions = MySqlPartitions(engine) if engine.dialect.name == "mysql" else None
+    if partitions is not None and partitions.is_partitioned():
+        report = RetentionReport(mode="partitions", cutoff=cutoff, dry_run=dry_run)
+        report.created = partitions.ensure_future(now, settings.AUDIT_PARTITIONS_AHEAD, dry_run)
+        report.expired = partitions.expire(cutoff, archive_dir, compression, dry_run)
+        return report
+
+    if partitions is not None:
+        logger.warning("audit_logs is not partitioned; falling back to batched DELETE")
+    report = RetentionReport(mode="batched-delete", cutoff=cutoff, dry_run=dry_run)
+    report.expired = BatchedDelete(engine).expire(cutoff, archive_dir, compression, dry_run)
+    return report
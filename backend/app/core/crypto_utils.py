@@ -3,6 +3,10 @@ import base64
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from argon2.low_level import hash_secret_raw, Type
 
+# معاملات Argon2id (كل عملية اشتقاق تحجز ARGON2_MEMORY_COST_KIB من الذاكرة)
+ARGON2_TIME_COST = 3
+ARGON2_MEMORY_COST_KIB = 65536
+ARGON2_PARALLELISM = 4
 
 # توليد DEK عشوائي (32 بايت)
 def generate_dek() -> bytes:
@@ -17,9 +21,9 @@ def derive_kek(password: str, salt: bytes) -> bytes:
     kek = hash_secret_raw(
         secret=password.encode("utf-8"),
         salt=salt,
-        time_cost=3,
-        memory_cost=65536,
-        parallelism=4,
+        time_cost=ARGON2_TIME_COST,
+        memory_cost=ARGON2_MEMORY_COST_KIB,
+        parallelism=ARGON2_PARALLELISM,
         hash_len=32,
         type=Type.ID,
     )
@@ -0,0 +1,72 @@
+# backend/app/core/face_matcher.py
+#
+# مطابقة بصمات الوجه (face-api descriptors: 128 × Float32) على السيرفر باستخدام
+# NumPy: مسافة إقليدية لعدة عينات حيّة دفعة واحدة + median كما في الواجهة.
+# فحص التكرار 1:N عند التسجيل يقرأ المراجع المخزّنة من قاعدة البيانات
+# (app/core/face_reference.py).
+
+import base64
+import binascii
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+EMBEDDING_DIM = 128
+# نفس العتبة التي كانت تُطبّق في frontend/mfa/face_verify/script.js (median ≤ 0.55)
+MATCH_THRESHOLD = 0.55
+
+_FLOAT32_LE = np.dtype("<f4")
+
+
+class InvalidEmbeddingError(ValueError):
+    pass
+
+
+def decode_embeddings(data: bytes, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Little-endian Float32 bytes (as sent by the browser) -> (n, dim) float32 array."""
+    if not data or len(data) % (4 * dim) != 0:
+        raise InvalidEmbeddingError(f"expected a multiple of {dim} float32 values")
+    arr = np.frombuffer(data, dtype=_FLOAT32_LE).reshape(-1, dim).astype(np.float32)
+    if not np.isfinite(arr).all():
+        raise InvalidEmbeddingError("embedding contains non-finite values")
+    return arr
+
+
+def decode_embedding_b64(value: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """One base64 Float32 descriptor -> (dim,) array."""
+    try:
+        raw = base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        raise InvalidEmbeddingError("embedding is not valid base64")
+    arr = decode_embeddings(raw, dim)
+    if arr.shape[0] != 1:
+        raise InvalidEmbeddingError("expected exactly one embedding")
+    return arr[0]
+
+
+def euclidean_distances(reference: np.ndarray, samples: np.ndarray) -> np.ndarray:
+    """Distances from reference (dim,) to each row of samples (n, dim), in one call."""
+    return np.linalg.norm(samples - reference, axis=1)
+
+
+@dataclass(frozen=True)
+class MatchResult:
+    distances: List[float]
+    distance: float          # median of distances
+    threshold: float
+    matched: bool
+
+
+def match(reference: np.ndarray, samples: np.ndarray, threshold: float = MATCH_THRESHOLD) -> MatchResult:
+    """1:1 median-of-N decision, same rule as the client: median distance <= threshold."""
+    if samples.ndim == 1:
+        samples = samples[np.newaxis, :]
+    dists = euclidean_distances(reference, samples)
+    median = float(np.median(dists))
+    return MatchResult(
+        distances=[float(d) for d in dists],
+        distance=median,
+        threshold=threshold,
+        matched=median <= threshold,
+    )
@@ -0,0 +1,127 @@
+# backend/app/core/face_reference.py
+#
+# مرجع الوجه الذي يملكه السيرفر (users.face_reference): الـ embedding المسجّل
+# مشفّراً بمفتاح السيرفر (AES-GCM)، حتى يقارن /mfa/face/verify العينات الحيّة
+# بمرجع لا يتحكم به العميل. القالب المشفّر بالـ DEK (face_template) يبقى
+# نسخة العميل فقط.
+#
+#   [version:1][nonce:12][ciphertext+tag]   AAD = "face-reference:<user_id>"
+
+import base64
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.exceptions import InvalidTag
+
+from app.core.config import settings
+from app.core.face_matcher import EMBEDDING_DIM, MATCH_THRESHOLD, decode_embeddings, euclidean_distances
+from app.db.models.user import User
+
+FACE_REFERENCE_VERSION = 1
+NONCE_LEN = 12
+SCAN_BATCH_SIZE = 1000
+
+
+class InvalidFaceReferenceError(ValueError):
+    pass
+
+
+def _server_key() -> bytes:
+    if settings.FACE_REFERENCE_KEY:
+        key = base64.b64decode(settings.FACE_REFERENCE_KEY)
+        if len(key) != 32:
+            raise ValueError("FACE_REFERENCE_KEY must be 32 bytes, base64-encoded")
+        return key
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"pw_manager_mfa face-reference v1",
+    ).derive(settings.SECRET_KEY.encode("utf-8"))
+
+
+_aead = AESGCM(_server_key())
+
+
+def _aad(user_id: int) -> bytes:
+    # bound to the row: a sealed reference copied to another user won't open
+    return f"face-reference:{user_id}".encode("ascii")
+
+
+def seal_reference(user_id: int, embedding: np.ndarray) -> bytes:
+    data = np.asarray(embedding, dtype="<f4").reshape(EMBEDDING_DIM).tobytes()
+    nonce = os.urandom(NONCE_LEN)
+    return bytes([FACE_REFERENCE_VERSION]) + nonce + _aead.encrypt(nonce, data, _aad(user_id))
+
+
+def open_reference(user_id: int, blob: bytes) -> np.ndarray:
+    if not blob or blob[0] != FACE_REFERENCE_VERSION:
+        raise InvalidFaceReferenceError("Unsupported face reference format")
+    nonce, ct = blob[1:1 + NONCE_LEN], blob[1 + NONCE_LEN:]
+    try:
+        data = _aead.decrypt(nonce, ct, _aad(user_id))
+    except InvalidTag:
+        raise InvalidFaceReferenceError("Face reference does not decrypt with the server key")
+    return decode_embeddings(data)[0]
+
+
+def _open_batch(rows) -> Tuple[List[int], np.ndarray]:
+    """(user_id, blob) rows -> ids and an (n, dim) matrix, skipping rows that don't open."""
+    ids, plain = [], []
+    for user_id, blob in rows:
+        if not blob or blob[0] != FACE_REFERENCE_VERSION:
+            continue
+        try:
+            data = _aead.decrypt(blob[1:1 + NONCE_LEN], blob[1 + NONCE_LEN:], _aad(user_id))
+        except InvalidTag:
+            continue
+        if len(data) == 4 * EMBEDDING_DIM:
+            ids.append(user_id)
+            plain.append(data)
+    # one frombuffer for the batch instead of one array per reference
+    refs = np.frombuffer(b"".join(plain), dtype="<f4").reshape(-1, EMBEDDING_DIM)
+    keep = np.isfinite(refs).all(axis=1)
+    if not keep.all():
+        ids = [i for i, k in zip(ids, keep) if k]
+        refs = refs[keep]
+    return ids, refs
+
+
+def find_enrolled_match(
+    db,
+    embedding: np.ndarray,
+    exclude_user_id: int,
+    threshold: float = MATCH_THRESHOLD,
+) -> Optional[int]:
+    """
+    1:N duplicate check against every stored reference: id of another user
+    whose face is within threshold, else None. Reads the table in keyset
+    batches, decrypts each reference and compares the batch in one
+    vectorized call, so it sees enrollments from every worker. Cost grows
+    linearly with enrolled users (benchmarks/bench_face_matcher.py: a few
+    µs per reference); it runs on enrollment only, never on login.
+    """
+    query = np.asarray(embedding, dtype=np.float32)
+    last_id = 0
+    while True:
+        rows = (
+            db.query(User.id, User.face_reference)
+            .filter(User.id > last_id, User.face_reference.isnot(None))
+            .order_by(User.id)
+            .limit(SCAN_BATCH_SIZE)
+            .all()
+        )
+        if not rows:
+            return None
+        last_id = rows[-1].id
+
+        ids, refs = _open_batch(row for row in rows if row.id != exclude_user_id)
+        if ids:
+            dists = euclidean_distances(query, refs)
+            hit = int(np.argmin(dists))
+            if dists[hit] <= threshold:
+                return ids[hit]
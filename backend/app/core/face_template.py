@@ -0,0 +1,50 @@
+# backend/app/core/face_template.py
+#
+# صيغة تخزين قالب الوجه المشفّر في users.face_template (LargeBinary):
+#   [version:1][nonce:12][ciphertext+tag]
+# الـ API يستقبل/يرجع nonce + ciphertext فقط (Base64 في JSON أو خام عبر
+# application/octet-stream).
+
+import base64
+import binascii
+
+FACE_TEMPLATE_VERSION = 1
+AES_GCM_NONCE_LEN = 12
+AES_GCM_TAG_LEN = 16
+MIN_PAYLOAD_LEN = AES_GCM_NONCE_LEN + AES_GCM_TAG_LEN + 1
+MAX_PAYLOAD_LEN = 64 * 1024
+
+OCTET_STREAM = "application/octet-stream"
+
+
+class InvalidFaceTemplateError(ValueError):
+    pass
+
+
+def validate_payload(payload: bytes) -> bytes:
+    if not MIN_PAYLOAD_LEN <= len(payload) <= MAX_PAYLOAD_LEN:
+        raise InvalidFaceTemplateError("Invalid face template payload")
+    return payload
+
+
+def pack_template(payload: bytes) -> bytes:
+    """nonce + ciphertext -> stored blob."""
+    return bytes([FACE_TEMPLATE_VERSION]) + validate_payload(payload)
+
+
+def unpack_template(blob: bytes) -> bytes:
+    """Stored blob -> nonce + ciphertext."""
+    if not blob or blob[0] != FACE_TEMPLATE_VERSION:
+        raise InvalidFaceTemplateError("Unsupported face template format")
+    return blob[1:]
+
+
+def payload_from_b64(value: str) -> bytes:
+    try:
+        return validate_payload(base64.b64decode(value, validate=True))
+    except (binascii.Error, ValueError):
+        raise InvalidFaceTemplateError("Invalid face template payload")
+
+
+def payload_to_b64(payload: bytes) -> str:
+    return base64.b64encode(payload).decode("utf-8")
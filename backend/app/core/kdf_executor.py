@@ -0,0 +1,166 @@
+# backend/app/core/kdf_executor.py
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.crypto_utils import derive_kek, ARGON2_MEMORY_COST_KIB
+from app.core.metrics import kdf_duration
+from app.core.tracing import span
+
+
+class KdfSaturatedError(Exception):
+    """Raised when the KDF executor has no free worker or queue slot."""
+
+
+def _default_workers() -> int:
+    cores = os.cpu_count() or 1
+    per_hash_mb = ARGON2_MEMORY_COST_KIB // 1024
+    by_memory = max(1, settings.KDF_MEMORY_BUDGET_MB // per_hash_mb)
+    return max(1, min(cores, by_memory))
+
+
+class KdfExecutor:
+    """
+    Runs Argon2id (derive_kek) in a dedicated process pool.
+
+    At most `workers` hashes run at once and at most `queue_limit` more may
+    wait; anything beyond that is rejected immediately with KdfSaturatedError
+    instead of parking another request thread. This keeps a registration
+    burst from filling the request threadpool and starving cheap endpoints.
+
+    Background jobs (bulk provisioning) use map(), which runs in the same
+    pool and takes the same slots, so they get a share of this budget rather
+    than a second pool next to it.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self._pending = 0
+        self.completed_count = 0
+        self.rejected_count = 0
+        self.latency_total_sec = 0.0
+        self.latency_max_sec = 0.0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def start(self) -> None:
+        """
+        Fork the workers now (with fork, the first submit starts all of them):
+        called at startup, before the audit writer and threadpool threads exist.
+        """
+        self._get_pool().submit(os.getpid).result()
+
+    def _admit(self) -> float:
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected_count += 1
+            raise KdfSaturatedError("KDF executor saturated")
+
+        with self._stats_lock:
+            self._pending += 1
+        return time.perf_counter()
+
+    def _acquire(self) -> float:
+        # background work: wait for a slot instead of failing
+        self._slots.acquire()
+        with self._stats_lock:
+            self._pending += 1
+        return time.perf_counter()
+
+    def _release(self, started: float, observe: bool = True) -> None:
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self._pending -= 1
+            self.completed_count += 1
+            self.latency_total_sec += elapsed
+            self.latency_max_sec = max(self.latency_max_sec, elapsed)
+        self._slots.release()
+        if observe:
+            kdf_duration.observe(elapsed)
+
+    def derive_kek(self, password: str, salt: bytes) -> bytes:
+        with span("kdf.derive_kek"):
+            started = self._admit()
+            try:
+                return self._get_pool().submit(derive_kek, password, salt).result()
+            finally:
+                self._release(started)
+
+    async def aderive_kek(self, password: str, salt: bytes) -> bytes:
+        """Same as derive_kek, but awaits the pool future instead of blocking a thread."""
+        with span("kdf.derive_kek"):
+            started = self._admit()
+            try:
+                future = self._get_pool().submit(derive_kek, password, salt)
+                return await asyncio.wrap_future(future)
+            finally:
+                self._release(started)
+
+    def map(self, fn: Callable, items: Sequence, limit: int) -> List:
+        """
+        [fn(item) for item in items] in the pool, at most `limit` at a time.
+        Each call holds a slot like a request does; the rest of the slots
+        stay available to logins and registrations.
+        """
+        limit = max(1, min(limit, self.workers))
+        window = threading.BoundedSemaphore(limit)
+
+        def done(started: float, _future) -> None:
+            self._release(started, observe=False)
+            window.release()
+
+        futures = []
+        for item in items:
+            window.acquire()
+            started = self._acquire()
+            try:
+                future = self._get_pool().submit(fn, item)
+            except BaseException:
+                done(started, None)
+                raise
+            future.add_done_callback(functools.partial(done, started))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            done = self.completed_count
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "in_flight": min(self._pending, self.workers),
+                "queue_depth": max(0, self._pending - self.workers),
+                "completed": done,
+                "rejected": self.rejected_count,
+                "latency_avg_sec": self.latency_total_sec / done if done else 0.0,
+                "latency_max_sec": self.latency_max_sec,
+            }
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+
+kdf_executor = KdfExecutor(
+    workers=settings.KDF_WORKERS or _default_workers(),
+    queue_limit=settings.KDF_QUEUE_LIMIT,
+)
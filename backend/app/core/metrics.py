@@ -0,0 +1,301 @@
+# backend/app/core/metrics.py
+#
+# مقاييس بصيغة Prometheus النصية (/metrics) بدون مكتبة خارجية:
+# Counter / Gauge / Histogram مع labels، وcollectors تُستدعى وقت الـ scrape
+# (لقراءة stats() من الـ pool، الـ KDF executor، الكاش...).
+#
+# المسار الساخن (observe / inc) = قفل + bisect + زيادة عدّاد، بدون تخصيص
+# ذاكرة بعد أول ظهور لمجموعة labels.
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import event
+
+# (name, type, help, [(suffix, labels, value)])
+Family = Tuple[str, str, str, List[Tuple[str, Dict[str, str], float]]]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+KDF_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SRP_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _labels(self, values: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def collect(self) -> Family:
+        with self._lock:
+            samples = [("_total", self._labels(k), v) for k, v in self._values.items()]
+        return self.name, self.type_name, self.help, samples
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = float(value)
+
+    def collect(self) -> Family:
+        with self._lock:
+            samples = [("", self._labels(k), v) for k, v in self._values.items()]
+        return self.name, self.type_name, self.help, samples
+
+
+class Histogram(_Metric):
+    """Cumulative buckets are built at scrape time; observe() bumps one slot."""
+
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *labelvalues)
+
+    def collect(self) -> Family:
+        with self._lock:
+            series = [(k, list(counts), total) for k, (counts, total) in self._series.items()]
+
+        samples = []
+        for key, counts, total in series:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append(("_bucket", {**labels, "le": _format_value(float(bound))}, cumulative))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, cumulative))
+        return self.name, self.type_name, self.help, samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        """collector() is called on every scrape and yields whole families."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def families(self) -> List[Family]:
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+        out = [m.collect() for m in metrics]
+        for collector in collectors:
+            out.extend(collector())
+        return out
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        lines = []
+        for name, type_name, help_text, samples in self.families():
+            lines.append(f"# HELP {name} {_escape(help_text)}")
+            lines.append(f"# TYPE {name} {type_name}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def gauge_family(name: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], float]]) -> Family:
+    return name, "gauge", help_text, [("", labels, value) for labels, value in samples]
+
+
+def counter_family(name: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], float]]) -> Family:
+    return name, "counter", help_text, [("_total", labels, value) for labels, value in samples]
+
+
+# ======================================================
+# Hot-path metrics
+# ======================================================
+http_request_duration = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route"),
+)
+http_requests = REGISTRY.counter(
+    "http_requests",
+    "HTTP responses by route template and status code",
+    ("method", "route", "status"),
+)
+kdf_duration = REGISTRY.histogram(
+    "kdf_derive_kek_seconds",
+    "derive_kek (Argon2id) latency through the KDF executor, queue wait included",
+    buckets=KDF_BUCKETS,
+)
+srp_duration = REGISTRY.histogram(
+    "srp_operation_seconds",
+    "SRP server engine work per login step",
+    ("op",),
+    buckets=SRP_BUCKETS,
+)
+db_query_duration = REGISTRY.histogram(
+    "db_query_duration_seconds",
+    "DB statement execution time (cursor execute to result)",
+    ("engine", "statement"),
+    buckets=DB_BUCKETS,
+)
+
+_STATEMENT_KINDS = ("select", "insert", "update", "delete")
+
+
+def _statement_kind(sql: str) -> str:
+    head = sql.lstrip()[:6].lower()
+    return head if head in _STATEMENT_KINDS else "other"
+
+
+def instrument_engine(engine, label: str) -> None:
+    """Times every statement on `engine` (sync Engine or AsyncEngine)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if starts:
+            db_query_duration.observe(time.perf_counter() - starts.pop(), label, _statement_kind(statement))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        # the statement failed: after_cursor_execute won't run for it
+        conn = exception_context.connection
+        if conn is not None:
+            starts = conn.info.get("metrics_query_start")
+            if starts:
+                starts.pop()
+
+
+# ======================================================
+# ASGI middleware
+# ======================================================
+def route_template(scope) -> str:
+    # routers included with a prefix are matched in place on newer FastAPI:
+    # scope["route"] is the router's own route (/register) and the full
+    # template (/auth/register) lives in the effective route context
+    ctx = scope.get("fastapi", {}).get("effective_route_context")
+    template = getattr(ctx, "path_format", None)
+    if template:
+        return template
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """
+    Per-route latency histogram and status counter. Requests are labelled
+    with the matched route template (/vault/{item_id}), never the raw path,
+    so cardinality stays bounded; anything unmatched is "<unmatched>".
+    """
+
+    def __init__(self, app, exclude: Sequence[str] = ()):
+        self.app = app
+        self.exclude = frozenset(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            template = route_template(scope)
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - t0, method, template)
+            http_requests.inc(method, template, str(status))
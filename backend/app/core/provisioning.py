@@ -0,0 +1,399 @@
+# backend/app/core/provisioning.py
+#
+# إنشاء مستخدمين بالجملة (CSV / NDJSON): verifier + KEK/DEK تُحسب في process
+# pool الخاص بـ kdf_executor (حصة منه فقط)، والإدخال في قاعدة البيانات على
+# دفعات (executemany + commit لكل دفعة). حالة المهمة في جدول provisioning_jobs
+# كي يجيب أي worker على الاستعلام عنها.
+
+import base64
+import csv
+import hashlib
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Collection, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.crypto_utils import derive_kek, generate_dek, wrap_dek
+from app.core.kdf_executor import KdfExecutor, kdf_executor
+from app.core.srp_utils import get_srp_engine
+from app.db.session import SessionLocal
+from app.db.models.user import User
+from app.db.models.role import Role
+from app.db.models.provisioning_job import ProvisioningJobRow
+
+MAX_REPORTED_ERRORS = 100
+DEFAULT_ROLE = "user"
+
+
+def allowed_roles() -> frozenset:
+    """settings.PROVISION_ALLOWED_ROLES as a set."""
+    return frozenset(r.strip() for r in settings.PROVISION_ALLOWED_ROLES.split(",") if r.strip())
+
+
+@dataclass
+class ProvisionRecord:
+    line: int
+    username: str
+    email: str
+    password: str
+    role: str = DEFAULT_ROLE
+
+
+@dataclass
+class ProvisionReport:
+    total: int = 0
+    created: int = 0
+    skipped: int = 0
+    failed: int = 0
+    elapsed_sec: float = 0.0
+    errors: List[dict] = field(default_factory=list)
+
+    @property
+    def users_per_min(self) -> float:
+        return self.created / self.elapsed_sec * 60 if self.elapsed_sec else 0.0
+
+    def error(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "created": self.created,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "elapsed_sec": round(self.elapsed_sec, 2),
+            "users_per_min": round(self.users_per_min, 1),
+            "errors": self.errors,
+        }
+
+
+# ======================================================
+# Parsing
+# ======================================================
+def _record_from_dict(line: int, data: dict) -> ProvisionRecord:
+    if not isinstance(data, dict):
+        raise ValueError("expected an object")
+    values = {}
+    for key in ("username", "email", "password"):
+        value = data.get(key)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"missing {key}")
+        values[key] = value if key == "password" else value.strip()
+    role = data.get("role") or DEFAULT_ROLE
+    if not isinstance(role, str):
+        raise ValueError("invalid role")
+    return ProvisionRecord(line=line, role=role.strip(), **values)
+
+
+def iter_records(lines: Iterable[str], fmt: str) -> Iterator[Tuple[int, object]]:
+    """
+    Yields (line_no, ProvisionRecord) or (line_no, error message).
+
+    csv:    header row with username,email,password[,role]
+    ndjson: one {"username", "email", "password", "role"?} object per line
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        missing = {"username", "email", "password"} - set(reader.fieldnames or ())
+        if missing:
+            yield 1, f"missing CSV columns: {', '.join(sorted(missing))}"
+            return
+        for row in reader:
+            try:
+                yield reader.line_num, _record_from_dict(reader.line_num, row)
+            except ValueError as e:
+                yield reader.line_num, str(e)
+    elif fmt == "ndjson":
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, _record_from_dict(line_no, json.loads(line))
+            except ValueError as e:
+                yield line_no, str(e)
+    else:
+        raise ValueError(f"unsupported format: {fmt}")
+
+
+# ======================================================
+# Worker (runs in the KDF process pool)
+# ======================================================
+def _derive_credentials(username_password: Tuple[str, str]) -> Tuple[str, str, str]:
+    username, password = username_password
+    salt, verifier = get_srp_engine().create_verifier(username, password)
+
+    # نفس اشتقاق register_user: Argon2 salt = SHA256(srp_salt)
+    kek = derive_kek(password, hashlib.sha256(salt).digest())
+    dek_wrapped = wrap_dek(kek, generate_dek())
+
+    return (
+        base64.b64encode(salt).decode("utf-8"),
+        base64.b64encode(verifier).decode("utf-8"),
+        dek_wrapped,
+    )
+
+
+# ======================================================
+# Provisioning
+# ======================================================
+def _resolve_roles(db, names: set, cache: Dict[str, int]) -> None:
+    wanted = names - cache.keys()
+    if not wanted:
+        return
+    for role_id, name in db.execute(select(Role.id, Role.name).where(Role.name.in_(wanted))):
+        cache[name] = role_id
+    if DEFAULT_ROLE in wanted and DEFAULT_ROLE not in cache:
+        role = Role(name=DEFAULT_ROLE)
+        db.add(role)
+        db.commit()
+        cache[DEFAULT_ROLE] = role.id
+
+
+def _existing(db, batch: List[ProvisionRecord]) -> Tuple[set, set]:
+    usernames = [r.username for r in batch]
+    emails = [r.email for r in batch]
+    rows = db.execute(
+        select(User.username, User.email).where(
+            or_(User.username.in_(usernames), User.email.in_(emails))
+        )
+    ).all()
+    return {r.username for r in rows}, {r.email for r in rows}
+
+
+def _insert_rows(db, rows: List[dict], report: ProvisionReport) -> None:
+    try:
+        db.execute(insert(User), rows)
+        db.commit()
+        report.created += len(rows)
+        return
+    except IntegrityError:
+        db.rollback()
+
+    # someone registered one of these names meanwhile: retry row by row
+    for row in rows:
+        try:
+            db.execute(insert(User), [row])
+            db.commit()
+            report.created += 1
+        except IntegrityError:
+            db.rollback()
+            report.skipped += 1
+
+
+def provision_users(
+    records: Iterable[Tuple[int, object]],
+    workers: int = 0,
+    batch_size: int = 0,
+    progress: Optional[Callable[[ProvisionReport], None]] = None,
+    session_factory=SessionLocal,
+    roles: Optional[Collection[str]] = None,
+    executor: Optional[KdfExecutor] = None,
+) -> ProvisionReport:
+    """
+    Creates users from iter_records() output. Existing usernames/emails and
+    duplicates within the input are skipped; bad rows, and rows asking for a
+    role outside `roles` (default: PROVISION_ALLOWED_ROLES), are reported by line.
+    progress(report) is called after every committed batch.
+
+    Credentials are derived in `executor` (default: the server's kdf_executor),
+    at most `workers` at a time (default: PROVISION_WORKERS, or half its workers).
+    """
+    executor = executor or kdf_executor
+    workers = workers or settings.PROVISION_WORKERS or max(1, executor.workers // 2)
+    batch_size = batch_size or settings.PROVISION_BATCH_SIZE
+    roles = frozenset(roles) if roles is not None else allowed_roles()
+
+    report = ProvisionReport()
+    started = time.monotonic()
+    seen_usernames: set = set()
+    seen_emails: set = set()
+    role_ids: Dict[str, int] = {}
+
+    def run_batch(db, batch: List[ProvisionRecord]) -> None:
+        taken_usernames, taken_emails = _existing(db, batch)
+        _resolve_roles(db, {r.role for r in batch} & roles, role_ids)
+
+        todo = []
+        for r in batch:
+            if r.role not in roles:
+                report.error(r.line, f"role {r.role!r} not allowed in bulk provisioning")
+            elif r.username in taken_usernames or r.email in taken_emails:
+                report.skipped += 1
+            elif r.role not in role_ids:
+                report.error(r.line, f"unknown role {r.role!r}")
+            else:
+                todo.append(r)
+
+        derived = executor.map(_derive_credentials, [(r.username, r.password) for r in todo], limit=workers)
+        rows = [
+            {
+                "username": r.username,
+                "email": r.email,
+                "salt": salt_b64,
+                "verifier": verifier_b64,
+                "dek_wrapped": dek_wrapped,
+                "is_active": True,
+                "is_locked": False,
+                "role_id": role_ids[r.role],
+            }
+            for r, (salt_b64, verifier_b64, dek_wrapped) in zip(todo, derived)
+        ]
+        if rows:
+            _insert_rows(db, rows, report)
+
+        report.elapsed_sec = time.monotonic() - started
+        if progress:
+            progress(report)
+
+    db = session_factory()
+    try:
+        batch: List[ProvisionRecord] = []
+        for line_no, item in records:
+            report.total += 1
+            if not isinstance(item, ProvisionRecord):
+                report.error(line_no, item)
+                continue
+            if item.username in seen_usernames or item.email in seen_emails:
+                report.skipped += 1
+                continue
+            seen_usernames.add(item.username)
+            seen_emails.add(item.email)
+
+            batch.append(item)
+            if len(batch) >= batch_size:
+                run_batch(db, batch)
+                batch = []
+        if batch:
+            run_batch(db, batch)
+    finally:
+        db.close()
+
+    report.elapsed_sec = time.monotonic() - started
+    return report
+
+
+# ======================================================
+# Background jobs (admin endpoint)
+# ======================================================
+# The job runs in a thread of the worker that accepted the upload; its state
+# lives in provisioning_jobs, so any worker can answer GET /users/bulk/{id}
+# and the one-job-at-a-time rule holds across workers.
+
+class ProvisioningJob:
+    def __init__(self, admin_username: str):
+        self.id = uuid.uuid4().hex
+        self.admin_username = admin_username
+        self.status = "running"
+        self.report = ProvisionReport()
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return _job_dict(self.id, self.status, self.report.to_dict(), self.error)
+
+
+def _job_dict(job_id: str, status: str, report: dict, error: Optional[str]) -> dict:
+    data = {"job_id": job_id, "status": status, **report}
+    if error:
+        data["error"] = error
+    return data
+
+
+def _save(job: ProvisioningJob, finished: bool = False) -> None:
+    # runs in the job's thread, with its own Session (DB_POOL_RESERVE)
+    now = time.time()
+    values = {"status": job.status, "report": json.dumps(job.report.to_dict()), "updated_at": now}
+    if finished:
+        values.update(running=None, finished_at=now, error=job.error[:255] if job.error else None)
+    db = SessionLocal()
+    try:
+        db.execute(update(ProvisioningJobRow).where(ProvisioningJobRow.id == job.id).values(**values))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _prune_jobs(db, now: float) -> None:
+    # a running job whose worker died stops heartbeating: release its slot
+    db.execute(
+        update(ProvisioningJobRow)
+        .where(
+            ProvisioningJobRow.running.isnot(None),
+            ProvisioningJobRow.updated_at < now - settings.PROVISION_JOB_STALE_SEC,
+        )
+        .values(status="failed", error="worker stopped", running=None, finished_at=now)
+    )
+    db.execute(
+        delete(ProvisioningJobRow).where(
+            ProvisioningJobRow.finished_at < now - settings.PROVISION_JOB_TTL_SEC
+        )
+    )
+    keep = (
+        select(ProvisioningJobRow.id)
+        .where(ProvisioningJobRow.finished_at.isnot(None))
+        .order_by(ProvisioningJobRow.finished_at.desc())
+        .offset(settings.PROVISION_MAX_FINISHED_JOBS)
+    )
+    old = db.execute(keep).scalars().all()
+    if old:
+        db.execute(delete(ProvisioningJobRow).where(ProvisioningJobRow.id.in_(old)))
+
+
+def get_job(db, job_id: str) -> Optional[dict]:
+    """The job's to_dict(), from whichever worker runs it; None if unknown or expired."""
+    row = db.get(ProvisioningJobRow, job_id)
+    if row is None:
+        return None
+    if row.finished_at is not None and time.time() - row.finished_at > settings.PROVISION_JOB_TTL_SEC:
+        return None
+    return _job_dict(row.id, row.status, json.loads(row.report), row.error)
+
+
+def start_job(db, text: str, fmt: str, admin_username: str, on_done=None) -> Optional[ProvisioningJob]:
+    """Runs provision_users in a background thread; None if a job is already running."""
+    now = time.time()
+    _prune_jobs(db, now)
+    db.commit()
+    job = ProvisioningJob(admin_username)
+    db.add(
+        ProvisioningJobRow(
+            id=job.id,
+            admin_username=admin_username,
+            status=job.status,
+            running=1,
+            report=json.dumps(job.report.to_dict()),
+            created_at=now,
+            updated_at=now,
+        )
+    )
+    try:
+        db.commit()
+    except IntegrityError:
+        # unique `running`: another job (maybe on another worker) holds it
+        db.rollback()
+        return None
+
+    def progress(report: ProvisionReport) -> None:
+        job.report = report
+        _save(job)
+
+    def run() -> None:
+        try:
+            job.report = provision_users(iter_records(text.splitlines(), fmt), progress=progress)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        _save(job, finished=True)
+        if on_done:
+            on_done(job)
+
+    threading.Thread(target=run, name=f"provision-{job.id[:8]}", daemon=True).start()
+    return job
@@ -1,22 +1,162 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
 from fastapi import Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.core.tracing import span
 from app.db.session import get_db
 from app.db.models.user import User
+from app.db.models.role import Role
+
+
+# ======================================================
+# Principal (resolved caller identity)
+# ======================================================
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
+    role: Optional[str]
+    is_active: bool
+    is_locked: bool
+
+    @property
+    def can_login(self) -> bool:
+        return bool(self.is_active) and not self.is_locked
+
+
+class PrincipalCache:
+    """
+    TTL + LRU cache of username -> Principal, shared by all routers.
+
+    Writers that change a cached field (lock_user, change_role,
+    change_password) call invalidate(); the TTL bounds staleness for changes
+    made by other workers.
+    """
+
+    def __init__(self, ttl_sec: float, max_size: int):
+        self.ttl_sec = ttl_sec
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple[float, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, principal: Principal) -> None:
+        if self.ttl_sec <= 0:
+            return
+        with self._lock:
+            self._entries[principal.username] = (time.monotonic() + self.ttl_sec, principal)
+            self._entries.move_to_end(principal.username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str) -> None:
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
 
+principal_cache = PrincipalCache(
+    ttl_sec=settings.PRINCIPAL_CACHE_TTL_SEC,
+    max_size=settings.PRINCIPAL_CACHE_SIZE,
+)
 
-def get_current_user(username: str, db: Session = Depends(get_db)) -> User:
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not user.is_active or user.is_locked:
+
+def _principal_query(username: str):
+    return (
+        select(User.id, User.username, Role.name, User.is_active, User.is_locked)
+        .outerjoin(Role, User.role_id == Role.id)
+        .where(User.username == username)
+    )
+
+
+def _to_principal(row) -> Principal:
+    return Principal(
+        id=row[0],
+        username=row[1],
+        role=row[2],
+        is_active=bool(row[3]),
+        is_locked=bool(row[4]),
+    )
+
+
+def resolve_principal(db: Session, username: str) -> Optional[Principal]:
+    """Cached user lookup; None if the user does not exist (misses are not cached)."""
+    with span("user.lookup") as s:
+        principal = principal_cache.get(username)
+        if principal is not None:
+            if s is not None:
+                s.set("cache", "hit")
+            return principal
+
+        row = db.execute(_principal_query(username)).first()
+        if row is None:
+            return None
+
+        principal = _to_principal(row)
+        principal_cache.put(principal)
+        return principal
+
+
+async def aresolve_principal(db, username: str) -> Optional[Principal]:
+    """resolve_principal for AsyncSession callers."""
+    with span("user.lookup") as s:
+        principal = principal_cache.get(username)
+        if principal is not None:
+            if s is not None:
+                s.set("cache", "hit")
+            return principal
+
+        row = (await db.execute(_principal_query(username))).first()
+        if row is None:
+            return None
+
+        principal = _to_principal(row)
+        principal_cache.put(principal)
+        return principal
+
+
+# ======================================================
+# Dependencies
+# ======================================================
+def get_current_user(username: str, db: Session = Depends(get_db)) -> Principal:
+    principal = resolve_principal(db, username)
+    if not principal or not principal.can_login:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or inactive user"
         )
-    return user
+    return principal
 
 
-def require_admin(user: User = Depends(get_current_user)) -> User:
-    if not user.role or user.role.name != "admin":
+def require_admin(user: Principal = Depends(get_current_user)) -> Principal:
+    if user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin privileges required"
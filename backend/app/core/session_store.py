@@ -0,0 +1,393 @@
+# backend/app/core/session_store.py
+
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+from app.db.session import SessionLocal, request_session
+from app.db.models.auth_session import AuthSession
+
+V = TypeVar("V")
+
+
+class SessionBackend(ABC, Generic[V]):
+    """
+    Storage for short-lived handshake state (SRP challenge, MFA challenge).
+    Entries expire after the store's TTL; pop() consumes an entry at most once.
+    """
+
+    @abstractmethod
+    def put(self, sid: str, value: V, db=None) -> None:
+        """
+        `db` is the caller's request Session, if it has one; SQL backends
+        write (and commit) through it instead of checking out a second
+        pooled connection while the first is still held. The same goes for
+        get / pop / discard.
+        """
+
+    @abstractmethod
+    def get(self, sid: str, db=None) -> Optional[V]: ...
+
+    @abstractmethod
+    def pop(self, sid: str, db=None) -> Optional[V]: ...
+
+    @abstractmethod
+    def update(self, sid: str, fn: Callable[[V], V], db=None) -> Optional[V]:
+        """
+        Atomic read-modify-write of a live entry, keeping its expiry: stores
+        and returns fn(value), or None if the entry is gone. Concurrent
+        updates of one entry never lose each other's changes; fn may run more
+        than once, so it must not have side effects.
+        """
+
+    @abstractmethod
+    def discard(self, sid: str, db=None) -> bool:
+        """
+        Drop an entry without decoding it; True if it was present. Callers
+        that consume a session after get() must treat False as "already used".
+        """
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]: ...
+
+
+class ExpiringSessionStore(SessionBackend[V]):
+    """
+    In-process session store with a fixed TTL and a hard capacity.
+
+    Every entry of a store shares the same TTL, so insertion order is also
+    expiry order: the OrderedDict doubles as the expiry queue and expiring or
+    evicting only ever touches its head. Insert, lookup, pop, expiry and
+    capacity eviction are all amortized O(1) -- there is no full sweep.
+    """
+
+    def __init__(
+        self,
+        ttl_sec: float,
+        max_size: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if ttl_sec <= 0:
+            raise ValueError("ttl_sec must be positive")
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+
+        self.ttl_sec = ttl_sec
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.expired_count = 0
+        self.evicted_count = 0
+
+    # ----------------------------------------------
+    # Internal (caller holds the lock)
+    # ----------------------------------------------
+    def _purge_expired(self, now: float) -> None:
+        entries = self._entries
+        while entries:
+            sid, (expires_at, _) = next(iter(entries.items()))
+            if expires_at > now:
+                break
+            del entries[sid]
+            self.expired_count += 1
+
+    # ----------------------------------------------
+    # Public API
+    # ----------------------------------------------
+    def put(self, sid: str, value: V, db=None) -> None:
+        with self._lock:
+            now = self._clock()
+            self._purge_expired(now)
+
+            # re-inserting moves the entry to the tail with a fresh expiry
+            self._entries.pop(sid, None)
+            self._entries[sid] = (now + self.ttl_sec, value)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evicted_count += 1
+
+    def get(self, sid: str, db=None) -> Optional[V]:
+        with self._lock:
+            now = self._clock()
+            self._purge_expired(now)
+            entry = self._entries.get(sid)
+            return entry[1] if entry else None
+
+    def pop(self, sid: str, db=None) -> Optional[V]:
+        with self._lock:
+            now = self._clock()
+            self._purge_expired(now)
+            entry = self._entries.pop(sid, None)
+            return entry[1] if entry else None
+
+    def update(self, sid: str, fn: Callable[[V], V], db=None) -> Optional[V]:
+        with self._lock:
+            now = self._clock()
+            self._purge_expired(now)
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            value = fn(entry[1])
+            # same position and expiry: the expiry queue stays ordered
+            self._entries[sid] = (entry[0], value)
+            return value
+
+    def discard(self, sid: str, db=None) -> bool:
+        with self._lock:
+            return self._entries.pop(sid, None) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge_expired(self._clock())
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._purge_expired(self._clock())
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "expired": self.expired_count,
+                "evicted": self.evicted_count,
+            }
+
+
+# ======================================================
+# Shared (SQL) backend
+# ======================================================
+def pack_fields(*fields: bytes) -> bytes:
+    """Length-prefixed concatenation: 2-byte big-endian length + raw bytes per field."""
+    out = bytearray()
+    for f in fields:
+        if len(f) > 0xFFFF:
+            raise ValueError("field too large to pack")
+        out += struct.pack("!H", len(f))
+        out += f
+    return bytes(out)
+
+
+def unpack_fields(data: bytes) -> List[bytes]:
+    fields = []
+    pos = 0
+    while pos < len(data):
+        (n,) = struct.unpack_from("!H", data, pos)
+        pos += 2
+        if pos + n > len(data):
+            raise ValueError("truncated session payload")
+        fields.append(data[pos:pos + n])
+        pos += n
+    return fields
+
+
+class SqlSessionStore(SessionBackend[V]):
+    """
+    Session store on the auth_sessions table, so login_start and login_verify
+    can land on different workers or nodes.
+
+    Values go through encode/decode codecs (compact bytes, not pickle).
+    pop() and discard() claim a row with DELETE and check the rowcount, so a
+    session is consumed by exactly one worker; update() swaps the payload
+    only if it is still the one it read. Every `purge_every` puts,
+    expired rows are deleted and, above `max_size` live rows, the ones closest
+    to expiry are evicted; the table can therefore overshoot the cap by up to
+    `purge_every` rows, and expired rows that survive until then are never
+    returned.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        ttl_sec: float,
+        max_size: int,
+        encode: Callable[[V], bytes],
+        decode: Callable[[bytes], V],
+        session_factory=None,
+        purge_every: int = 100,
+        clock: Callable[[], float] = time.time,
+    ):
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+
+        self.kind = kind
+        self.ttl_sec = ttl_sec
+        self.max_size = max_size
+        self._encode = encode
+        self._decode = decode
+        self._session_factory = session_factory or SessionLocal
+        self._purge_every = purge_every
+        self._clock = clock
+        self._puts = 0
+        self._lock = threading.Lock()
+
+        self.expired_count = 0
+        self.evicted_count = 0
+
+    def _purge(self, db, now: float) -> None:
+        rows = db.query(AuthSession).filter(AuthSession.kind == self.kind)
+        expired = rows.filter(AuthSession.expires_at <= now).delete(synchronize_session=False)
+        self.expired_count += expired or 0
+
+        excess = rows.count() - self.max_size
+        if excess <= 0:
+            return
+        # same TTL for every row: the earliest expiries are the oldest sessions.
+        # Exactly `excess` of them, by primary key (a cutoff on expires_at
+        # would also take every row tied with the last one)
+        oldest = [
+            sid
+            for (sid,) in rows.with_entities(AuthSession.sid)
+            .order_by(AuthSession.expires_at, AuthSession.sid)
+            .limit(excess)
+        ]
+        evicted = rows.filter(AuthSession.sid.in_(oldest)).delete(synchronize_session=False)
+        self.evicted_count += evicted or 0
+
+    @contextmanager
+    def _session(self, db):
+        # the caller's Session if it passed one, else a short one of our own
+        if db is not None:
+            yield db
+            return
+        own = self._session_factory()
+        try:
+            yield own
+        finally:
+            own.close()
+
+    def put(self, sid: str, value: V, db=None) -> None:
+        with self._lock:
+            self._puts += 1
+            purge = self._puts % self._purge_every == 0
+
+        now = self._clock()
+        with self._session(db) as db:
+            if purge:
+                self._purge(db, now)
+            db.merge(
+                AuthSession(
+                    sid=sid,
+                    kind=self.kind,
+                    payload=self._encode(value),
+                    expires_at=now + self.ttl_sec,
+                )
+            )
+            db.commit()
+
+    def get(self, sid: str, db=None) -> Optional[V]:
+        with self._session(db) as db:
+            row = (
+                db.query(AuthSession.payload)
+                .filter(
+                    AuthSession.sid == sid,
+                    AuthSession.kind == self.kind,
+                    AuthSession.expires_at > self._clock(),
+                )
+                .first()
+            )
+        return self._decode(row.payload) if row else None
+
+    def pop(self, sid: str, db=None) -> Optional[V]:
+        with self._session(db) as db:
+            q = db.query(AuthSession).filter(AuthSession.sid == sid, AuthSession.kind == self.kind)
+            row = q.with_entities(AuthSession.payload, AuthSession.expires_at).first()
+            if not row:
+                return None
+            claimed = q.delete(synchronize_session=False)
+            db.commit()
+
+        # another worker consumed it first, or it had already expired
+        if claimed != 1 or row.expires_at <= self._clock():
+            return None
+        return self._decode(row.payload)
+
+    def update(self, sid: str, fn: Callable[[V], V], db=None, retries: int = 5) -> Optional[V]:
+        # compare-and-swap on the payload: like discard(), the rowcount tells
+        # whether this worker's write won; a lost race re-reads and retries
+        with self._session(db) as db:
+            for _ in range(retries):
+                live = db.query(AuthSession).filter(
+                    AuthSession.sid == sid,
+                    AuthSession.kind == self.kind,
+                    AuthSession.expires_at > self._clock(),
+                )
+                row = live.with_entities(AuthSession.payload).first()
+                if not row:
+                    db.commit()
+                    return None
+                value = fn(self._decode(row.payload))
+                swapped = live.filter(AuthSession.payload == row.payload).update(
+                    {AuthSession.payload: self._encode(value)}, synchronize_session=False
+                )
+                db.commit()
+                if swapped == 1:
+                    return value
+        return None
+
+    def discard(self, sid: str, db=None) -> bool:
+        with self._session(db) as db:
+            deleted = (
+                db.query(AuthSession)
+                .filter(AuthSession.sid == sid, AuthSession.kind == self.kind)
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+        return deleted == 1
+
+    def __len__(self) -> int:
+        db = self._session_factory()
+        try:
+            return (
+                db.query(AuthSession)
+                .filter(AuthSession.kind == self.kind, AuthSession.expires_at > self._clock())
+                .count()
+            )
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self),
+            "max_size": self.max_size,
+            "expired": self.expired_count,
+            "evicted": self.evicted_count,
+        }
+
+
+async def get_session_db():
+    """
+    Dependency for handlers whose only DB use is the session store: an
+    admitted request Session (see get_db) with SESSION_BACKEND=sql, None with
+    the in-process store, which needs neither a connection nor a slot.
+    """
+    if settings.SESSION_BACKEND.lower() != "sql":
+        yield None
+        return
+    async with request_session() as db:
+        yield db
+
+
+def build_session_store(
+    kind: str,
+    ttl_sec: float,
+    max_size: int,
+    encode: Callable[[V], bytes],
+    decode: Callable[[bytes], V],
+) -> SessionBackend[V]:
+    """Pick the session backend configured by settings.SESSION_BACKEND."""
+    backend = settings.SESSION_BACKEND.lower()
+    if backend == "memory":
+        return ExpiringSessionStore(ttl_sec, max_size)
+    if backend == "sql":
+        return SqlSessionStore(kind, ttl_sec, max_size, encode, decode)
+    raise ValueError(f"Unknown SESSION_BACKEND: {settings.SESSION_BACKEND!r}")
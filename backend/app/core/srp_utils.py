@@ -1,5 +1,18 @@
 import base64
+import ctypes
+import ctypes.util
+import hashlib
+import hmac
+import secrets
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+
 import srp
+from srp._pysrp import get_ng
+
+from app.core.metrics import srp_duration
+from app.core.tracing import span
 
 
 def create_srp_verifier(username: str, password: str):
@@ -19,4 +32,312 @@ def create_srp_verifier(username: str, password: str):
     return {
         "salt": base64.b64encode(salt).decode("utf-8"),
         "verifier": base64.b64encode(vkey).decode("utf-8"),
-    }
\ No newline at end of file
+    }
+
+
+# ======================================================
+# SRP-6a server engine (fixed-base precomputation for g)
+# ======================================================
+#
+# pysrp's Verifier computes g^b with a generic modexp on every login_start,
+# and rebuilding it from a stored session repeats that work. g and N never
+# change, so we precompute g^(d * 2^(w*i)) for every w-bit digit d of the
+# exponent: g^b is then one table lookup + one modular multiplication per
+# digit (32 for a 256-bit b with w = 8) and no squarings at all.
+#
+# Wire format and math follow pysrp's defaults (no RFC 5054 padding):
+#   k = H(N | g)           u = H(A | B)           B = k*v + g^b  (mod N)
+#   S = (A * v^u)^b        K = H(S)
+#   M = H(H(N) xor H(g) | H(I) | s | A | B | K)    H_AMK = H(A | M | K)
+
+def _to_bytes(n: int) -> bytes:
+    # same as pysrp's long_to_bytes (minimal big-endian, 0 -> b"")
+    return n.to_bytes((n.bit_length() + 7) // 8, "big")
+
+
+def _from_bytes(data: bytes) -> int:
+    return int.from_bytes(data, "big")
+
+
+# ------------------------------------------------------
+# libcrypto bignums (the same library pysrp's _ctsrp uses)
+# ------------------------------------------------------
+_BN_SIGNATURES = {
+    "BN_new": ([], ctypes.c_void_p),
+    "BN_free": ([ctypes.c_void_p], None),
+    "BN_clear_free": ([ctypes.c_void_p], None),
+    "BN_CTX_new": ([], ctypes.c_void_p),
+    "BN_CTX_free": ([ctypes.c_void_p], None),
+    "BN_bin2bn": ([ctypes.c_char_p, ctypes.c_int, ctypes.c_void_p], ctypes.c_void_p),
+    "BN_bn2bin": ([ctypes.c_void_p, ctypes.c_char_p], ctypes.c_int),
+    "BN_num_bits": ([ctypes.c_void_p], ctypes.c_int),
+    "BN_copy": ([ctypes.c_void_p, ctypes.c_void_p], ctypes.c_void_p),
+    "BN_MONT_CTX_new": ([], ctypes.c_void_p),
+    "BN_MONT_CTX_set": ([ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p], ctypes.c_int),
+    "BN_to_montgomery": ([ctypes.c_void_p] * 4, ctypes.c_int),
+    "BN_from_montgomery": ([ctypes.c_void_p] * 4, ctypes.c_int),
+    "BN_mod_mul_montgomery": ([ctypes.c_void_p] * 5, ctypes.c_int),
+    "BN_mod_exp_mont": ([ctypes.c_void_p] * 6, ctypes.c_int),
+    "BN_mod_exp_mont_consttime": ([ctypes.c_void_p] * 6, ctypes.c_int),
+}
+
+
+def _load_libcrypto():
+    path = ctypes.util.find_library("crypto")
+    if not path:
+        return None
+    try:
+        lib = ctypes.CDLL(path)
+        for name, (args, restype) in _BN_SIGNATURES.items():
+            fn = getattr(lib, name)
+            fn.argtypes = args
+            fn.restype = restype
+    except (OSError, AttributeError):
+        return None
+    return lib
+
+
+_crypto = _load_libcrypto()
+
+
+class _OpenSslGroup:
+    """Montgomery arithmetic mod N on libcrypto BIGNUMs; the g table is shared read-only."""
+
+    def __init__(self, N: int, g: int, window: int, exponent_bits: int):
+        self.window = window
+        self._mask = (1 << window) - 1
+
+        ctx = _crypto.BN_CTX_new()
+        try:
+            self._N = self._bn(N)
+            self._mont = _crypto.BN_MONT_CTX_new()
+            _crypto.BN_MONT_CTX_set(self._mont, self._N, ctx)
+
+            self._table: List[List[int]] = []
+            base = g
+            for _ in range(-(-exponent_bits // window)):
+                row, x = [], 1
+                for _ in range(1 << window):
+                    row.append(self._to_mont(x, ctx))
+                    x = x * base % N
+                self._table.append(row)
+                base = pow(base, 1 << window, N)
+        finally:
+            _crypto.BN_CTX_free(ctx)
+
+    @staticmethod
+    def _bn(n: int) -> int:
+        data = _to_bytes(n)
+        return _crypto.BN_bin2bn(data, len(data), None)
+
+    @staticmethod
+    def _int(bn: int) -> int:
+        buf = ctypes.create_string_buffer((_crypto.BN_num_bits(bn) + 7) // 8)
+        _crypto.BN_bn2bin(bn, buf)
+        return _from_bytes(buf.raw)
+
+    def _to_mont(self, n: int, ctx) -> int:
+        src, dst = self._bn(n), _crypto.BN_new()
+        _crypto.BN_to_montgomery(dst, src, self._mont, ctx)
+        _crypto.BN_free(src)
+        return dst
+
+    def fixed_base_pow(self, e: int) -> int:
+        """g^e mod N using the precomputed table."""
+        ctx = _crypto.BN_CTX_new()
+        acc, out = _crypto.BN_new(), _crypto.BN_new()
+        try:
+            started = False
+            for row in self._table:
+                digit = e & self._mask
+                e >>= self.window
+                if not digit:
+                    continue
+                if started:
+                    _crypto.BN_mod_mul_montgomery(acc, acc, row[digit], self._mont, ctx)
+                else:
+                    _crypto.BN_copy(acc, row[digit])
+                    started = True
+            if not started:
+                return 1
+            _crypto.BN_from_montgomery(out, acc, self._mont, ctx)
+            return self._int(out)
+        finally:
+            _crypto.BN_clear_free(acc)
+            _crypto.BN_clear_free(out)
+            _crypto.BN_CTX_free(ctx)
+
+    def pow(self, base: int, e: int, secret: bool = False) -> int:
+        ctx = _crypto.BN_CTX_new()
+        b, p, out = self._bn(base), self._bn(e), _crypto.BN_new()
+        try:
+            fn = _crypto.BN_mod_exp_mont_consttime if secret else _crypto.BN_mod_exp_mont
+            fn(out, b, p, self._N, ctx, self._mont)
+            return self._int(out)
+        finally:
+            _crypto.BN_free(b)
+            _crypto.BN_clear_free(p)
+            _crypto.BN_clear_free(out)
+            _crypto.BN_CTX_free(ctx)
+
+
+class _PythonGroup:
+    """Fallback when libcrypto is not available: same table, Python ints."""
+
+    def __init__(self, N: int, g: int, window: int, exponent_bits: int):
+        self.N = N
+        self.window = window
+        self._mask = (1 << window) - 1
+
+        self._table: List[List[int]] = []
+        base = g
+        for _ in range(-(-exponent_bits // window)):
+            row, x = [], 1
+            for _ in range(1 << window):
+                row.append(x)
+                x = x * base % N
+            self._table.append(row)
+            base = pow(base, 1 << window, N)
+
+    def fixed_base_pow(self, e: int) -> int:
+        acc = 1
+        for row in self._table:
+            digit = e & self._mask
+            e >>= self.window
+            if digit:
+                acc = acc * row[digit] % self.N
+        return acc
+
+    def pow(self, base: int, e: int, secret: bool = False) -> int:
+        return pow(base, e, self.N)
+
+
+# ------------------------------------------------------
+# Engine
+# ------------------------------------------------------
+@dataclass(frozen=True)
+class SrpServerProof:
+    H_AMK: bytes
+    K: bytes
+
+
+class SrpServerEngine:
+    """
+    Stateless SRP-6a server: challenge() returns (b, B), verify() checks the
+    client's M and returns H_AMK + K. Results are byte-for-byte those of
+    srp.Verifier for the same b.
+
+    Note: table lookups are indexed by digits of the ephemeral b, so unlike
+    BN_mod_exp_mont_consttime this step is not constant-time with respect to
+    cache timing; b is fresh per login and never reused.
+    """
+
+    def __init__(
+        self,
+        hash_alg: int = srp.SHA1,
+        ng_type: int = srp.NG_2048,
+        window: int = 8,
+        exponent_bits: int = 256,
+    ):
+        self.hash_class = {
+            srp.SHA1: hashlib.sha1,
+            srp.SHA224: hashlib.sha224,
+            srp.SHA256: hashlib.sha256,
+            srp.SHA384: hashlib.sha384,
+            srp.SHA512: hashlib.sha512,
+        }[hash_alg]
+        self.N, self.g = get_ng(ng_type, None, None)
+        self.exponent_bits = exponent_bits
+        self.k = _from_bytes(self._H(_to_bytes(self.N), _to_bytes(self.g)))
+
+        hN = self.hash_class(_to_bytes(self.N)).digest()
+        hg = self.hash_class(_to_bytes(self.g)).digest()
+        self._HNxorg = bytes(a ^ b for a, b in zip(hN, hg))
+
+        group_cls = _OpenSslGroup if _crypto is not None else _PythonGroup
+        self._group = group_cls(self.N, self.g, window, exponent_bits)
+
+    def _H(self, *parts: bytes) -> bytes:
+        h = self.hash_class()
+        for part in parts:
+            h.update(part)
+        return h.digest()
+
+    def create_verifier(self, username: str, password: str, salt_len: int = 4) -> tuple[bytes, bytes]:
+        """Same (salt, verifier) as srp.create_salted_verification_key, via the g table."""
+        salt = _to_bytes(secrets.randbits(salt_len * 8))
+        up = self.hash_class(username.encode("utf-8") + b":" + password.encode("utf-8")).digest()
+        x = _from_bytes(self._H(salt, up))
+        return salt, _to_bytes(self._group.fixed_base_pow(x))
+
+    def is_valid_A(self, A: bytes) -> bool:
+        # SRP-6a safety check
+        return _from_bytes(A) % self.N != 0
+
+    def challenge(self, verifier_key: bytes, b: Optional[bytes] = None) -> tuple[bytes, bytes]:
+        """Returns (b, B); pass b only to reproduce an earlier challenge."""
+        with srp_duration.time("challenge"), span("srp.challenge"):
+            return self._challenge(verifier_key, b)
+
+    def _challenge(self, verifier_key: bytes, b: Optional[bytes]) -> tuple[bytes, bytes]:
+        if b is None:
+            b_int = secrets.randbits(self.exponent_bits) | (1 << (self.exponent_bits - 1))
+        else:
+            b_int = _from_bytes(b)
+            if b_int.bit_length() > self.exponent_bits:
+                raise ValueError("ephemeral secret too large for the precomputed table")
+
+        v = _from_bytes(verifier_key)
+        B = (self.k * v + self._group.fixed_base_pow(b_int)) % self.N
+        return _to_bytes(b_int), _to_bytes(B)
+
+    def verify(
+        self,
+        username: str,
+        salt: bytes,
+        verifier_key: bytes,
+        A: bytes,
+        b: bytes,
+        B: bytes,
+        M: bytes,
+    ) -> Optional[SrpServerProof]:
+        """Returns the server proof if M is correct, else None."""
+        with srp_duration.time("verify"), span("srp.verify"):
+            return self._verify(username, salt, verifier_key, A, b, B, M)
+
+    def _verify(self, username, salt, verifier_key, A, b, B, M) -> Optional[SrpServerProof]:
+        A_int = _from_bytes(A)
+        if A_int % self.N == 0:
+            return None
+        A_bytes, B_bytes = _to_bytes(A_int), _to_bytes(_from_bytes(B))
+
+        u = _from_bytes(self._H(A_bytes, B_bytes))
+        v = _from_bytes(verifier_key)
+        S = self._group.pow(A_int * self._group.pow(v, u) % self.N, _from_bytes(b), secret=True)
+        K = self.hash_class(_to_bytes(S)).digest()
+
+        expected = self._H(
+            self._HNxorg,
+            self.hash_class(username.encode("utf-8")).digest(),
+            salt,
+            A_bytes,
+            B_bytes,
+            K,
+        )
+        if not hmac.compare_digest(M, expected):
+            return None
+        return SrpServerProof(H_AMK=self._H(A_bytes, expected, K), K=K)
+
+
+_engine: Optional[SrpServerEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_srp_engine() -> SrpServerEngine:
+    """Shared engine for SHA1 / NG_2048; the table is built on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = SrpServerEngine(hash_alg=srp.SHA1, ng_type=srp.NG_2048)
+    return _engine
@@ -0,0 +1,392 @@
+# backend/app/core/static_assets.py
+#
+# StaticFiles مع بصمة (content hash) لكل ملف، ETag قوي، Cache-Control مناسب،
+# ونسخ gzip/brotli مضغوطة مسبقاً (تُبنى عند الإقلاع أو عبر build_static.py).
+# build() يكتب manifest.json في build_dir، و load() يعيد استخدامه بدون بناء.
+# لا نثق بمحتوى build_dir: كل ملف يُتحقق من بصمته قبل تخطي الكتابة وعند load().
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import stat
+import threading
+from dataclasses import dataclass, field
+from mimetypes import guess_type
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# لا فائدة من ضغط ملفات مضغوطة أصلاً، ولا من الملفات الصغيرة جداً
+INCOMPRESSIBLE_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".woff", ".woff2", ".gz", ".br", ".zip"}
+MIN_COMPRESS_BYTES = 1024
+MIN_COMPRESS_SAVING = 0.05
+
+DIGEST_LEN = 16
+WEIGHTS_MANIFEST_SUFFIX = "weights_manifest.json"
+
+# index of a build, written into build_dir by build() and read by load()
+BUILD_MANIFEST = "manifest.json"
+BUILD_MANIFEST_VERSION = 1
+
+
+@dataclass
+class Asset:
+    path: str                     # logical path relative to the directory (posix)
+    source: str                   # file on disk
+    mtime: float
+    size: int
+    digest: str
+    body: str                     # identity file to serve (source, or a rewritten copy)
+    media_type: str
+    variants: Dict[str, str] = field(default_factory=dict)  # encoding -> file
+
+    @property
+    def fingerprinted(self) -> str:
+        head, tail = posixpath.split(self.path)
+        stem, ext = posixpath.splitext(tail)
+        return posixpath.join(head, f"{stem}.{self.digest}{ext}")
+
+
+def _fingerprint_name(name: str, digest: str) -> str:
+    stem, ext = posixpath.splitext(name)
+    return f"{stem}.{digest}{ext}"
+
+
+def _private_dir(path: str) -> None:
+    # build_dir decides what gets served: only this user may write into it
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    os.chmod(path, 0o700)
+
+
+def _read(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _decode(data: bytes, encoding: Optional[str]) -> Optional[bytes]:
+    try:
+        if encoding == "gzip":
+            return gzip.decompress(data)
+        if encoding == "br":
+            return brotli.decompress(data) if brotli is not None else None
+    except (OSError, EOFError, ValueError, getattr(brotli, "error", ValueError)):
+        return None
+    return data
+
+
+def _has_digest(path: str, digest: str, encoding: Optional[str] = None) -> bool:
+    """True if `path` exists and (decompressed) hashes to `digest`."""
+    data = _read(path)
+    if data is None:
+        return False
+    data = _decode(data, encoding)
+    return data is not None and hashlib.sha256(data).hexdigest()[:DIGEST_LEN] == digest
+
+
+def _write_once(path: str, data: bytes) -> None:
+    # build_dir is content-addressed, but an existing file is only reused if it
+    # really holds these bytes (a truncated or planted file is replaced)
+    if _read(path) == data:
+        return
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token and q > 0:
+            accepted.add(token)
+    return accepted
+
+
+class AssetStaticFiles(StaticFiles):
+    """
+    Drop-in StaticFiles for the frontend mount.
+
+    - /frontend/<path>                   → Cache-Control: no-cache + strong ETag (cheap 304s)
+    - /frontend/<stem>.<digest><ext>     → Cache-Control: immutable, one year
+    - Accept-Encoding br/gzip            → precompressed variant (never for Range requests)
+    - *weights_manifest.json             → shard paths rewritten to fingerprinted names,
+                                           so face-api model shards are cached immutably
+
+    build() hashes and compresses everything and records the result in
+    build_dir/manifest.json; load() picks that up instead (another worker's
+    build, or build_static.py run ahead of time). Until one of them has run
+    (or for files added later) requests fall through to plain StaticFiles
+    behaviour; changed files are re-hashed on access.
+    """
+
+    def __init__(self, *, directory: str, build_dir: str, precompress: bool = True, brotli_quality: int = 11, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.build_dir = build_dir
+        self.precompress = precompress
+        self.brotli_quality = brotli_quality
+        self._assets: Dict[str, Asset] = {}
+        self._by_fingerprint: Dict[str, Asset] = {}
+        self._lock = threading.Lock()
+
+    # ----------------------------------------------
+    # Build
+    # ----------------------------------------------
+    def build(self) -> Dict[str, Asset]:
+        """Hash every file, rewrite weights manifests and write compressed variants."""
+        _private_dir(self.build_dir)
+        assets: Dict[str, Asset] = {}
+        manifests = []
+
+        for root, _, files in os.walk(self.directory):
+            for name in sorted(files):
+                source = os.path.join(root, name)
+                path = os.path.relpath(source, self.directory).replace(os.sep, "/")
+                if name.endswith(WEIGHTS_MANIFEST_SUFFIX):
+                    manifests.append((path, source))
+                    continue
+                assets[path] = self._build_asset(path, source, assets)
+
+        # manifests last: their content depends on the shard digests
+        for path, source in manifests:
+            assets[path] = self._build_asset(path, source, assets)
+
+        self._write_manifest(assets)
+        self._install(assets)
+        return assets
+
+    def load(self) -> Dict[str, Asset]:
+        """
+        Serve the build recorded in build_dir/manifest.json without hashing or
+        compressing anything. Every build_dir file is checked against the digest
+        recorded for it; entries whose files are gone or differ are skipped.
+        Sources edited since the build are re-hashed on first access, as after
+        build().
+        """
+        manifest_path = os.path.join(self.build_dir, BUILD_MANIFEST)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            logger.warning("No static build at %s: run build_static.py; serving unfingerprinted files", manifest_path)
+            return {}
+        except ValueError:
+            logger.warning("Unreadable static build manifest %s; serving unfingerprinted files", manifest_path)
+            return {}
+        if manifest.get("version") != BUILD_MANIFEST_VERSION:
+            logger.warning("Static build manifest %s has an unknown version; ignoring it", manifest_path)
+            return {}
+
+        assets: Dict[str, Asset] = {}
+        for path, entry in manifest.get("assets", {}).items():
+            source = os.path.join(self.directory, *path.split("/"))
+            body = os.path.join(self.build_dir, entry["body"]) if entry.get("body") else source
+            variants = {
+                encoding: os.path.join(self.build_dir, name)
+                for encoding, name in entry.get("variants", {}).items()
+            }
+            digest = entry["digest"]
+            # only build_dir files are checked here; an edited source is caught
+            # by _current() (mtime/size) and re-hashed
+            body_ok = _has_digest(body, digest) if entry.get("body") else os.path.exists(body)
+            if not body_ok or not all(
+                _has_digest(v, digest, encoding) for encoding, v in variants.items()
+            ):
+                logger.warning("Static build entry %s does not match its files; serving it unfingerprinted", path)
+                continue
+            assets[path] = Asset(
+                path=path,
+                source=source,
+                mtime=entry["mtime"],
+                size=entry["size"],
+                digest=digest,
+                body=body,
+                media_type=entry["media_type"],
+                variants=variants,
+            )
+
+        self._install(assets)
+        return assets
+
+    def _install(self, assets: Dict[str, Asset]) -> None:
+        with self._lock:
+            self._assets = assets
+            self._by_fingerprint = {a.fingerprinted: a for a in assets.values()}
+
+    def _write_manifest(self, assets: Dict[str, Asset]) -> None:
+        # build_dir-relative names, so the build can be copied or mounted elsewhere
+        entries = {
+            path: {
+                "mtime": a.mtime,
+                "size": a.size,
+                "digest": a.digest,
+                "body": os.path.basename(a.body) if a.body != a.source else None,
+                "media_type": a.media_type,
+                "variants": {encoding: os.path.basename(v) for encoding, v in a.variants.items()},
+            }
+            for path, a in assets.items()
+        }
+        data = json.dumps({"version": BUILD_MANIFEST_VERSION, "assets": entries}, indent=1).encode("utf-8")
+        # rewritten on every build (unlike the content-addressed files)
+        path = os.path.join(self.build_dir, BUILD_MANIFEST)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _rewrite_manifest(self, path: str, data: bytes, assets: Dict[str, Asset]) -> bytes:
+        base = posixpath.dirname(path)
+        try:
+            groups = json.loads(data)
+            for group in groups:
+                group["paths"] = [
+                    _fingerprint_name(p, assets[posixpath.join(base, p)].digest)
+                    if posixpath.join(base, p) in assets
+                    else p
+                    for p in group.get("paths", [])
+                ]
+        except (ValueError, TypeError, AttributeError):
+            return data
+        return json.dumps(groups, separators=(",", ":")).encode("utf-8")
+
+    def _build_asset(self, path: str, source: str, assets: Dict[str, Asset]) -> Asset:
+        st = os.stat(source)
+        with open(source, "rb") as f:
+            data = f.read()
+
+        body = source
+        if path.endswith(WEIGHTS_MANIFEST_SUFFIX):
+            rewritten = self._rewrite_manifest(path, data, assets)
+            if rewritten != data:
+                data = rewritten
+                body = None
+
+        digest = hashlib.sha256(data).hexdigest()[:DIGEST_LEN]
+        if body is None:
+            body = os.path.join(self.build_dir, f"{digest}.id")
+            _write_once(body, data)
+
+        asset = Asset(
+            path=path,
+            source=source,
+            mtime=st.st_mtime,
+            size=st.st_size,
+            digest=digest,
+            body=body,
+            media_type=guess_type(path)[0] or "application/octet-stream",
+        )
+
+        compressible = (
+            self.precompress
+            and len(data) >= MIN_COMPRESS_BYTES
+            and posixpath.splitext(path)[1].lower() not in INCOMPRESSIBLE_SUFFIXES
+        )
+        if compressible:
+            encoders = [("gzip", lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                encoders.insert(0, ("br", lambda d: brotli.compress(d, quality=self.brotli_quality)))
+            for encoding, compress in encoders:
+                variant = os.path.join(self.build_dir, f"{digest}.{encoding}")
+                not_worth_it = f"{variant}.skip"  # remembered so restarts don't retry
+                if os.path.exists(not_worth_it):
+                    continue
+                if not _has_digest(variant, digest, encoding):
+                    packed = compress(data)
+                    if len(packed) > len(data) * (1 - MIN_COMPRESS_SAVING):
+                        _write_once(not_worth_it, b"")
+                        continue
+                    _write_once(variant, packed)
+                asset.variants[encoding] = variant
+
+        return asset
+
+    def _current(self, asset: Asset) -> Optional[Asset]:
+        # blocking (stat, and a rebuild with brotli after an edit): run it in
+        # the threadpool, never on the event loop
+        try:
+            st = os.stat(asset.source)
+        except FileNotFoundError:
+            return None
+        if st.st_mtime == asset.mtime and st.st_size == asset.size:
+            return asset
+        # edited after build(): re-hash this file (manifests keep old shard names
+        # until the next build)
+        with self._lock:
+            latest = self._assets.get(asset.path)
+            if latest is not None and st.st_mtime == latest.mtime and st.st_size == latest.size:
+                return latest  # another request already rebuilt it
+            fresh = self._build_asset(asset.path, asset.source, self._assets)
+            self._assets[asset.path] = fresh
+            self._by_fingerprint[fresh.fingerprinted] = fresh
+        return fresh
+
+    # ----------------------------------------------
+    # Serving
+    # ----------------------------------------------
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] in ("GET", "HEAD"):
+            key = path.replace(os.sep, "/")
+            asset = self._by_fingerprint.get(key)
+            immutable = asset is not None
+            if asset is None:
+                asset = self._assets.get(key)
+            if asset is not None:
+                current = await run_in_threadpool(self._current, asset)
+                if current is not None and (not immutable or current.digest == asset.digest):
+                    return self._asset_response(current, scope, immutable)
+        return await super().get_response(path, scope)
+
+    def _asset_response(self, asset: Asset, scope: Scope, immutable: bool) -> Response:
+        request_headers = Headers(scope=scope)
+
+        encoding = None
+        if asset.variants and "range" not in request_headers:
+            accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+            encoding = next((e for e in ("br", "gzip") if e in accepted and e in asset.variants), None)
+
+        headers = {
+            "cache-control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+            "etag": f'"{asset.digest}-{encoding}"' if encoding else f'"{asset.digest}"',
+        }
+        if asset.variants:
+            headers["vary"] = "Accept-Encoding"
+        if encoding:
+            headers["content-encoding"] = encoding
+
+        full_path = asset.variants[encoding] if encoding else asset.body
+        stat_result = os.stat(full_path)
+        if not stat.S_ISREG(stat_result.st_mode):
+            return Response(status_code=404)
+
+        response = FileResponse(full_path, headers=headers, media_type=asset.media_type, stat_result=stat_result)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,357 @@
+# backend/app/core/tracing.py
+#
+# تتبّع الطلبات (tracing): كل طلب HTTP = trace، وداخله spans للمراحل
+# (قبول الطلب على الـ pool، checkout، SQL، البحث عن المستخدم، Argon2، SRP).
+# الطلبات البطيئة (≥ TRACE_SLOW_MS) تُسجَّل مع شجرة الـ spans كاملة، و
+# TRACE_EXPORT_PATH يصدّر الـ traces كـ OTLP/JSON (سطر لكل trace) لأي
+# collector أو أداة تقرأ هذا الشكل.
+
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+_trace: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+_span: ContextVar[Optional["Span"]] = ContextVar("span", default=None)
+
+SERVICE_NAME = "pw_manager_mfa"
+MAX_STATEMENT_CHARS = 200
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, object]):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.perf_counter_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end - self.start_ns) / 1e6
+
+
+class Trace:
+    """
+    Spans of one request. Sync handlers run in worker threads with a copy of
+    the request's context, so they append to the same Trace object.
+    """
+
+    def __init__(self, max_spans: int):
+        self.trace_id = os.urandom(16).hex()
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.dropped = 0
+        # perf_counter is monotonic but has no epoch; anchor it once per trace
+        self._unix_ns = time.time_ns()
+        self._perf_ns = time.perf_counter_ns()
+
+    def start(self, name: str, parent: Optional[Span], attributes: Dict[str, object]) -> Optional[Span]:
+        if len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return None
+        s = Span(name, parent.span_id if parent is not None else None, attributes)
+        self.spans.append(s)  # list.append is atomic under the GIL
+        return s
+
+    def unix_ns(self, perf_ns: int) -> int:
+        return self._unix_ns + (perf_ns - self._perf_ns)
+
+
+# ======================================================
+# Span API
+# ======================================================
+def current_trace_id() -> Optional[str]:
+    trace = _trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child of the current span; a no-op outside a traced request."""
+    trace = _trace.get()
+    s = trace.start(name, _span.get(), attributes) if trace is not None else None
+    if s is None:
+        yield None
+        return
+    token = _span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.set("error", type(e).__name__)
+        raise
+    finally:
+        _span.reset(token)
+        s.end()
+
+
+def start_span(name: str, **attributes) -> Optional[Span]:
+    """Leaf span without touching the current span (caller must end() it)."""
+    trace = _trace.get()
+    if trace is None:
+        return None
+    return trace.start(name, _span.get(), attributes)
+
+
+# ======================================================
+# SQL statements
+# ======================================================
+_WHITESPACE = re.compile(r"\s+")
+
+
+def instrument_engine(engine, label: str) -> None:
+    """One db.query span per statement; the SQL text only, never parameters."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        s = start_span(
+            "db.query",
+            engine=label,
+            statement=_WHITESPACE.sub(" ", statement).strip()[:MAX_STATEMENT_CHARS],
+        )
+        if s is not None:
+            if executemany:
+                s.set("executemany", True)
+            conn.info.setdefault("trace_spans", []).append(s)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            s = spans.pop()
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                s.set("rows", cursor.rowcount)
+            s.end()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("trace_spans") if conn is not None else None
+        if spans:
+            s = spans.pop()
+            s.set("error", type(exception_context.original_exception).__name__)
+            s.end()
+
+
+# ======================================================
+# Slow-request log
+# ======================================================
+def format_tree(trace: Trace) -> str:
+    children: Dict[Optional[str], List[Span]] = {}
+    for s in trace.spans:
+        children.setdefault(s.parent_id, []).append(s)
+
+    lines = []
+
+    def walk(s: Span, depth: int) -> None:
+        kids = sorted(children.get(s.span_id, []), key=lambda k: k.start_ns)
+        self_ms = s.duration_ms - sum(k.duration_ms for k in kids)
+        offset_ms = (s.start_ns - trace.spans[0].start_ns) / 1e6
+        attrs = " ".join(f"{k}={v}" for k, v in s.attributes.items())
+        lines.append(
+            f"{'  ' * depth}{s.name}  {s.duration_ms:.1f} ms (self {max(self_ms, 0.0):.1f} ms, "
+            f"+{offset_ms:.1f} ms){'  ' + attrs if attrs else ''}"
+        )
+        for k in kids:
+            walk(k, depth + 1)
+
+    for root in sorted(children.get(None, []), key=lambda k: k.start_ns):
+        walk(root, 0)
+    if trace.dropped:
+        lines.append(f"... {trace.dropped} more spans not recorded (TRACE_MAX_SPANS)")
+    return "\n".join(lines)
+
+
+# ======================================================
+# Export (OTLP/JSON, one trace per line)
+# ======================================================
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: Trace) -> dict:
+    spans = []
+    for s in trace.spans:
+        end_ns = s.end_ns if s.end_ns is not None else s.start_ns
+        item = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 2 if s.parent_id is None else 1,  # SERVER / INTERNAL
+            "startTimeUnixNano": str(trace.unix_ns(s.start_ns)),
+            "endTimeUnixNano": str(trace.unix_ns(end_ns)),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+        }
+        if s.parent_id is not None:
+            item["parentSpanId"] = s.parent_id
+        if "error" in s.attributes:
+            item["status"] = {"code": 2, "message": str(s.attributes["error"])}
+        spans.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]
+    }
+
+
+class TraceExporter:
+    """
+    Appends finished traces to a file from a background thread; requests
+    only enqueue (bounded queue, dropped and counted when full).
+    """
+
+    def __init__(self, path: str, max_queue: int = 10000):
+        self.path = path
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.exported_count = 0
+        self.dropped_count = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+
+    def submit(self, trace: Trace) -> None:
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            with self._lock:
+                self.dropped_count += 1
+
+    def _run(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                trace = self._queue.get()
+                if trace is None:
+                    break
+                batch = [trace]
+                while True:
+                    try:
+                        nxt = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is None:
+                        self._queue.put(None)
+                        break
+                    batch.append(nxt)
+                try:
+                    f.writelines(json.dumps(to_otlp(t), separators=(",", ":")) + "\n" for t in batch)
+                    f.flush()
+                    with self._lock:
+                        self.exported_count += len(batch)
+                except Exception:
+                    logger.exception("Failed to export %d traces", len(batch))
+
+    def stop(self, timeout: float = 10.0) -> None:
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"exported": self.exported_count, "dropped": self.dropped_count}
+
+
+trace_exporter: Optional[TraceExporter] = (
+    TraceExporter(settings.TRACE_EXPORT_PATH) if settings.TRACE_EXPORT_PATH else None
+)
+
+
+# ======================================================
+# ASGI middleware
+# ======================================================
+class TracingMiddleware:
+    """
+    Root span per HTTP request (named after the route template once routing
+    is done), X-Trace-Id on the response, slow-request log and export.
+    """
+
+    def __init__(self, app, slow_ms: float, sample_rate: float, max_spans: int, exclude=()):
+        self.app = app
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.max_spans = max_spans
+        self.exclude = frozenset(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(self.max_spans)
+        root = trace.start("http.request", None, {"http.method": scope["method"]})
+        trace_token = _trace.set(trace)
+        span_token = _span.set(root)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.set("http.status_code", message["status"])
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", trace.trace_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            root.set("error", type(e).__name__)
+            raise
+        finally:
+            _span.reset(span_token)
+            _trace.reset(trace_token)
+            root.end()
+            root.name = f"{scope['method']} {route_template(scope)}"
+            self._finish(trace, root)
+
+    def _finish(self, trace: Trace, root: Span) -> None:
+        slow = self.slow_ms > 0 and root.duration_ms >= self.slow_ms
+        if slow:
+            logger.warning(
+                "Slow request %.1f ms trace=%s\n%s", root.duration_ms, trace.trace_id, format_tree(trace)
+            )
+        if trace_exporter is not None and (slow or self.sample_rate >= 1 or random.random() < self.sample_rate):
+            trace_exporter.submit(trace)
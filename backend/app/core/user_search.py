@@ -0,0 +1,126 @@
+# backend/app/core/user_search.py
+#
+# بحث المستخدمين في لوحة الإدارة على السيرفر: بحث بالبادئة (prefix) على
+# username أو email (كلاهما unique → عليه index)، فلاتر role / locked / active،
+# ترقيم keyset على نفس العمود، وعدد إجمالي تقريبي.
+
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import quote, unquote
+
+from sqlalchemy import func, select, text
+
+from app.db.models.user import User
+from app.db.models.role import Role
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# COUNT(*) stops here; larger results are reported as an estimate
+COUNT_CAP = 10000
+
+SEARCH_FIELDS = ("username", "email")
+
+# InnoDB statistics, no scan (only used when nothing is filtered)
+TABLE_ROWS_ESTIMATE = text(
+    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+).bindparams(table=User.__tablename__)
+
+
+@dataclass(frozen=True)
+class UserFilter:
+    q: Optional[str] = None          # prefix of `by`
+    by: str = "username"             # username | email
+    role: Optional[str] = None
+    locked: Optional[bool] = None
+    active: Optional[bool] = None
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.q and self.role is None and self.locked is None and self.active is None
+
+
+def _prefix_pattern(prefix: str) -> str:
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+def _filtered(stmt, filters: UserFilter):
+    column = getattr(User, filters.by)
+    if filters.q:
+        # literal pattern 'abc%' → range scan on the unique index
+        stmt = stmt.where(column.like(_prefix_pattern(filters.q), escape="\\"))
+    if filters.role is not None:
+        stmt = stmt.where(Role.name == filters.role)
+    if filters.locked is not None:
+        stmt = stmt.where(User.is_locked == filters.locked)
+    if filters.active is not None:
+        stmt = stmt.where(User.is_active == filters.active)
+    return stmt
+
+
+def users_page_query(filters: UserFilter, cursor: Optional[str] = None, limit: Optional[int] = None):
+    """
+    Ordered by the search column; the cursor is the last row's username (or
+    email), so each page is an index range read from where the last one ended.
+    """
+    column = getattr(User, filters.by)
+    # أعمدة محددة فقط (بدون face_template / verifier / dek_wrapped)
+    stmt = _filtered(
+        select(
+            User.id,
+            User.username,
+            User.email,
+            User.is_active,
+            User.is_locked,
+            Role.name.label("role"),
+        ).join(Role),
+        filters,
+    )
+    if cursor is not None:
+        stmt = stmt.where(column > unquote(cursor))
+    stmt = stmt.order_by(column)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def count_query(filters: UserFilter, cap: int = COUNT_CAP):
+    """COUNT over at most cap + 1 matching rows."""
+    matching = _filtered(select(User.id).join(Role), filters).limit(cap + 1).subquery()
+    return select(func.count()).select_from(matching)
+
+
+def count_statement(filters: UserFilter, dialect_name: str):
+    """(statement, estimated) for the X-Total-Count header."""
+    if filters.is_empty and dialect_name == "mysql":
+        return TABLE_ROWS_ESTIMATE, True
+    return count_query(filters), False
+
+
+def total_headers(count: Optional[int], estimated: bool) -> dict:
+    count = int(count or 0)
+    if count > COUNT_CAP:
+        count, estimated = COUNT_CAP, True
+    headers = {"X-Total-Count": str(count)}
+    if estimated:
+        headers["X-Total-Count-Estimated"] = "1"
+    return headers
+
+
+def next_cursor(rows, limit: Optional[int], by: str) -> Optional[str]:
+    # percent-encoded: headers are latin-1 and usernames may not be
+    if limit is not None and len(rows) == limit:
+        return quote(getattr(rows[-1], by), safe="")
+    return None
+
+
+def user_row(u) -> dict:
+    return {
+        "id": u.id,
+        "username": u.username,
+        "email": u.email,
+        "is_active": u.is_active,
+        "is_locked": u.is_locked,
+        "role": u.role,
+    }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from sqlalchemy.sql import func
 
 from app.db.base import Base
@@ -6,6 +6,13 @@ from app.db.base import Base
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        # keyset pagination: ORDER BY created_at DESC, id DESC
+        # (InnoDB secondary indexes carry the PK, so id breaks ties without a filesort)
+        Index("ix_audit_logs_created_at", "created_at"),
+        Index("ix_audit_logs_target_created_at", "target_username", "created_at"),
+        Index("ix_audit_logs_action_created_at", "action", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, Double, LargeBinary
+
+from app.db.base import Base
+
+
+class AuthSession(Base):
+    """
+    Pending SRP / MFA handshake state shared between workers
+    (used when SESSION_BACKEND=sql).
+    """
+    __tablename__ = "auth_sessions"
+
+    sid = Column(String(64), primary_key=True)
+    kind = Column(String(8), primary_key=True)
+
+    # compact binary encoding produced by the auth routes' session codecs
+    payload = Column(LargeBinary, nullable=False)
+
+    # wall-clock epoch seconds, shared by every worker. DOUBLE, not FLOAT:
+    # MySQL's single-precision FLOAT rounds today's epoch to 128 s steps.
+    # Tables created with FLOAT: ALTER TABLE auth_sessions MODIFY expires_at DOUBLE NOT NULL
+    expires_at = Column(Double, nullable=False, index=True)
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, String, Double, Integer, Text
+
+from app.db.base import Base
+
+
+class ProvisioningJobRow(Base):
+    """
+    Bulk provisioning job state (/admin/users/bulk), shared by every worker:
+    the job runs in one worker's thread, but any worker can answer the poll.
+    """
+    __tablename__ = "provisioning_jobs"
+
+    id = Column(String(32), primary_key=True)
+    admin_username = Column(String(100), nullable=False)
+    status = Column(String(16), nullable=False)
+
+    # 1 while running, NULL afterwards: the unique index lets only one job
+    # run at a time across workers (NULLs don't collide)
+    running = Column(Integer, unique=True)
+
+    # ProvisionReport.to_dict() as JSON, rewritten after every batch
+    report = Column(Text, nullable=False)
+    error = Column(String(255))
+
+    # wall-clock epoch seconds (DOUBLE, see auth_sessions.expires_at);
+    # updated_at doubles as the heartbeat of a running job
+    created_at = Column(Double, nullable=False)
+    updated_at = Column(Double, nullable=False)
+    finished_at = Column(Double, index=True)
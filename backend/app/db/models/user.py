@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.mysql import MEDIUMTEXT
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, LargeBinary
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.dialects.mysql import MEDIUMBLOB
 from app.db.base import Base
 
 
@@ -14,7 +14,12 @@ class User(Base):
     salt = Column(String(256))
     verifier = Column(String(512))
     dek_wrapped = Column(String(1024))
-    face_template = Column(MEDIUMTEXT)
+    # [version][nonce][ciphertext] خام (انظر app/core/face_template.py)؛
+    # لا يحتاجه إلا /mfa/face → لا يُحمّل إلا عند الطلب (undefer)
+    face_template = deferred(Column(LargeBinary().with_variant(MEDIUMBLOB(), "mysql")))
+    # نسخة السيرفر من الـ embedding، مشفّرة بمفتاح السيرفر (app/core/face_reference.py)؛
+    # هي المرجع الذي يقارن به /mfa/face/verify
+    face_reference = deferred(Column(LargeBinary))
 
     is_active = Column(Boolean, default=True)
     is_locked = Column(Boolean, default=False)
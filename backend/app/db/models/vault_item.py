@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.mysql import MEDIUMTEXT
 from datetime import datetime
@@ -8,6 +8,11 @@ from app.db.base import Base
 
 class VaultItem(Base):
     __tablename__ = "vault_items"
+    __table_args__ = (
+        # keyset pagination: WHERE user_id = ? AND id < ? ORDER BY id DESC
+        # (replaces the old user_id index; existing databases: add_vault_indexes.py)
+        Index("ix_vault_items_user_id_id", "user_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -15,14 +20,13 @@ class VaultItem(Base):
         Integer,
         ForeignKey("users.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
 
     site = Column(String(255), nullable=False)
     site_username = Column(String(255), nullable=False)
 
     # AES-GCM encrypted (Base64)
-    secret_enc = Column(MEDIUMTEXT, nullable=False)
+    secret_enc = Column(Text().with_variant(MEDIUMTEXT(), "mysql"), nullable=False)
 
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
@@ -0,0 +1,139 @@
+# backend/app/db/pool.py
+#
+# إعدادات الـ connection pool من Settings + pool مُجهّز بعدّادات
+# (checkouts / انتظار / timeouts) لمعرفة متى يصبح الـ pool هو عنق الزجاجة.
+
+import threading
+import time
+from typing import Dict, Optional
+
+import anyio
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+from app.core.tracing import span
+
+# checkouts slower than this count as "waited" (a free connection is ~µs)
+WAIT_THRESHOLD_SEC = 0.001
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waited = 0
+        self.timeouts = 0
+        self.wait_sec_total = 0.0
+        self.wait_sec_max = 0.0
+
+    def observe(self, wait_sec: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            if wait_sec >= WAIT_THRESHOLD_SEC:
+                self.waited += 1
+                self.wait_sec_total += wait_sec
+                self.wait_sec_max = max(self.wait_sec_max, wait_sec)
+
+    def observe_timeout(self, wait_sec: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.wait_sec_max = max(self.wait_sec_max, wait_sec)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "waited": self.waited,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.wait_sec_total / self.waited * 1000, 3) if self.waited else 0.0,
+                "wait_ms_max": round(self.wait_sec_max * 1000, 3),
+            }
+
+
+class _MeteredPoolMixin:
+    """Times every checkout (_do_get), including the wait for a free slot."""
+
+    def __init__(self, *args, metrics: PoolMetrics = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics or PoolMetrics()
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            with span("db.pool.checkout"):
+                conn = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.observe_timeout(time.perf_counter() - t0)
+            raise
+        self.metrics.observe(time.perf_counter() - t0)
+        return conn
+
+    def recreate(self):
+        # dispose() / invalidation swaps in a new pool; keep the counters
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def stats(self) -> Dict[str, float]:
+        out = {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+        }
+        out.update(self.metrics.snapshot())
+        return out
+
+
+class MeteredQueuePool(_MeteredPoolMixin, QueuePool):
+    pass
+
+
+class MeteredAsyncQueuePool(_MeteredPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """create_engine / create_async_engine pool kwargs from Settings."""
+    options = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # in-memory SQLite keeps its single-connection pool
+        return options
+
+    options.update(
+        poolclass=MeteredAsyncQueuePool if is_async else MeteredQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    return options
+
+
+def pool_stats(engine) -> Dict[str, float]:
+    pool = getattr(engine, "sync_engine", engine).pool
+    if isinstance(pool, _MeteredPoolMixin):
+        return pool.stats()
+    return {"status": pool.status()}
+
+
+def pool_capacity(engine) -> Optional[int]:
+    """pool_size + max_overflow, or None when the pool is unbounded."""
+    pool = getattr(engine, "sync_engine", engine).pool
+    if not isinstance(pool, _MeteredPoolMixin) or pool._max_overflow < 0:
+        return None
+    return pool.size() + pool._max_overflow
+
+
+def configure_threadpool() -> int:
+    """Apply THREADPOOL_SIZE to AnyIO's default limiter (call from the event loop)."""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    if settings.THREADPOOL_SIZE > 0:
+        limiter.total_tokens = settings.THREADPOOL_SIZE
+    return limiter.total_tokens
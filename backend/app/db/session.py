@@ -1,12 +1,23 @@
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import anyio
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core import tracing
+from app.core.metrics import instrument_engine
+from app.db.pool import engine_options, pool_capacity, pool_stats
 
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_pre_ping=True,
-    echo=False  # اجعله True إذا بدك تشوف Queries
+    echo=False,  # اجعله True إذا بدك تشوف Queries
+    **engine_options(settings.DATABASE_URL),
 )
+instrument_engine(engine, "sync")
+tracing.instrument_engine(engine, "sync")
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -14,10 +25,142 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
-# Dependency للـ FastAPI
-def get_db():
-    db = SessionLocal()
+# عدد الطلبات التي تحمل اتصالاً من الـ pool في نفس اللحظة (لكل event loop)
+_request_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def request_slot_count() -> Optional[int]:
+    """
+    How many requests may use the sync pool at once: its capacity minus
+    DB_POOL_RESERVE (connections left to the audit writer and provisioning
+    threads, which are not admitted), and never more than the threadpool can
+    run, since a sync request keeps its thread while it holds the connection.
+    None when the pool is unbounded.
+    """
+    capacity = pool_capacity(engine)
+    if capacity is None:
+        return None
+    threads = int(anyio.to_thread.current_default_thread_limiter().total_tokens)
+    return max(1, min(capacity - settings.DB_POOL_RESERVE, threads))
+
+
+def _slots_for_loop() -> Optional[asyncio.Semaphore]:
+    loop = asyncio.get_running_loop()
+    slots = _request_slots.get(loop)
+    if slots is None:
+        count = request_slot_count()
+        if count is None:
+            return None
+        slots = _request_slots[loop] = asyncio.Semaphore(count)
+    return slots
+
+
+@asynccontextmanager
+async def admit():
+    """
+    Hold one request slot. get_db takes one for its Session; anything else
+    that uses the sync pool for a request (the SQL session store from the
+    async router, short-lived Sessions of its own) must wrap that use in this.
+    """
+    slots = _slots_for_loop()
+    if slots is None:
+        yield
+        return
+    with tracing.span("db.admit"):
+        await slots.acquire()
     try:
-        yield db
+        yield
     finally:
-        db.close()
\ No newline at end of file
+        slots.release()
+
+
+@asynccontextmanager
+async def request_session():
+    async with admit():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await anyio.to_thread.run_sync(db.close)
+
+
+# Dependency للـ FastAPI
+async def get_db():
+    """
+    One Session per request, admitted only while the pool has a connection
+    for it.
+
+    Sync handlers run on AnyIO's threadpool, and FastAPI validates their
+    response on that same threadpool before the Session is closed. Without
+    the admission limit, threads blocked on a pool checkout can hold every
+    worker slot while the requests holding connections wait for a slot to
+    finish, and everything stalls until DB_POOL_TIMEOUT. Waiting here, on the
+    event loop, costs no thread.
+    """
+    async with request_session() as db:
+        yield db
+
+
+# ======================================================
+# Async path (DB_ASYNC=1)
+# ======================================================
+_ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+_async_engine = None
+_AsyncSessionLocal = None
+
+
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def get_async_engine():
+    # يُنشأ عند أول استخدام فقط، حتى لا يصبح aiomysql/aiosqlite إلزامياً في المسار المتزامن
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+        url = settings.ASYNC_DATABASE_URL or to_async_url(settings.DATABASE_URL)
+        _async_engine = create_async_engine(
+            url,
+            echo=False,
+            **engine_options(url, is_async=True),
+        )
+        instrument_engine(_async_engine, "async")
+        tracing.instrument_engine(_async_engine, "async")
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine,
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+    return _async_engine
+
+
+# Dependency للـ FastAPI (async handlers)
+async def get_async_db():
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
+
+
+def db_pool_stats() -> dict:
+    """Pool counters for the sync engine and, once created, the async one."""
+    out = {"sync": pool_stats(engine)}
+    if _async_engine is not None:
+        out["async"] = pool_stats(_async_engine)
+    return out
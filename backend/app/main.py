@@ -1,18 +1,53 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 import os
 
+import anyio
+
+from app.core.config import settings
+from app.core.audit import audit_writer
+from app.core.kdf_executor import kdf_executor
+from app.core.metrics import MetricsMiddleware
+from app.core.tracing import TracingMiddleware, trace_exporter
+from app.core.srp_utils import get_srp_engine
+from app.core.static_assets import AssetStaticFiles
+from app.db.pool import configure_threadpool
+from app.db.session import dispose_async_engine
+
 from app.api.v1.auth_routes import router as auth_router
 from app.api.v1.mfa_face_routes import router as mfa_face_router
 from app.api.v1.vault_routes import router as vault_router  # ✅
 from app.api.v1 import admin_routes
 from app.api.v1.vault_routes import router as vault_router
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    kdf_executor.start()
+    configure_threadpool()
+    audit_writer.start()
+    if trace_exporter is not None:
+        trace_exporter.start()
+    get_srp_engine()  # build the fixed-base table before the first login
+    if settings.STATIC_BUILD_ON_STARTUP:
+        await anyio.to_thread.run_sync(frontend_static.build)
+    else:
+        # build_static.py ran ahead of time
+        await anyio.to_thread.run_sync(frontend_static.load)
+    yield
+    audit_writer.stop()
+    if trace_exporter is not None:
+        trace_exporter.stop()
+    kdf_executor.shutdown()
+    await dispose_async_engine()
+
+
 app = FastAPI(
     title="Password Manager MFA Backend",
     description="Secure system using SRP + Face MFA + Encrypted Vault",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -28,8 +63,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# /metrics exposes route traffic and pool / queue internals: never unauthenticated
+if settings.METRICS_ENABLED and not settings.METRICS_TOKEN:
+    raise RuntimeError("METRICS_ENABLED=1 requires METRICS_TOKEN")
+
+# per-route latency / status. add_middleware puts each new layer outside the
+# previous ones: added after CORS, so it wraps CORS and sees preflights too;
+# TracingMiddleware below is added after it and is the outermost layer
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, exclude=("/metrics",))
+
+# span tree per request (slow-request log, TRACE_EXPORT_PATH); outermost, so
+# its root span also covers metrics and CORS
+if settings.TRACING_ENABLED:
+    app.add_middleware(
+        TracingMiddleware,
+        slow_ms=settings.TRACE_SLOW_MS,
+        sample_rate=settings.TRACE_SAMPLE_RATE,
+        max_spans=settings.TRACE_MAX_SPANS,
+        # /admin/profile is slow by design
+        exclude=("/metrics", "/admin/profile"),
+    )
+
 FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../frontend"))
-app.mount("/frontend", StaticFiles(directory=FRONTEND_DIR), name="frontend")
+frontend_static = AssetStaticFiles(directory=FRONTEND_DIR, build_dir=settings.STATIC_BUILD_DIR)
+app.mount("/frontend", frontend_static, name="frontend")
+
+# DB_ASYNC=1: async routers are registered first, so their routes win the match;
+# anything they don't reimplement still falls through to the sync routers below.
+if settings.DB_ASYNC:
+    from app.api.v1 import auth_routes_async, vault_routes_async, admin_routes_async
+
+    app.include_router(auth_routes_async.router, prefix="/auth", include_in_schema=False)
+    app.include_router(vault_routes_async.router, include_in_schema=False)
+    app.include_router(admin_routes_async.router, include_in_schema=False)
 
 app.include_router(auth_router, prefix="/auth", tags=["Auth"])
 app.include_router(mfa_face_router)      # /mfa/face/...
@@ -37,6 +104,11 @@ app.include_router(vault_router)         # /vault/...
 app.include_router(admin_routes.router)
 app.include_router(vault_router)
 
+if settings.METRICS_ENABLED:
+    from app.api.v1 import metrics_routes
+
+    app.include_router(metrics_routes.router)
+
 
 @app.get("/")
 def root():
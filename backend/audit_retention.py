@@ -0,0 +1,55 @@
+"""
+Audit log retention: archive and drop audit_logs months past the retention window.
+
+    cd backend
+    python audit_retention.py --partition     # once, MySQL: monthly partitions
+    python audit_retention.py --dry-run       # show what would expire
+    python audit_retention.py                 # archive + drop (e.g. daily from cron)
+    python audit_retention.py --months 6 --compression zstd --archive-dir /srv/audit
+
+On a partitioned MySQL table each run also pre-creates partitions for the
+coming months. Expired months are written to <archive-dir>/audit_logs-YYYY-MM
+.ndjson.gz (or .zst) before they are removed; --no-archive drops them outright.
+Without partitions (SQLite, or MySQL before --partition) rows are deleted in
+small batches instead.
+"""
+
+import argparse
+import json
+import logging
+
+from app.core.audit_retention import partition_audit_log, run_retention
+from app.core.config import settings
+
+
+def _parse_args():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--partition", action="store_true", help="convert audit_logs to monthly partitions (MySQL, one-time)")
+    p.add_argument("--months", type=int, help=f"months to keep (default: {settings.AUDIT_RETENTION_MONTHS})")
+    p.add_argument("--archive-dir", help=f"default: {settings.AUDIT_ARCHIVE_DIR}")
+    p.add_argument("--compression", choices=("gzip", "zstd"), help=f"default: {settings.AUDIT_ARCHIVE_COMPRESSION}")
+    p.add_argument("--no-archive", action="store_true", help="drop expired rows without archiving them")
+    p.add_argument("--dry-run", action="store_true", help="report only, change nothing")
+    return p.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = _parse_args()
+
+    if args.partition:
+        created = partition_audit_log()
+        print("Partitions created: " + (", ".join(created) if created else "none (already partitioned)"))
+
+    report = run_retention(
+        months=args.months,
+        archive=not args.no_archive,
+        archive_dir=args.archive_dir,
+        compression=args.compression,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(report.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Microbenchmarks for the crypto and SRP primitives behind register/login
+(app.core.crypto_utils, app.core.srp_utils), with a stored baseline.
+
+    cd backend
+    python -m benchmarks.bench_primitives
+    python -m benchmarks.bench_primitives --filter srp --quick
+    python -m benchmarks.bench_primitives --save-baseline benchmarks/primitives_baseline.json
+    python -m benchmarks.bench_primitives --baseline benchmarks/primitives_baseline.json --tolerance 0.25
+    python -m benchmarks.bench_primitives --json --output results.json
+
+Every case is timed like timeit: the number of calls per batch is grown
+until a batch takes --min-time, then --repeat batches are timed and the
+per-call min / median are reported. Cases are named
+"<primitive>[param=value,...]" so results from different runs line up.
+
+With --baseline, each case's median is compared to the stored one and the
+run exits with status 1 if any case is slower by more than --tolerance
+(0.25 = 25 %). Cases missing from the baseline are reported as new and do
+not fail the run. Baselines are only meaningful on the machine that
+recorded them; save one per CI runner / dev box.
+
+Argon2 cases allocate their memory cost on every call (64 MiB for the
+production parameters), so derive_kek dominates the run time; use
+--filter to skip it while iterating on something else.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import srp
+
+from app.core import crypto_utils
+from app.core import srp_utils
+from app.core.crypto_utils import (
+    decrypt_with_dek,
+    derive_kek,
+    encrypt_with_dek,
+    generate_dek,
+    unwrap_dek,
+    wrap_dek,
+)
+from app.core.srp_utils import SrpServerEngine, create_srp_verifier
+
+HASH = srp.SHA1
+
+# (time_cost, memory_cost KiB, parallelism); the first is what derive_kek uses
+ARGON2_PARAMS = [
+    (crypto_utils.ARGON2_TIME_COST, crypto_utils.ARGON2_MEMORY_COST_KIB, crypto_utils.ARGON2_PARALLELISM),
+    (2, 19456, 1),     # OWASP minimum for Argon2id
+    (1, 262144, 4),    # memory-heavy alternative
+]
+# vault secret, face embedding (128 float32), large note / attachment
+PAYLOAD_SIZES = [64, 512, 65536]
+SRP_GROUPS = {2048: srp.NG_2048, 4096: srp.NG_4096}
+ENGINE_WINDOWS = [4, 8]
+
+
+def _parse_args():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--filter", action="append", default=[], help="only cases whose name contains this, case-insensitive (repeatable)")
+    p.add_argument("--min-time", type=float, default=0.2, help="seconds per timed batch")
+    p.add_argument("--repeat", type=int, default=5, help="timed batches per case")
+    p.add_argument("--quick", action="store_true", help="--min-time 0.05 --repeat 3")
+    p.add_argument("--baseline", help="compare against this results file")
+    p.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (fraction)")
+    p.add_argument("--save-baseline", metavar="PATH", help="write this run's results as the new baseline")
+    p.add_argument("--output", metavar="PATH", help="also write results JSON here")
+    p.add_argument("--json", action="store_true", help="print results as JSON")
+    return p.parse_args()
+
+
+# ======================================================
+# Cases
+# ======================================================
+
+def _case_name(primitive, **params):
+    if not params:
+        return primitive
+    return f"{primitive}[{','.join(f'{k}={v}' for k, v in params.items())}]"
+
+
+@contextlib.contextmanager
+def _argon2_params(time_cost, memory_kib, parallelism):
+    # derive_kek reads the module constants on every call
+    saved = (crypto_utils.ARGON2_TIME_COST, crypto_utils.ARGON2_MEMORY_COST_KIB, crypto_utils.ARGON2_PARALLELISM)
+    crypto_utils.ARGON2_TIME_COST = time_cost
+    crypto_utils.ARGON2_MEMORY_COST_KIB = memory_kib
+    crypto_utils.ARGON2_PARALLELISM = parallelism
+    try:
+        yield
+    finally:
+        (crypto_utils.ARGON2_TIME_COST,
+         crypto_utils.ARGON2_MEMORY_COST_KIB,
+         crypto_utils.ARGON2_PARALLELISM) = saved
+
+
+def _srp_handshake(username, password, salt, vkey, ng_type):
+    """One client handshake against pysrp: returns (A, b, B, M)."""
+    usr = srp.User(username, password, hash_alg=HASH, ng_type=ng_type)
+    _, A = usr.start_authentication()
+    svr = srp.Verifier(username, salt, vkey, A, hash_alg=HASH, ng_type=ng_type)
+    _, B = svr.get_challenge()
+    M = usr.process_challenge(salt, B)
+    return A, svr.get_ephemeral_secret(), B, M
+
+
+def _cases():
+    """Yields (name, params, fn, context) — fn takes no arguments."""
+    password = "correct horse battery staple"
+    salt = os.urandom(32)
+
+    for t, m, par in ARGON2_PARAMS:
+        params = {"t": t, "m": m, "p": par}
+        yield _case_name("derive_kek", **params), params, lambda: derive_kek(password, salt), _argon2_params(t, m, par)
+
+    kek, dek = os.urandom(32), generate_dek()
+    wrapped = wrap_dek(kek, dek)
+    yield "generate_dek", {}, generate_dek, None
+    yield "wrap_dek", {}, lambda: wrap_dek(kek, dek), None
+    yield "unwrap_dek", {}, lambda: unwrap_dek(kek, wrapped), None
+
+    for size in PAYLOAD_SIZES:
+        plaintext = os.urandom(size)
+        ciphertext = encrypt_with_dek(dek, plaintext)
+        yield _case_name("encrypt_with_dek", bytes=size), {"bytes": size}, (
+            lambda p=plaintext: encrypt_with_dek(dek, p)), None
+        yield _case_name("decrypt_with_dek", bytes=size), {"bytes": size}, (
+            lambda c=ciphertext: decrypt_with_dek(dek, c)), None
+
+    username = "bench"
+    yield _case_name("create_srp_verifier", group=2048), {"group": 2048}, (
+        lambda: create_srp_verifier(username, password)), None
+
+    for bits, ng_type in SRP_GROUPS.items():
+        salt_b, vkey = srp.create_salted_verification_key(username, password, hash_alg=HASH, ng_type=ng_type)
+        A, b, B, M = _srp_handshake(username, password, salt_b, vkey, ng_type)
+
+        def verifier_challenge(A=A, salt_b=salt_b, vkey=vkey, ng_type=ng_type):
+            # login_start: pysrp computes S, M and H_AMK up front in the constructor
+            svr = srp.Verifier(username, salt_b, vkey, A, hash_alg=HASH, ng_type=ng_type)
+            return svr.get_challenge()
+
+        def verifier_verify(A=A, b=b, M=M, salt_b=salt_b, vkey=vkey, ng_type=ng_type):
+            # login_verify with the session rebuilt from the stored b
+            svr = srp.Verifier(username, salt_b, vkey, A, hash_alg=HASH, ng_type=ng_type, bytes_b=b)
+            if svr.verify_session(M) is None:
+                raise AssertionError("srp.Verifier rejected a valid proof")
+
+        yield _case_name("srp.Verifier.challenge", group=bits), {"group": bits}, verifier_challenge, None
+        yield _case_name("srp.Verifier.verify", group=bits), {"group": bits}, verifier_verify, None
+
+        for window in ENGINE_WINDOWS:
+            engine = SrpServerEngine(hash_alg=HASH, ng_type=ng_type, window=window)
+            b_e, B_e = engine.challenge(vkey)
+            usr = srp.User(username, password, hash_alg=HASH, ng_type=ng_type)
+            _, A_e = usr.start_authentication()
+            M_e = usr.process_challenge(salt_b, B_e)
+
+            def engine_verify(engine=engine, A_e=A_e, b_e=b_e, B_e=B_e, M_e=M_e, salt_b=salt_b, vkey=vkey):
+                if engine.verify(username, salt_b, vkey, A_e, b_e, B_e, M_e) is None:
+                    raise AssertionError("SrpServerEngine rejected a valid proof")
+
+            params = {"group": bits, "window": window}
+            yield _case_name("SrpServerEngine.challenge", **params), params, (
+                lambda engine=engine, vkey=vkey: engine.challenge(vkey)), None
+            yield _case_name("SrpServerEngine.verify", **params), params, engine_verify, None
+            if bits == 2048 and window == 8:
+                yield _case_name("SrpServerEngine.create_verifier", **params), params, (
+                    lambda engine=engine: engine.create_verifier(username, password)), None
+
+
+# ======================================================
+# Timing
+# ======================================================
+
+def _time_batch(fn, number):
+    t0 = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return time.perf_counter() - t0
+
+
+def _measure(fn, min_time, repeat):
+    fn()  # warm-up (lazy tables, imports, allocator)
+    number = 1
+    while True:
+        elapsed = _time_batch(fn, number)
+        if elapsed >= min_time:
+            break
+        # jump straight to roughly min_time instead of doubling for slow cases
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.1))
+
+    per_call = [_time_batch(fn, number) / number for _ in range(repeat)]
+    median = statistics.median(per_call)
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min_us": round(min(per_call) * 1e6, 3),
+        "median_us": round(median * 1e6, 3),
+        "stdev_us": round(statistics.pstdev(per_call) * 1e6, 3),
+        "ops_per_sec": round(1 / median, 1),
+    }
+
+
+def _environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "srp_bignum": "libcrypto" if srp_utils._crypto is not None else "python",
+    }
+
+
+def run(filters, min_time, repeat):
+    results = {}
+    for name, params, fn, ctx in _cases():
+        if filters and not any(f.lower() in name.lower() for f in filters):
+            continue
+        with ctx or contextlib.nullcontext():
+            entry = _measure(fn, min_time, repeat)
+        entry["params"] = params
+        results[name] = entry
+    return results
+
+
+# ======================================================
+# Baseline
+# ======================================================
+
+def compare(results, baseline, tolerance):
+    """Returns {name: (baseline_us, current_us, ratio, status)}."""
+    out = {}
+    base_cases = baseline.get("cases", {})
+    for name, entry in results.items():
+        base = base_cases.get(name)
+        if base is None:
+            out[name] = (None, entry["median_us"], None, "new")
+            continue
+        ratio = entry["median_us"] / base["median_us"] if base["median_us"] else 1.0
+        if ratio > 1 + tolerance:
+            status = "REGRESSION"
+        elif ratio < 1 / (1 + tolerance):
+            status = "faster"
+        else:
+            status = "ok"
+        out[name] = (base["median_us"], entry["median_us"], round(ratio, 3), status)
+    return out
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def main():
+    args = _parse_args()
+    if args.quick:
+        args.min_time, args.repeat = 0.05, 3
+
+    document = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": _environment(),
+        "settings": {"min_time": args.min_time, "repeat": args.repeat},
+        "cases": run(args.filter, args.min_time, args.repeat),
+    }
+
+    comparison = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = compare(document["cases"], baseline, args.tolerance)
+        document["baseline"] = {
+            "path": args.baseline,
+            "created_at": baseline.get("created_at"),
+            "tolerance": args.tolerance,
+            "regressions": sorted(n for n, c in comparison.items() if c[3] == "REGRESSION"),
+        }
+        if baseline.get("environment", {}).get("platform") != document["environment"]["platform"]:
+            print("warning: baseline was recorded on a different platform", file=sys.stderr)
+
+    if args.output:
+        _write_json(args.output, document)
+    if args.save_baseline:
+        _write_json(args.save_baseline, document)
+
+    if args.json:
+        print(json.dumps(document, indent=2, sort_keys=True))
+    else:
+        env = document["environment"]
+        print(f"python {env['python']}, {env['cpu_count']} CPUs, SRP bignums: {env['srp_bignum']}")
+        header = f"{'case':<54}{'median µs':>14}{'min µs':>14}{'ops/s':>12}"
+        if comparison:
+            header += f"{'baseline µs':>14}{'ratio':>8}  status"
+        print(header)
+        for name, entry in document["cases"].items():
+            line = f"{name:<54}{entry['median_us']:>14}{entry['min_us']:>14}{entry['ops_per_sec']:>12}"
+            if comparison:
+                base_us, _, ratio, status = comparison[name]
+                line += f"{base_us if base_us is not None else '-':>14}{ratio if ratio is not None else '-':>8}  {status}"
+            print(line)
+
+    if comparison and document["baseline"]["regressions"]:
+        print(
+            f"{len(document['baseline']['regressions'])} case(s) slower than baseline by more than "
+            f"{args.tolerance:.0%}: {', '.join(document['baseline']['regressions'])}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+SRP server handshakes/sec per core: pysrp's Verifier vs SrpServerEngine.
+
+Only server-side work is timed (login_start challenge + login_verify proof
+check); the client half runs with pysrp between the two timed phases.
+
+    cd backend
+    python -m benchmarks.bench_srp --handshakes 500
+
+Variants:
+  pysrp          srp.Verifier kept in memory between the two steps
+  pysrp-rebuild  srp.Verifier rebuilt from the stored b (SESSION_BACKEND=sql)
+  engine         SrpServerEngine with the precomputed fixed-base table
+"""
+
+import argparse
+import json
+import time
+
+import srp
+
+from app.core.srp_utils import SrpServerEngine
+
+HASH = srp.SHA1
+GROUP = srp.NG_2048
+
+
+def _parse_args():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--handshakes", type=int, default=500)
+    p.add_argument("--window", type=int, default=8, help="fixed-base table window (bits)")
+    p.add_argument("--json", action="store_true", help="print results as JSON")
+    return p.parse_args()
+
+
+def _client(username, password):
+    usr = srp.User(username, password, hash_alg=HASH, ng_type=GROUP)
+    _, A = usr.start_authentication()
+    return usr, A
+
+
+def _run_pysrp(n, username, password, salt, vkey, rebuild):
+    t_challenge = t_verify = 0.0
+    for _ in range(n):
+        usr, A = _client(username, password)
+
+        t0 = time.perf_counter()
+        svr = srp.Verifier(username, salt, vkey, A, hash_alg=HASH, ng_type=GROUP)
+        _, B = svr.get_challenge()
+        b = svr.get_ephemeral_secret()
+        t_challenge += time.perf_counter() - t0
+
+        M = usr.process_challenge(salt, B)
+
+        t0 = time.perf_counter()
+        if rebuild:
+            svr = srp.Verifier(username, salt, vkey, A, hash_alg=HASH, ng_type=GROUP, bytes_b=b)
+        HAMK = svr.verify_session(M)
+        t_verify += time.perf_counter() - t0
+
+        usr.verify_session(HAMK)
+        assert usr.authenticated()
+    return t_challenge, t_verify
+
+
+def _run_engine(n, engine, username, password, salt, vkey):
+    t_challenge = t_verify = 0.0
+    for _ in range(n):
+        usr, A = _client(username, password)
+
+        t0 = time.perf_counter()
+        engine.is_valid_A(A)
+        b, B = engine.challenge(vkey)
+        t_challenge += time.perf_counter() - t0
+
+        M = usr.process_challenge(salt, B)
+
+        t0 = time.perf_counter()
+        proof = engine.verify(username, salt, vkey, A, b, B, M)
+        t_verify += time.perf_counter() - t0
+
+        usr.verify_session(proof.H_AMK)
+        assert usr.authenticated()
+    return t_challenge, t_verify
+
+
+def main():
+    args = _parse_args()
+    username, password = "bench", "bench-password"
+    salt, vkey = srp.create_salted_verification_key(username, password, hash_alg=HASH, ng_type=GROUP)
+
+    t0 = time.perf_counter()
+    engine = SrpServerEngine(hash_alg=HASH, ng_type=GROUP, window=args.window)
+    table_build_sec = time.perf_counter() - t0
+
+    n = args.handshakes
+    runs = {
+        "pysrp": _run_pysrp(n, username, password, salt, vkey, rebuild=False),
+        "pysrp-rebuild": _run_pysrp(n, username, password, salt, vkey, rebuild=True),
+        "engine": _run_engine(n, engine, username, password, salt, vkey),
+    }
+
+    results = {"handshakes": n, "window": args.window, "table_build_sec": round(table_build_sec, 3)}
+    for name, (t_challenge, t_verify) in runs.items():
+        results[name] = {
+            "challenge_us": round(t_challenge / n * 1e6, 1),
+            "verify_us": round(t_verify / n * 1e6, 1),
+            "handshakes_per_sec": round(n / (t_challenge + t_verify), 1),
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{n} handshakes, window={args.window}, table built in {results['table_build_sec']}s")
+    print(f"{'variant':<15}{'challenge µs':>14}{'verify µs':>12}{'handshakes/s':>15}")
+    for name in runs:
+        r = results[name]
+        print(f"{name:<15}{r['challenge_us']:>14}{r['verify_us']:>12}{r['handshakes_per_sec']:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Precompute frontend asset fingerprints and gzip/brotli variants.
+
+    cd backend
+    python build_static.py
+
+Writes into STATIC_BUILD_DIR (content-addressed, safe to share between
+workers) together with manifest.json, the index of the build. With
+STATIC_BUILD_ON_STARTUP=0 the server loads that manifest at startup instead
+of building, so run this (or start one server with the default) first.
+brotli variants need the optional `brotli` package.
+"""
+
+import os
+
+from app.core.config import settings
+from app.core.static_assets import AssetStaticFiles, brotli
+
+FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../frontend"))
+
+
+def main():
+    static = AssetStaticFiles(directory=FRONTEND_DIR, build_dir=settings.STATIC_BUILD_DIR)
+    print(f"Building static assets into {settings.STATIC_BUILD_DIR} ...")
+    if brotli is None:
+        print("brotli not installed: gzip variants only")
+
+    assets = static.build()
+
+    original = compressed = 0
+    for asset in assets.values():
+        original += asset.size
+        best = min((os.path.getsize(p) for p in asset.variants.values()), default=asset.size)
+        compressed += best
+    print(f"{len(assets)} files, {original / 1024:.0f} KiB → {compressed / 1024:.0f} KiB precompressed")
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
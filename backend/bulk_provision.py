@@ -0,0 +1,67 @@
+"""
+Bulk-create users from a CSV or NDJSON file.
+
+    cd backend
+    python bulk_provision.py users.csv
+    python bulk_provision.py users.ndjson --workers 8 --batch-size 1000
+
+CSV needs a header with username,email,password (role optional, default
+"user"); NDJSON is one {"username", "email", "password", "role"} per line.
+Existing usernames/emails are skipped. Only PROVISION_ALLOWED_ROLES may be
+assigned; --allow-role admin widens that for one trusted run.
+"""
+
+import argparse
+import json
+import sys
+
+from app.core.kdf_executor import KdfExecutor, _default_workers
+from app.core.provisioning import allowed_roles, iter_records, provision_users
+
+
+def _parse_args():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("path", help="CSV or NDJSON file ('-' for stdin)")
+    p.add_argument("--format", choices=("csv", "ndjson"), help="default: from the file extension")
+    p.add_argument("--workers", type=int, default=0, help="process pool size (default: sized like the KDF pool)")
+    p.add_argument("--batch-size", type=int, default=0, help="users per transaction (default: PROVISION_BATCH_SIZE)")
+    p.add_argument("--allow-role", action="append", default=[], help="also accept this role (repeatable)")
+    return p.parse_args()
+
+
+def _progress(report):
+    print(
+        f"\r{report.total} read, {report.created} created, {report.skipped} skipped, "
+        f"{report.failed} failed, {report.users_per_min:.0f} users/min",
+        end="",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def main():
+    args = _parse_args()
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+
+    # no server to share with: this run gets a pool of its own, all of it
+    executor = KdfExecutor(workers=args.workers or _default_workers(), queue_limit=0)
+    f = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8-sig")
+    try:
+        with f:
+            report = provision_users(
+                iter_records(f, fmt),
+                workers=executor.workers,
+                batch_size=args.batch_size,
+                progress=_progress,
+                roles=allowed_roles() | set(args.allow_role),
+                executor=executor,
+            )
+    finally:
+        executor.shutdown()
+
+    print(file=sys.stderr)
+    print(json.dumps(report.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ from app.db.models.user import User
 from app.db.models.role import Role
 from app.db.models.vault_item import VaultItem
 from app.db.models.audit_log import AuditLog
+from app.db.models.auth_session import AuthSession
+from app.db.models.provisioning_job import ProvisioningJobRow
 
 
 print("Creating database tables...")
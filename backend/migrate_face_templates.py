@@ -0,0 +1,71 @@
+"""
+One-off migration: users.face_template base64 MEDIUMTEXT -> versioned LargeBinary.
+
+    cd backend
+    python migrate_face_templates.py
+
+On MySQL the column is first altered to MEDIUMBLOB (the base64 text is kept
+as bytes), then every row is rewritten as [version][nonce][ciphertext] in
+batches. Rows already in the new format are skipped, so it is safe to re-run.
+"""
+
+from sqlalchemy import text
+
+from app.db.session import engine
+from app.core.face_template import (
+    FACE_TEMPLATE_VERSION,
+    InvalidFaceTemplateError,
+    pack_template,
+    payload_from_b64,
+)
+
+BATCH_SIZE = 500
+
+
+def main():
+    if engine.dialect.name == "mysql":
+        print("Altering users.face_template to MEDIUMBLOB...")
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE users MODIFY face_template MEDIUMBLOB NULL"))
+
+    converted = skipped = failed = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT id, face_template FROM users "
+                    "WHERE id > :last_id AND face_template IS NOT NULL "
+                    "ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": BATCH_SIZE},
+            ).all()
+            if not rows:
+                break
+
+            updates = []
+            for user_id, value in rows:
+                raw = value.encode("utf-8") if isinstance(value, str) else bytes(value)
+                if raw[:1] == bytes([FACE_TEMPLATE_VERSION]):
+                    skipped += 1
+                    continue
+                try:
+                    payload = payload_from_b64(raw.decode("ascii").strip())
+                except (InvalidFaceTemplateError, UnicodeDecodeError):
+                    failed += 1
+                    print(f"  user {user_id}: not a base64 template, left unchanged")
+                    continue
+                updates.append({"id": user_id, "blob": pack_template(payload)})
+
+            if updates:
+                conn.execute(text("UPDATE users SET face_template = :blob WHERE id = :id"), updates)
+            converted += len(updates)
+            last_id = rows[-1][0]
+
+        print(f"  up to user {last_id}: {converted} converted, {skipped} already binary, {failed} failed")
+
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
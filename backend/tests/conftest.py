@@ -0,0 +1,9 @@
+import os
+import sys
+
+# tests import the backend as `app`, the same way uvicorn runs it from backend/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# importing app.db.session builds the engine: tests never talk to the MySQL
+# default, and bring their own SQLite databases where they need one
+os.environ.setdefault("DATABASE_URL", "sqlite://")
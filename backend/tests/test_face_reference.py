@@ -0,0 +1,33 @@
+"""Server-held face references: sealed with the server key and bound to their user."""
+
+import numpy as np
+import pytest
+
+from app.core.face_matcher import match
+from app.core.face_reference import InvalidFaceReferenceError, open_reference, seal_reference
+
+
+def _face(seed):
+    return np.random.default_rng(seed).normal(0.0, 0.1, 128).astype(np.float32)
+
+
+def test_seal_round_trip():
+    face = _face(1)
+    blob = seal_reference(7, face)
+    assert face.tobytes() not in blob
+    np.testing.assert_array_equal(open_reference(7, blob), face)
+
+
+def test_sealed_reference_is_bound_to_its_user():
+    blob = seal_reference(7, _face(1))
+    with pytest.raises(InvalidFaceReferenceError):
+        open_reference(8, blob)
+    with pytest.raises(InvalidFaceReferenceError):
+        open_reference(7, blob[:-1] + bytes([blob[-1] ^ 1]))
+
+
+def test_reference_matches_only_its_face():
+    reference = open_reference(3, seal_reference(3, _face(1)))
+    assert match(reference, np.stack([_face(1)] * 3)).matched
+    assert not match(reference, np.stack([_face(2)] * 3)).matched
+
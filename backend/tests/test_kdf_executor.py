@@ -0,0 +1,24 @@
+"""Background work through KdfExecutor.map shares the request slots instead of adding a pool."""
+
+import pytest
+
+from app.core.kdf_executor import KdfExecutor, KdfSaturatedError
+
+
+@pytest.fixture
+def executor():
+    executor = KdfExecutor(workers=2, queue_limit=0)
+    yield executor
+    executor.shutdown()
+
+
+def test_map_keeps_order_and_releases_slots(executor):
+    assert executor.map(abs, [-3, 2, -1], limit=2) == [3, 2, 1]
+    stats = executor.stats()
+    assert stats["in_flight"] == 0 and stats["completed"] == 3
+    # every slot is free again for requests
+    executor._admit()
+    executor._admit()
+    with pytest.raises(KdfSaturatedError):
+        executor._admit()
+
@@ -0,0 +1,34 @@
+"""SqlSessionStore eviction: above max_size, exactly the oldest excess rows go."""
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.models.auth_session import AuthSession
+from app.core.session_store import SqlSessionStore
+
+
+def _store(tmp_path, clock):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sessions.db'}")
+    Base.metadata.create_all(engine, tables=[AuthSession.__table__])
+    factory = sessionmaker(bind=engine)
+    store = SqlSessionStore(
+        "test", ttl_sec=60, max_size=5, encode=bytes, decode=bytes,
+        session_factory=factory, purge_every=10, clock=clock,
+    )
+    return store, factory
+
+
+def test_eviction_with_tied_expiries(tmp_path):
+    store, factory = _store(tmp_path, clock=lambda: 1000.0)
+    for i in range(10):  # same clock: every expires_at ties
+        store.put(f"s{i}", b"x")
+
+    # purge ran before the 10th put: 9 rows, cap 5 -> 4 evicted, not all 9
+    assert store.evicted_count == 4
+    db = factory()
+    try:
+        assert db.query(AuthSession).count() == 6
+    finally:
+        db.close()
+    assert store.get("s9") == b"x"
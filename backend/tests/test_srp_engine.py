@@ -0,0 +1,126 @@
+"""
+SrpServerEngine must stay byte-for-byte compatible with pysrp: the browser
+client and test_srp_client.py speak pysrp's SRP-6a variant, and the engine
+replaces srp.Verifier on every login.
+"""
+
+import secrets
+
+import pytest
+import srp
+import srp._pysrp as pysrp_py
+
+from app.core import srp_utils
+from app.core.srp_utils import SrpServerEngine
+
+HASH = srp.SHA1
+GROUP = srp.NG_2048
+ROUNDS = 25
+
+
+@pytest.fixture(params=["libcrypto", "python"])
+def engine(request, monkeypatch):
+    if request.param == "libcrypto":
+        if srp_utils._crypto is None:
+            pytest.skip("libcrypto not available")
+    else:
+        monkeypatch.setattr(srp_utils, "_crypto", None)
+    # small window: the table is built per test
+    eng = SrpServerEngine(hash_alg=HASH, ng_type=GROUP, window=4)
+    expected = srp_utils._OpenSslGroup if request.param == "libcrypto" else srp_utils._PythonGroup
+    assert isinstance(eng._group, expected)
+    return eng
+
+
+# pysrp's two Verifiers insist on different lengths for bytes_b (leading zeros keep the value)
+_B_LEN = {srp.Verifier: 32, pysrp_py.Verifier: 256}
+
+
+@pytest.fixture(params=[srp.Verifier, pysrp_py.Verifier], ids=["ctsrp", "pysrp"])
+def reference_verifier(request):
+    return request.param
+
+
+def _handshake(engine, reference_verifier, username, password):
+    salt, vkey = srp.create_salted_verification_key(username, password, hash_alg=HASH, ng_type=GROUP)
+    user = srp.User(username, password, hash_alg=HASH, ng_type=GROUP)
+    _, A = user.start_authentication()
+
+    b, B = engine.challenge(vkey)
+    bytes_b = b.rjust(_B_LEN[reference_verifier], b"\0")
+    ref = reference_verifier(username, salt, vkey, A, hash_alg=HASH, ng_type=GROUP, bytes_b=bytes_b)
+    ref_salt, ref_B = ref.get_challenge()
+    assert ref_salt == salt
+    assert B == ref_B
+
+    M = user.process_challenge(salt, B)
+    assert M is not None
+    return salt, vkey, A, b, B, M, user, ref
+
+
+def test_matches_pysrp(engine, reference_verifier):
+    for i in range(ROUNDS):
+        username = f"user{i}_{secrets.token_hex(4)}"
+        password = secrets.token_urlsafe(12)
+        salt, vkey, A, b, B, M, user, ref = _handshake(engine, reference_verifier, username, password)
+
+        proof = engine.verify(username, salt, vkey, A, b, B, M)
+        assert proof is not None
+
+        H_AMK = ref.verify_session(M)
+        assert proof.H_AMK == H_AMK
+        assert proof.K == ref.get_session_key()
+
+        user.verify_session(proof.H_AMK)
+        assert user.authenticated()
+
+
+def test_rejects_wrong_M(engine):
+    salt, vkey, A, b, B, M, _, _ = _handshake(engine, srp.Verifier, "alice", "correct horse")
+
+    assert engine.verify("alice", salt, vkey, A, b, B, bytes(len(M))) is None
+    assert engine.verify("alice", salt, vkey, A, b, B, M[:-1] + bytes([M[-1] ^ 1])) is None
+    # M is bound to the username
+    assert engine.verify("mallory", salt, vkey, A, b, B, M) is None
+
+
+def test_wrong_password_fails(engine):
+    username = "bob"
+    salt, vkey = srp.create_salted_verification_key(username, "right password", hash_alg=HASH, ng_type=GROUP)
+    user = srp.User(username, "wrong password", hash_alg=HASH, ng_type=GROUP)
+    _, A = user.start_authentication()
+    b, B = engine.challenge(vkey)
+    M = user.process_challenge(salt, B)
+
+    assert engine.verify(username, salt, vkey, A, b, B, M) is None
+
+
+@pytest.mark.parametrize("multiple", [0, 1, 2])
+def test_rejects_A_multiple_of_N(engine, multiple):
+    N = engine.N
+    A = (N * multiple).to_bytes((N.bit_length() + 7) // 8 + 1, "big")
+    salt, vkey = srp.create_salted_verification_key("carol", "pw", hash_alg=HASH, ng_type=GROUP)
+    b, B = engine.challenge(vkey)
+
+    assert not engine.is_valid_A(A)
+    assert engine.verify("carol", salt, vkey, A, b, B, bytes(20)) is None
+
+
+def test_challenge_is_reproducible(engine):
+    _, vkey = srp.create_salted_verification_key("dave", "pw", hash_alg=HASH, ng_type=GROUP)
+    b, B = engine.challenge(vkey)
+    assert engine.challenge(vkey, b) == (b, B)
+
+    with pytest.raises(ValueError):
+        engine.challenge(vkey, (1 << engine.exponent_bits).to_bytes(33, "big"))
+
+
+def test_create_verifier_logs_in_with_pysrp(engine):
+    salt, vkey = engine.create_verifier("erin", "hunter22")
+    user = srp.User("erin", "hunter22", hash_alg=HASH, ng_type=GROUP)
+    _, A = user.start_authentication()
+    ref = srp.Verifier("erin", salt, vkey, A, hash_alg=HASH, ng_type=GROUP)
+    s, B = ref.get_challenge()
+    M = user.process_challenge(s, B)
+
+    assert ref.verify_session(M) is not None
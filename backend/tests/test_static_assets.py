@@ -0,0 +1,77 @@
+"""build() records the build in manifest.json; load() in another process serves it unchanged."""
+
+import gzip
+import json
+
+from app.core.static_assets import BUILD_MANIFEST, AssetStaticFiles
+
+
+def _tree(tmp_path):
+    frontend = tmp_path / "frontend"
+    (frontend / "models").mkdir(parents=True)
+    (frontend / "app.js").write_text("console.log('x');\n" * 200)
+    (frontend / "models" / "shard1").write_bytes(b"\x00\x01" * 64)
+    (frontend / "models" / "face_weights_manifest.json").write_text(json.dumps([{"paths": ["shard1"]}]))
+    return frontend
+
+
+def test_load_matches_build(tmp_path):
+    frontend, build_dir = _tree(tmp_path), tmp_path / "build"
+
+    built = AssetStaticFiles(directory=str(frontend), build_dir=str(build_dir)).build()
+    assert (build_dir / BUILD_MANIFEST).exists()
+
+    loaded = AssetStaticFiles(directory=str(frontend), build_dir=str(build_dir)).load()
+    assert loaded.keys() == built.keys()
+    for path, asset in built.items():
+        other = loaded[path]
+        assert (other.digest, other.body, other.variants, other.media_type) == (
+            asset.digest, asset.body, asset.variants, asset.media_type
+        )
+    assert "gzip" in loaded["app.js"].variants
+    # the rewritten weights manifest is served from build_dir, not the source
+    assert loaded["models/face_weights_manifest.json"].body.startswith(str(build_dir))
+
+
+def test_load_without_build(tmp_path):
+    static = AssetStaticFiles(directory=str(_tree(tmp_path)), build_dir=str(tmp_path / "missing"))
+    assert static.load() == {}
+
+
+def test_load_skips_missing_files(tmp_path):
+    frontend, build_dir = _tree(tmp_path), tmp_path / "build"
+    built = AssetStaticFiles(directory=str(frontend), build_dir=str(build_dir)).build()
+    for variant in built["app.js"].variants.values():
+        (build_dir / variant.rsplit("/", 1)[-1]).unlink()
+
+    loaded = AssetStaticFiles(directory=str(frontend), build_dir=str(build_dir)).load()
+    assert "app.js" not in loaded
+    assert "models/shard1" in loaded
+
+
+def test_build_dir_is_private(tmp_path):
+    build_dir = tmp_path / "build"
+    AssetStaticFiles(directory=str(_tree(tmp_path)), build_dir=str(build_dir)).build()
+    assert build_dir.stat().st_mode & 0o777 == 0o700
+
+
+def test_load_skips_tampered_files(tmp_path):
+    frontend, build_dir = _tree(tmp_path), tmp_path / "build"
+    built = AssetStaticFiles(directory=str(frontend), build_dir=str(build_dir)).build()
+    with open(built["app.js"].variants["gzip"], "wb") as f:
+        f.write(gzip.compress(b"alert('planted');"))
+
+    loaded = AssetStaticFiles(directory=str(frontend), build_dir=str(build_dir)).load()
+    assert "app.js" not in loaded
+    assert "models/face_weights_manifest.json" in loaded
+
+
+def test_build_replaces_planted_files(tmp_path):
+    frontend, build_dir = _tree(tmp_path), tmp_path / "build"
+    built = AssetStaticFiles(directory=str(frontend), build_dir=str(build_dir)).build()
+    variant = built["app.js"].variants["gzip"]
+    with open(variant, "wb") as f:
+        f.write(gzip.compress(b"alert('planted');"))
+
+    AssetStaticFiles(directory=str(frontend), build_dir=str(build_dir)).build()
+    assert gzip.decompress(open(variant, "rb").read()) == (frontend / "app.js").read_bytes()
@@ -13,6 +13,7 @@ const statusEl = qs("status");
 
 const searchUsersEl = qs("searchUsers");
 const searchAuditEl = qs("searchAudit");
+const btnMoreUsers = qs("btnMoreUsers");
 
 const btnBack = qs("btnBack");
 const btnRefresh = qs("btnRefresh");
@@ -85,8 +86,22 @@ async function api(path, options = {}) {
   return d;
 }
 
+// same as api() but also returns the response headers (pagination)
+async function apiPage(path) {
+  const r = await fetch(path);
+  const d = await r.json().catch(() => ({}));
+  if (!r.ok) {
+    if (r.status === 403) throw new Error("Forbidden (admin only).");
+    throw new Error(d?.detail || d?.message || "Request failed");
+  }
+  return { data: d, headers: r.headers };
+}
+
 // ================= State =================
+const USERS_PAGE_SIZE = 100;
 let USERS_CACHE = [];
+let USERS_CURSOR = null;
+let USERS_SEARCH_TIMER = null;
 let AUDIT_CACHE = [];
 let BUSY = false;
 
@@ -144,24 +159,44 @@ function renderUsers(list) {
   }
 }
 
-async function loadUsers() {
+// البحث والترقيم على السيرفر (prefix على username، أو email إذا فيه "@")
+function usersQuery(cursor) {
   const username = mustSession("username");
-  const users = await api(`/admin/users?username=${uParam(username)}`);
-  USERS_CACHE = Array.isArray(users) ? users : [];
-  applyUsersFilter();
+  const q = (searchUsersEl?.value || "").trim();
+  const params = new URLSearchParams({ username, limit: String(USERS_PAGE_SIZE) });
+  if (q) {
+    params.set("q", q);
+    params.set("by", q.includes("@") ? "email" : "username");
+  }
+  if (cursor) params.set("cursor", cursor);
+  return `/admin/users?${params.toString()}`;
 }
 
-function applyUsersFilter() {
-  const q = (searchUsersEl?.value || "").trim().toLowerCase();
-  if (!q) return renderUsers(USERS_CACHE);
+function renderUsersFooter(total, estimated) {
+  if (!btnMoreUsers) return;
+  btnMoreUsers.hidden = !USERS_CURSOR;
+  const shown = USERS_CACHE.length;
+  btnMoreUsers.textContent = `Load more (${shown} of ${estimated ? "~" : ""}${total})`;
+}
 
-  const filtered = USERS_CACHE.filter((u) => {
-    const a = String(u.username || "").toLowerCase();
-    const b = String(u.email || "").toLowerCase();
-    return a.includes(q) || b.includes(q);
-  });
+async function loadUsers(more = false) {
+  const { data, headers } = await apiPage(usersQuery(more ? USERS_CURSOR : null));
+  const page = Array.isArray(data) ? data : [];
+
+  USERS_CACHE = more ? USERS_CACHE.concat(page) : page;
+  USERS_CURSOR = headers.get("X-Next-Cursor");
+  renderUsers(USERS_CACHE);
+  renderUsersFooter(
+    headers.get("X-Total-Count") || USERS_CACHE.length,
+    headers.get("X-Total-Count-Estimated") === "1"
+  );
+}
 
-  renderUsers(filtered);
+function applyUsersFilter() {
+  clearTimeout(USERS_SEARCH_TIMER);
+  USERS_SEARCH_TIMER = setTimeout(() => {
+    loadUsers().catch((e) => setStatus(e.message, "err"));
+  }, 250);
 }
 
 // تحديث فوري للصف (بدون انتظار reload) — احترافي
@@ -345,6 +380,11 @@ document.addEventListener("DOMContentLoaded", () => {
   // Search filters
   if (searchUsersEl) searchUsersEl.addEventListener("input", applyUsersFilter);
   if (searchAuditEl) searchAuditEl.addEventListener("input", applyAuditFilter);
+  if (btnMoreUsers) {
+    btnMoreUsers.addEventListener("click", () => {
+      loadUsers(true).catch((e) => setStatus(e.message, "err"));
+    });
+  }
 
   // ✅ Event delegation for users actions (no bind issues)
   usersTbody.addEventListener("change", (e) => {
@@ -29,6 +29,22 @@ async function aesGcmDecryptRaw(key, b64) {
   return new Uint8Array(ptBuf);
 }
 
+// raw nonce + ciphertext (used with application/octet-stream template transfer)
+async function aesGcmDecryptBytes(key, raw) {
+  if (raw.length < 13) throw new Error("Invalid AES-GCM payload");
+  const ptBuf = await crypto.subtle.decrypt({ name: "AES-GCM", iv: raw.slice(0, 12) }, key, raw.slice(12));
+  return new Uint8Array(ptBuf);
+}
+
+async function aesGcmEncryptBytes(key, plainU8) {
+  const iv = crypto.getRandomValues(new Uint8Array(12));
+  const ctBuf = await crypto.subtle.encrypt({ name: "AES-GCM", iv }, key, plainU8);
+  const out = new Uint8Array(12 + ctBuf.byteLength);
+  out.set(iv, 0);
+  out.set(new Uint8Array(ctBuf), 12);
+  return out;
+}
+
 async function aesGcmEncryptRaw(key, plainU8) {
   const iv = crypto.getRandomValues(new Uint8Array(12));
   const ctBuf = await crypto.subtle.encrypt({ name: "AES-GCM", iv }, key, plainU8);
@@ -156,6 +172,8 @@ window.Face = {
   euclideanDistance,
   aesGcmEncryptRaw,
   aesGcmDecryptRaw,
+  aesGcmEncryptBytes,
+  aesGcmDecryptBytes,
   getDekFromServerBundle,
   importAesKeyRaw,
   bytesToFloat32,
@@ -34,6 +34,34 @@ async function startCam() {
   }
 })();
 
+// تسجيل الوجه يتطلب جلسة MFA (كلمة المرور عبر SRP): من صفحة face_verify
+// تكون موجودة، وبعد إنشاء الحساب نبدأ SRP login هنا
+async function getMfaSessionId(username, password) {
+  const existing = sessionStorage.getItem("mfa_session_id");
+  if (existing) return existing;
+
+  const client = new SRP.Client(username, password);
+  const { A_b64 } = await client.start();
+
+  const r1 = await fetch(
+    `/auth/login_start?username=${encodeURIComponent(username)}&A_b64=${encodeURIComponent(A_b64)}`,
+    { method: "POST" }
+  );
+  const d1 = await r1.json().catch(() => ({}));
+  if (!r1.ok) throw new Error(d1.detail || "Login failed (step 1)");
+
+  const { M_b64 } = await client.processChallenge(d1.salt, d1.B);
+  const r2 = await fetch(
+    `/auth/login_verify?username=${encodeURIComponent(username)}&session_id=${encodeURIComponent(d1.session_id)}&M_b64=${encodeURIComponent(M_b64)}`,
+    { method: "POST" }
+  );
+  const d2 = await r2.json().catch(() => ({}));
+  if (!r2.ok) throw new Error(d2.detail || "Login failed (step 2)");
+  if (!client.verifyServerProof(d2.server_proof_b64)) throw new Error("Security error: server proof mismatch");
+
+  return d2.mfa_session_id;
+}
+
 $("btnCancel").onclick = () => {
   window.location.href = "../../auth/login/index.html";
 };
@@ -45,6 +73,9 @@ $("btnCapture").onclick = async () => {
 
     if (!username || !password) throw new Error("Session expired");
 
+    setStatus("Verifying password...");
+    const mfaSessionId = await getMfaSessionId(username, password);
+
     setStatus("Capturing face...");
     const emb = await Face.getEmbedding(video);   // ← FIXED
 
@@ -52,20 +83,21 @@ $("btnCapture").onclick = async () => {
     const dekU8 = await Face.getDekFromServerBundle(username, password);
     const dekKey = await Face.importAesKeyRaw(dekU8, ["encrypt"]);
 
-    const enc_b64 = await Face.aesGcmEncryptRaw(
+    const encU8 = await Face.aesGcmEncryptBytes(
       dekKey,
       new Uint8Array(emb.buffer)
     );
 
     setStatus("Saving encrypted template...");
 
-    const r = await fetch("/mfa/face/register", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({
-        username,
-        face_template_enc_b64: enc_b64
-      })
+    const r = await fetch(`/mfa/face/template?username=${encodeURIComponent(username)}&mfa_session_id=${encodeURIComponent(mfaSessionId)}`, {
+      method: "PUT",
+      headers: {
+        "Content-Type": "application/octet-stream",
+        // مرجع السيرفر لـ /mfa/face/verify (يُشفَّر هناك بمفتاح السيرفر)
+        "X-Face-Embedding": u8ToB64(new Uint8Array(emb.buffer))
+      },
+      body: encU8
     });
 
     const d = await r.json().catch(() => ({}));
@@ -73,6 +105,11 @@ $("btnCapture").onclick = async () => {
 
     setStatus("Face registered ✅ Redirecting...", "ok");
 
+    // came from face_verify mid-login: finish that login with the new face
+    if (sessionStorage.getItem("srp_K_b64")) {
+      window.location.href = "../face_verify/index.html";
+      return;
+    }
     sessionStorage.clear();
     window.location.href = "../../auth/login/index.html";
 
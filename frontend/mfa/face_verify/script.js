@@ -52,10 +52,8 @@ function sleep(ms) {
   return new Promise((res) => setTimeout(res, ms));
 }
 
-function median(arr) {
-  const a = [...arr].sort((x, y) => x - y);
-  const mid = Math.floor(a.length / 2);
-  return a.length % 2 ? a[mid] : (a[mid - 1] + a[mid]) / 2;
+function f32ToB64(f32) {
+  return btoa(String.fromCharCode(...new Uint8Array(f32.buffer, f32.byteOffset, f32.byteLength)));
 }
 
 // Init
@@ -89,39 +87,37 @@ btnBack.addEventListener("click", () => {
 btnVerify.addEventListener("click", async () => {
   try {
     const username = sessionStorage.getItem("username");
-    const password = sessionStorage.getItem("password_tmp");
-    if (!username || !password) throw new Error("Missing login session.");
-
-    setStatus("Fetching encrypted face template...");
-    const rTpl = await fetch(`/mfa/face/template?username=${encodeURIComponent(username)}`);
-    const tpl = await rTpl.json().catch(() => ({}));
-    if (!rTpl.ok) throw new Error(tpl.detail || "Template not found");
-
-    setStatus("Deriving DEK locally...");
-    const dekU8 = await window.Face.getDekFromServerBundle(username, password);
-    const dekKey = await window.Face.importAesKeyRaw(dekU8, ["decrypt"]);
-
-    setStatus("Decrypting stored embedding...");
-    const storedU8 = await window.Face.aesGcmDecryptRaw(dekKey, tpl.face_template_enc_b64);
-    const stored = window.Face.bytesToFloat32(storedU8);
+    const mfa_session_id = sessionStorage.getItem("mfa_session_id");
+    if (!username || !mfa_session_id) throw new Error("Missing login session.");
 
     setStatus("Capturing live embeddings (3 samples)...");
-    const distances = [];
+    const samples = [];
 
     for (let i = 0; i < 3; i++) {
       const live = await window.Face.getEmbedding(video);
-      const dist = window.Face.euclideanDistance(stored, live);
-      distances.push(dist);
-      setStatus(`Sample ${i + 1}/3 distance: ${dist.toFixed(4)} ...`);
+      samples.push(f32ToB64(live));
+      setStatus(`Sample ${i + 1}/3 captured ...`);
       await sleep(250);
     }
 
-    const distMed = median(distances);
-    const THRESHOLD = 0.55;
-
-    setStatus(`Distance (median): ${distMed.toFixed(4)} (<= ${THRESHOLD} PASS)`);
+    // the server matches against its own enrolled reference and records the
+    // result on the MFA session; mfa_complete is refused without it
+    setStatus("Matching on server...");
+    const rMatch = await fetch("/mfa/face/verify", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ username, mfa_session_id, samples_b64: samples }),
+    });
+    const m = await rMatch.json().catch(() => ({}));
+    if (rMatch.status === 400 && m.detail === "Face not registered") {
+      // no face enrolled yet: enroll it with this (password-verified) session
+      setStatus("No face registered yet. Redirecting to registration...");
+      window.location.href = "/frontend/mfa/face_register/index.html";
+      return;
+    }
+    if (!rMatch.ok) throw new Error(m.detail || "Face verification failed");
 
-    if (distMed > THRESHOLD) throw new Error("Face mismatch");
+    if (!m.matched) throw new Error("Face mismatch");
 
     setStatus("Face matched ✅ Sending MFA proof...");
     await sendMfaProof();
@@ -10,7 +10,7 @@ password = "Rr@123456"
 
 print("\n=== STEP 1: Client → Server (A) ===")
 
-usr = srp.User(username, password, hash_alg=srp.SHA256, ng_type=srp.NG_2048)
+usr = srp.User(username, password, hash_alg=srp.SHA1, ng_type=srp.NG_2048)  # نفس هاش السيرفر (srp_utils)
 uname, A = usr.start_authentication()
 
 A_b64 = base64.b64encode(A).decode()
@@ -81,7 +81,7 @@ except:
 
 
 print("\n=== STEP 4: Client verifies HAMK ===")
-HAMK_b64 = data2["server_proof"]
+HAMK_b64 = data2["server_proof_b64"]
 
 HAMK = base64.b64decode(HAMK_b64)
 